@@ -1,13 +1,42 @@
 import os
+import time
+import json
 import requests
-from typing import List, Dict, Any, Optional
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Any, Optional, Iterator, Union, Tuple
 from dotenv import load_dotenv
+from ._common import (
+    DEFAULT_BASE_URL,
+    ModelListCache,
+    StreamDone,
+    chat_payload,
+    IMAGE_JOB_FINISHED,
+    image_payload,
+    models_endpoint,
+    parse_sse_line
+)
 
 class APIClient:
-    def __init__(self, api_key: str = None):
+    def __init__(
+        self,
+        api_key: str = None,
+        base_url: str = None,
+        pool_size: int = 10,
+        timeout: Union[float, Tuple[float, float]] = (5.0, 120.0),
+        models_ttl: float = 300.0
+    ):
+        """
+        Create a client backed by a persistent, pooled HTTP session.
 
+        Args:
+            api_key (str, optional): API key; defaults to OMNI_API_KEY
+            base_url (str, optional): Server URL; defaults to OMNI_BASE_URL or localhost:8000
+            pool_size (int, optional): Keep-alive connections kept per host. Defaults to 10
+            timeout (float | tuple, optional): (connect, read) timeout in seconds
+            models_ttl (float, optional): Seconds model lists are reused before revalidation
+        """
         load_dotenv()
-        
+
         if api_key is None:
             # Try to get from environment variable
             api_key = os.getenv('OMNI_API_KEY')
@@ -17,103 +46,193 @@ class APIClient:
                 "No API key provided. Pass it when initializing the client or "
                 "set the OMNI_API_KEY environment variable."
             )
-            
+
         self._api_key = api_key
-        self._base_url =  "http://localhost:8000"
-        
+        self._base_url = (base_url or os.getenv('OMNI_BASE_URL', DEFAULT_BASE_URL)).rstrip('/')
+        self._timeout = timeout
+        self._models = ModelListCache(ttl=models_ttl)
 
-    def _make_request(self, endpoint: str, method: str = 'GET', **kwargs):
-        headers = {
+        # One session reuses TCP/TLS connections across calls
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._session.headers.update({
             'Authorization': f'Bearer {self._api_key}',
             'Content-Type': 'application/json'
-        }
-        
-        response = requests.request(
+        })
+
+    def close(self):
+        """Close pooled connections"""
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _url(self, endpoint: str) -> str:
+        return f"{self._base_url}/{endpoint.lstrip('/')}"
+
+    def _make_request(self, endpoint: str, method: str = 'GET', **kwargs):
+        kwargs.setdefault('timeout', self._timeout)
+        response = self._session.request(
             method=method,
-            url=f"{self._base_url}/{endpoint.lstrip('/')}",
-            headers=headers,
+            url=self._url(endpoint),
             **kwargs
         )
-        
+
         response.raise_for_status()
         return response.json()
-        
+
     def chat(self, messages, model: str, temperature: float = 0.7, max_tokens: int = 100) -> dict:
         """
         Send a chat completion request.
-        
+
         Args:
             messages (list): List of message dictionaries with 'role' and 'content'
             model (str): The model ID to use
             temperature (float, optional): Sampling temperature. Defaults to 0.7
             max_tokens (int, optional): Maximum tokens to generate. Defaults to 100
-            
+
         Returns:
             dict: The API response containing the chat completion
         """
-        request_data = {
-            "model": model,
-            "messages": messages,
-            "temperature": temperature,
-            "max_tokens": max_tokens
-        }
-        
         return self._make_request(
             endpoint="/v1/chat/completions",
             method="POST",
-            json=request_data
+            json=chat_payload(messages, model, temperature, max_tokens)
         )
 
-    def generate_image(self, prompt: str, model: str, n: int = 1, size: str = "1024x1024", google_cloud_project_id: Optional[str] = None, google_cloud_location: Optional[str] = None) -> dict:
+    def chat_stream(self, messages, model: str, temperature: float = 0.7, max_tokens: int = 100) -> Iterator[dict]:
+        """
+        Send a streaming chat completion request.
+
+        Args:
+            messages (list): List of message dictionaries with 'role' and 'content'
+            model (str): The model ID to use
+            temperature (float, optional): Sampling temperature. Defaults to 0.7
+            max_tokens (int, optional): Maximum tokens to generate. Defaults to 100
+
+        Yields:
+            dict: Chunks with a 'delta' of new content; the last chunk carries
+                  'finish_reason' and 'usage'
+        """
+        with self._session.post(
+            self._url("/v1/chat/completions"),
+            headers={'Accept': 'text/event-stream'},
+            json=chat_payload(messages, model, temperature, max_tokens, stream=True),
+            timeout=self._timeout,
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                try:
+                    chunk = parse_sse_line(line)
+                except StreamDone:
+                    return
+                if chunk is not None:
+                    yield chunk
+
+    def chat_batch(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Run many chat completions in a single HTTP request.
+
+        Args:
+            batch (list): Chat request dicts ('model', 'messages', and optionally
+                             'temperature', 'max_tokens', ...), possibly for different models
+
+        Returns:
+            List[dict]: One result per request, in order. Each has 'index' and
+                        either 'response' or 'error' ({'status_code', 'detail'})
+        """
+        return self._make_request(
+            endpoint="/v1/chat/completions/batch",
+            method="POST",
+            json={"requests": batch}
+        )["results"]
+
+    def chat_batch_stream(self, batch: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Run many chat completions in a single HTTP request, yielding each
+        result as soon as it completes (use 'index' to match it up).
+        """
+        with self._session.post(
+            self._url("/v1/chat/completions/batch"),
+            json={"requests": batch, "stream": True},
+            timeout=self._timeout,
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if line:
+                    yield json.loads(line)
+
+    def generate_image(self, prompt: str, model: str, n: int = 1, size: str = "1024x1024", google_cloud_project_id: Optional[str] = None, google_cloud_location: Optional[str] = None, background: bool = False) -> dict:
         """
         Generate images from a text prompt.
-        
+
         Args:
             prompt (str): The image generation prompt
             model (str): The model ID to use
             n (int, optional): Number of images to generate. Defaults to 1
             size (str, optional): Image size. Defaults to "1024x1024"
-            
+            background (bool, optional): Return a job right away instead of
+                                       waiting; see wait_for_image_job
+
         Returns:
-            dict: The API response containing image URLs
+            dict: The API response containing image URLs (and 'errors' for
+                  images that failed while others succeeded), or the job
         """
-        request_data = {
-            "model": model,
-            "prompt": prompt,
-            "n": n,
-            "size": size,
-            "google_cloud_project_id": google_cloud_project_id, #Added
-            "google_cloud_location": google_cloud_location #Added
-        }
-        
         return self._make_request(
             endpoint="/v1/images/generate",
             method="POST",
-            json=request_data
+            json=image_payload(prompt, model, n, size, google_cloud_project_id, google_cloud_location, background)
         )
 
+    def get_image_job(self, job_id: str) -> dict:
+        """Status, progress ('completed' of 'n') and, once finished, 'result' or 'error' of a background image job"""
+        return self._make_request(endpoint=f"/v1/images/jobs/{job_id}")
+
+    def wait_for_image_job(self, job_id: str, poll_interval: float = 1.0) -> dict:
+        """Poll a background image job until it succeeds or fails and return it"""
+        while True:
+            job = self.get_image_job(job_id)
+            if job["status"] in IMAGE_JOB_FINISHED:
+                return job
+            time.sleep(poll_interval)
+
     def get_available_models(self, model_type: str = None) -> List[Dict[str, Any]]:
         """
         Get list of available models from the API
-        
+
+        Lists are cached and revalidated with If-None-Match once stale.
+
         Args:
-            model_type (str, optional): Type of models to get ('chat' or 'image'). 
+            model_type (str, optional): Type of models to get ('chat' or 'image').
                                       If None, returns all models.
-        
+
         Returns:
             List[Dict[str, Any]]: List of available models and their information
         """
-        if model_type == 'chat':
-            return self._make_request("v1/models/chat")["models"]
-        elif model_type == 'image':
-            return self._make_request("v1/models/image")["models"]
-        else:
-            # Get all models if no specific type is requested
-            chat_models = self._make_request("v1/models/chat")["models"]
-            image_models = self._make_request("v1/models/image")["models"]
-            return chat_models + image_models
+        endpoint = models_endpoint(model_type)
+        cached = self._models.fresh(endpoint)
+        if cached is not None:
+            return cached
+
+        response = self._session.get(
+            self._url(endpoint),
+            headers=self._models.conditional_headers(endpoint),
+            timeout=self._timeout
+        )
+        if response.status_code == 304:
+            return self._models.not_modified(endpoint)
+        response.raise_for_status()
+        return self._models.store(endpoint, response.headers.get('ETag'), response.json()["models"])
 
 # Usage example:
 # client = APIClient(api_key='your-api-key-here')
 # Or using environment variable:
-# client = APIClient()
\ No newline at end of file
+# client = APIClient()
+# Reuse one client (or use it as a context manager) so connections are pooled.
@@ -0,0 +1,222 @@
+import os
+import asyncio
+import json
+import httpx
+from typing import List, Dict, Any, Optional, AsyncIterator
+from dotenv import load_dotenv
+from ._common import (
+    DEFAULT_BASE_URL,
+    ModelListCache,
+    StreamDone,
+    chat_payload,
+    IMAGE_JOB_FINISHED,
+    image_payload,
+    models_endpoint,
+    parse_sse_line
+)
+
+class AsyncAPIClient:
+    def __init__(
+        self,
+        api_key: str = None,
+        base_url: str = None,
+        max_connections: int = 1000,
+        max_keepalive_connections: int = 100,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 120.0,
+        models_ttl: float = 300.0,
+        http_client: Optional[httpx.AsyncClient] = None
+    ):
+        """
+        Create an asyncio client backed by a shared connection pool.
+
+        Args:
+            api_key (str, optional): API key; defaults to OMNI_API_KEY
+            base_url (str, optional): Server URL; defaults to OMNI_BASE_URL or localhost:8000
+            max_connections (int, optional): Upper bound on concurrent connections. Defaults to 1000
+            max_keepalive_connections (int, optional): Idle connections kept open. Defaults to 100
+            connect_timeout (float, optional): Connect timeout in seconds. Defaults to 5
+            read_timeout (float, optional): Read timeout in seconds. Defaults to 120
+            models_ttl (float, optional): Seconds model lists are reused before revalidation
+            http_client (httpx.AsyncClient, optional): Existing client to share a pool
+                across several AsyncAPIClients; it is not closed by aclose()
+        """
+        load_dotenv()
+
+        if api_key is None:
+            api_key = os.getenv('OMNI_API_KEY')
+
+        if not api_key:
+            raise ValueError(
+                "No API key provided. Pass it when initializing the client or "
+                "set the OMNI_API_KEY environment variable."
+            )
+
+        self._api_key = api_key
+        self._base_url = (base_url or os.getenv('OMNI_BASE_URL', DEFAULT_BASE_URL)).rstrip('/')
+        self._headers = {
+            'Authorization': f'Bearer {self._api_key}',
+            'Content-Type': 'application/json'
+        }
+        self._models = ModelListCache(ttl=models_ttl)
+        self._owns_client = http_client is None
+        self._client = http_client or httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections
+            ),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+        )
+
+    async def aclose(self):
+        """Close pooled connections (unless the pool was passed in)"""
+        if self._owns_client:
+            await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def _url(self, endpoint: str) -> str:
+        return f"{self._base_url}/{endpoint.lstrip('/')}"
+
+    async def _make_request(self, endpoint: str, method: str = 'GET', **kwargs):
+        response = await self._client.request(
+            method,
+            self._url(endpoint),
+            headers=self._headers,
+            **kwargs
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def chat(self, messages, model: str, temperature: float = 0.7, max_tokens: int = 100) -> dict:
+        """
+        Send a chat completion request.
+
+        Args:
+            messages (list): List of message dictionaries with 'role' and 'content'
+            model (str): The model ID to use
+            temperature (float, optional): Sampling temperature. Defaults to 0.7
+            max_tokens (int, optional): Maximum tokens to generate. Defaults to 100
+
+        Returns:
+            dict: The API response containing the chat completion
+        """
+        return await self._make_request(
+            endpoint="/v1/chat/completions",
+            method="POST",
+            json=chat_payload(messages, model, temperature, max_tokens)
+        )
+
+    async def chat_stream(self, messages, model: str, temperature: float = 0.7, max_tokens: int = 100) -> AsyncIterator[dict]:
+        """
+        Send a streaming chat completion request.
+
+        Yields:
+            dict: Chunks with a 'delta' of new content; the last chunk carries
+                  'finish_reason' and 'usage'
+        """
+        async with self._client.stream(
+            "POST",
+            self._url("/v1/chat/completions"),
+            headers={**self._headers, 'Accept': 'text/event-stream'},
+            json=chat_payload(messages, model, temperature, max_tokens, stream=True)
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                try:
+                    chunk = parse_sse_line(line)
+                except StreamDone:
+                    return
+                if chunk is not None:
+                    yield chunk
+
+    async def chat_batch(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Run many chat completions in a single HTTP request.
+
+        Returns:
+            List[dict]: One result per request, in order. Each has 'index' and
+                        either 'response' or 'error' ({'status_code', 'detail'})
+        """
+        result = await self._make_request(
+            endpoint="/v1/chat/completions/batch",
+            method="POST",
+            json={"requests": batch}
+        )
+        return result["results"]
+
+    async def chat_batch_stream(self, batch: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """Run many chat completions, yielding each result as soon as it completes"""
+        async with self._client.stream(
+            "POST",
+            self._url("/v1/chat/completions/batch"),
+            headers=self._headers,
+            json={"requests": batch, "stream": True}
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line:
+                    yield json.loads(line)
+
+    async def generate_image(self, prompt: str, model: str, n: int = 1, size: str = "1024x1024", google_cloud_project_id: Optional[str] = None, google_cloud_location: Optional[str] = None, background: bool = False) -> dict:
+        """
+        Generate images from a text prompt.
+
+        Args:
+            prompt (str): The image generation prompt
+            model (str): The model ID to use
+            n (int, optional): Number of images to generate. Defaults to 1
+            size (str, optional): Image size. Defaults to "1024x1024"
+            background (bool, optional): Return a job right away instead of
+                                       waiting; see wait_for_image_job
+
+        Returns:
+            dict: The API response containing image URLs (and 'errors' for
+                  images that failed while others succeeded), or the job
+        """
+        return await self._make_request(
+            endpoint="/v1/images/generate",
+            method="POST",
+            json=image_payload(prompt, model, n, size, google_cloud_project_id, google_cloud_location, background)
+        )
+
+    async def get_image_job(self, job_id: str) -> dict:
+        """Status, progress ('completed' of 'n') and, once finished, 'result' or 'error' of a background image job"""
+        return await self._make_request(endpoint=f"/v1/images/jobs/{job_id}")
+
+    async def wait_for_image_job(self, job_id: str, poll_interval: float = 1.0) -> dict:
+        """Poll a background image job until it succeeds or fails and return it"""
+        while True:
+            job = await self.get_image_job(job_id)
+            if job["status"] in IMAGE_JOB_FINISHED:
+                return job
+            await asyncio.sleep(poll_interval)
+
+    async def get_available_models(self, model_type: str = None) -> List[Dict[str, Any]]:
+        """
+        Get list of available models from the API
+
+        Args:
+            model_type (str, optional): Type of models to get ('chat' or 'image').
+                                      If None, returns all models.
+
+        Returns:
+            List[Dict[str, Any]]: List of available models and their information
+        """
+        endpoint = models_endpoint(model_type)
+        cached = self._models.fresh(endpoint)
+        if cached is not None:
+            return cached
+
+        response = await self._client.get(
+            self._url(endpoint),
+            headers={**self._headers, **self._models.conditional_headers(endpoint)}
+        )
+        if response.status_code == 304:
+            return self._models.not_modified(endpoint)
+        response.raise_for_status()
+        return self._models.store(endpoint, response.headers.get('ETag'), response.json()["models"])
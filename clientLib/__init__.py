@@ -1,3 +1,4 @@
 from .APIClient import APIClient
+from .AsyncAPIClient import AsyncAPIClient
 
-__all__ = ['APIClient']
+__all__ = ['APIClient', 'AsyncAPIClient']
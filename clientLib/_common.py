@@ -0,0 +1,111 @@
+"""
+Helpers shared by the sync and async API clients.
+"""
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_BASE_URL = "http://localhost:8000"
+
+
+def chat_payload(messages, model: str, temperature: float, max_tokens: int, stream: bool = False) -> Dict[str, Any]:
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens
+    }
+    if stream:
+        payload["stream"] = True
+    return payload
+
+
+def image_payload(
+    prompt: str,
+    model: str,
+    n: int,
+    size: str,
+    google_cloud_project_id: Optional[str],
+    google_cloud_location: Optional[str],
+    background: bool = False
+) -> Dict[str, Any]:
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "n": n,
+        "size": size,
+        "google_cloud_project_id": google_cloud_project_id,
+        "google_cloud_location": google_cloud_location
+    }
+    if background:
+        payload["background"] = True
+    return payload
+
+
+# Image job states after which polling stops
+IMAGE_JOB_FINISHED = ("succeeded", "failed")
+
+
+def models_endpoint(model_type: Optional[str]) -> str:
+    if model_type == 'chat':
+        return "v1/models/chat"
+    if model_type == 'image':
+        return "v1/models/image"
+    # A single round trip for every model
+    return "v1/models"
+
+
+class StreamDone(Exception):
+    """Raised by parse_sse_line when the [DONE] sentinel arrives"""
+
+
+def parse_sse_line(line: str) -> Optional[dict]:
+    """
+    Parse one line of the chat completion event stream.
+
+    Returns the chunk dict for data lines, None for blank/comment lines,
+    and raises StreamDone at the end of the stream.
+    """
+    if not line or not line.startswith("data: "):
+        return None
+    data = line[len("data: "):]
+    if data == "[DONE]":
+        raise StreamDone()
+    chunk = json.loads(data)
+    if "error" in chunk:
+        raise RuntimeError(f"Stream failed: {chunk['error']}")
+    return chunk
+
+
+class ModelListCache:
+    """
+    Model listings cached per endpoint and revalidated with ETags.
+
+    Within ttl seconds a cached list is returned without a request; after
+    that the client sends If-None-Match and a 304 renews the entry.
+    """
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[Optional[str], float, List[Dict[str, Any]]]] = {}
+
+    def fresh(self, endpoint: str) -> Optional[List[Dict[str, Any]]]:
+        entry = self._entries.get(endpoint)
+        if entry and time.monotonic() - entry[1] < self.ttl:
+            return entry[2]
+        return None
+
+    def conditional_headers(self, endpoint: str) -> Dict[str, str]:
+        entry = self._entries.get(endpoint)
+        if entry and entry[0]:
+            return {"If-None-Match": entry[0]}
+        return {}
+
+    def not_modified(self, endpoint: str) -> List[Dict[str, Any]]:
+        etag, _, models = self._entries[endpoint]
+        self._entries[endpoint] = (etag, time.monotonic(), models)
+        return models
+
+    def store(self, endpoint: str, etag: Optional[str], models: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        self._entries[endpoint] = (etag, time.monotonic(), models)
+        return models
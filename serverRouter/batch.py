@@ -0,0 +1,287 @@
+"""
+Offline batch runner for JSONL files of chat completion requests.
+
+    python -m serverRouter.batch run in.jsonl out.jsonl --concurrency 32
+
+Each input line is either a ChatCompletionRequest or an OpenAI batch style
+object {"custom_id": ..., "body": {...}}. Output lines are written in input
+order as {"index", "custom_id", "response"} or {"index", "custom_id", "error"}.
+
+Input is read lazily and at most --concurrency requests are outstanding,
+so memory stays flat regardless of file size. Progress is checkpointed
+next to the output; re-running the same command resumes after the last
+written line instead of repeating paid calls. Lines written after the
+last checkpoint are recovered from the output itself, so even a hard kill
+only repeats requests whose results never reached the file.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from serverRouter.core.datamodels import ChatCompletionRequest
+from serverRouter.core.usage import normalize_usage
+
+
+def iter_requests(path: str, skip: int = 0) -> Iterator[Tuple[int, Optional[str], Any]]:
+    """
+    Lazily yield (index, custom_id, request) for each non-empty line.
+
+    request is a ChatCompletionRequest, or the exception raised while
+    parsing the line so it can be reported in the output.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        index = 0
+        for line in f:
+            if not line.strip():
+                continue
+            if index >= skip:
+                custom_id = None
+                try:
+                    obj = json.loads(line)
+                    if isinstance(obj, dict) and "body" in obj:
+                        custom_id, obj = obj.get("custom_id"), obj["body"]
+                    request = ChatCompletionRequest.model_validate(obj)
+                    request.stream = False
+                except (ValueError, ValidationError) as e:
+                    request = e
+                yield index, custom_id, request
+            index += 1
+
+
+class Checkpoint:
+    """Number of input lines fully written and the output size at that point"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.completed = 0
+        self.output_bytes = 0
+
+    def load(self, input_path: str) -> bool:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return False
+        if state.get("input") != os.path.abspath(input_path):
+            raise SystemExit(f"Checkpoint {self.path} belongs to {state.get('input')}; use --no-resume to start over")
+        self.completed = state["completed"]
+        self.output_bytes = state["output_bytes"]
+        return True
+
+    def recover(self, out) -> int:
+        """
+        Advance past complete, in-order lines written after the checkpoint
+        was saved; a torn final line is left to be truncated and redone.
+
+        Returns:
+            Number of lines recovered
+        """
+        out.seek(self.output_bytes)
+        recovered = 0
+        for line in out:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                index = json.loads(line)["index"]
+            except (ValueError, KeyError, TypeError):
+                break
+            if index != self.completed:
+                break
+            self.completed += 1
+            self.output_bytes += len(line)
+            recovered += 1
+        return recovered
+
+    def save(self, input_path: str):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "input": os.path.abspath(input_path),
+                "completed": self.completed,
+                "output_bytes": self.output_bytes,
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class Progress:
+    """Live throughput report on stderr"""
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.last_report = 0.0
+        self.done = 0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def record(self, usage: Optional[Dict[str, int]], error: bool):
+        self.done += 1
+        self.errors += error
+        tokens = normalize_usage(usage)
+        self.input_tokens += tokens["input_tokens"]
+        self.output_tokens += tokens["output_tokens"]
+
+    def report(self, in_flight: int, force: bool = False):
+        now = time.perf_counter()
+        if not force and now - self.last_report < self.interval:
+            return
+        self.last_report = now
+        elapsed = max(now - self.start, 1e-9)
+        sys.stderr.write(
+            f"\rdone={self.done} errors={self.errors} in_flight={in_flight} "
+            f"{self.done / elapsed:.1f} req/s "
+            f"{(self.input_tokens + self.output_tokens) / elapsed:.0f} tok/s "
+            f"(out {self.output_tokens / elapsed:.0f} tok/s)"
+        )
+        if force:
+            sys.stderr.write("\n")
+        sys.stderr.flush()
+
+
+async def _run_one(index: int, custom_id: Optional[str], request: Any, use_cache: bool) -> Dict[str, Any]:
+    # Imported lazily so --help doesn't initialize the providers
+    from serverRouter.router import run_chat_completion
+
+    result: Dict[str, Any] = {"index": index, "custom_id": custom_id}
+    if isinstance(request, Exception):
+        result["error"] = {"status_code": 400, "detail": f"Invalid request: {request}"}
+        return result
+    try:
+        completion, _ = await run_chat_completion(request, lookup=use_cache, store=use_cache)
+        result["response"] = completion.model_dump()
+    except HTTPException as e:
+        result["error"] = {"status_code": e.status_code, "detail": str(e.detail)}
+    except Exception as e:
+        result["error"] = {"status_code": 500, "detail": str(e)}
+    return result
+
+
+async def run(
+    input_path: str,
+    output_path: str,
+    concurrency: int = 32,
+    checkpoint_path: Optional[str] = None,
+    resume: bool = True,
+    use_cache: bool = True,
+    checkpoint_interval: float = 0.5,
+    overwrite: bool = False,
+):
+    """
+    Process input_path into output_path with a bounded concurrency window.
+
+    Completed results wait in a reorder buffer until every earlier line
+    has been written, so output order always matches input order and the
+    checkpoint is simply the length of the written prefix. Without a
+    checkpoint to resume from, a non-empty output is only replaced when
+    overwrite is set.
+    """
+    checkpoint = Checkpoint(checkpoint_path or output_path + ".ckpt")
+    resuming = resume and checkpoint.load(input_path)
+    if not resuming:
+        if not overwrite and os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+            raise SystemExit(f"{output_path} already has results and no checkpoint to resume; use --overwrite to replace it")
+        checkpoint.completed = checkpoint.output_bytes = 0
+
+    with open(output_path, "a+b") as out:
+        if resuming:
+            recovered = checkpoint.recover(out)
+            sys.stderr.write(
+                f"Resuming after {checkpoint.completed} completed requests ({recovered} recovered from the output)\n"
+            )
+        # Drop a torn or foreign tail; those requests will be redone
+        out.truncate(checkpoint.output_bytes)
+        out.seek(checkpoint.output_bytes)
+        # Saved before any output is written, so output without a checkpoint is never ours to resume
+        checkpoint.save(input_path)
+
+        progress = Progress()
+        requests = iter_requests(input_path, skip=checkpoint.completed)
+        pending: Dict[int, Dict[str, Any]] = {}
+        in_flight: set = set()
+        next_write = checkpoint.completed
+        exhausted = False
+        last_checkpoint = time.perf_counter()
+
+        try:
+            while True:
+                # Keep the window full, bounded by how far we are ahead of the writer
+                while not exhausted and len(in_flight) + len(pending) < concurrency:
+                    item = next(requests, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    in_flight.add(asyncio.ensure_future(_run_one(*item, use_cache=use_cache)))
+
+                if not in_flight:
+                    break
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    pending[result["index"]] = result
+                    progress.record(result.get("response", {}).get("usage"), "error" in result)
+
+                while next_write in pending:
+                    result = pending.pop(next_write)
+                    out.write(json.dumps(result, ensure_ascii=False).encode("utf-8") + b"\n")
+                    next_write += 1
+                out.flush()
+                checkpoint.completed = next_write
+                checkpoint.output_bytes = out.tell()
+
+                if time.perf_counter() - last_checkpoint >= checkpoint_interval:
+                    # The checkpoint must never point past what is durably on disk
+                    os.fsync(out.fileno())
+                    checkpoint.save(input_path)
+                    last_checkpoint = time.perf_counter()
+                progress.report(len(in_flight))
+        finally:
+            for task in in_flight:
+                task.cancel()
+            out.flush()
+            os.fsync(out.fileno())
+            checkpoint.save(input_path)
+            progress.report(len(in_flight), force=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m serverRouter.batch", description=__doc__.split("\n\n")[0].strip())
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run every request in a JSONL file")
+    run_parser.add_argument("input", help="Input JSONL of chat completion requests")
+    run_parser.add_argument("output", help="Output JSONL of results (appended to on resume)")
+    run_parser.add_argument("--concurrency", type=int, default=32, help="Maximum outstanding requests (default 32)")
+    run_parser.add_argument("--checkpoint", help="Checkpoint file (default <output>.ckpt)")
+    run_parser.add_argument("--no-resume", action="store_true", help="Ignore any checkpoint and start over")
+    run_parser.add_argument("--overwrite", action="store_true", help="Replace a non-empty output when not resuming")
+    run_parser.add_argument("--no-cache", action="store_true", help="Bypass the response caches")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        try:
+            asyncio.run(run(
+                args.input,
+                args.output,
+                concurrency=max(1, args.concurrency),
+                checkpoint_path=args.checkpoint,
+                resume=not args.no_resume,
+                use_cache=not args.no_cache,
+                overwrite=args.overwrite,
+            ))
+        except KeyboardInterrupt:
+            sys.stderr.write("Interrupted; re-run the same command to resume\n")
+            sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
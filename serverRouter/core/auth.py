@@ -0,0 +1,228 @@
+import hashlib
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+import yaml
+from pydantic import BaseModel, Field
+
+from serverRouter.core.exceptions import RateLimitExceededError
+
+SECONDS_PER_DAY = 86400
+
+
+class KeyLimits(BaseModel):
+    """Rate limits and quotas of one API key; None means unlimited"""
+    requests_per_second: Optional[float] = Field(None, gt=0, description="Sustained request rate")
+    burst: Optional[int] = Field(None, ge=1, description="Requests allowed back to back (default: one second's worth)")
+    tokens_per_minute: Optional[int] = Field(None, gt=0, description="Sustained input + output tokens")
+    daily_tokens: Optional[int] = Field(None, gt=0, description="Input + output tokens per UTC day")
+    daily_spend_usd: Optional[float] = Field(None, gt=0, description="List-price spend per UTC day")
+
+
+class TokenBucket:
+    """Refills at rate per second up to capacity; may go into debt when charged after the fact"""
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, amount: float, now: float) -> float:
+        """Take amount if available and return 0, else return seconds until it would be"""
+        self._refill(now)
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def available(self, now: float) -> float:
+        self._refill(now)
+        return self.tokens
+
+    def charge(self, amount: float, now: float):
+        self._refill(now)
+        self.tokens -= amount
+
+    def reset_after(self) -> float:
+        """Seconds until the bucket is full again, as of the last refill"""
+        return max(0.0, self.capacity - self.tokens) / self.rate
+
+
+def _duration(seconds: float) -> str:
+    return f"{seconds:.3f}".rstrip("0").rstrip(".") + "s"
+
+
+class ApiKey:
+    """
+    Limits and live usage of one API key.
+
+    Requests are admitted from a requests bucket. Tokens are only known
+    once a call finishes, so they are charged afterwards: the tokens
+    bucket can go negative, and the key is refused until it refills to
+    above zero. Daily counters reset at UTC midnight.
+    """
+
+    def __init__(self, name: str, limits: KeyLimits):
+        self.name = name
+        self.limits = limits
+        self.requests = None
+        if limits.requests_per_second:
+            self.requests = TokenBucket(limits.requests_per_second, limits.burst or max(1.0, limits.requests_per_second))
+        self.tokens = None
+        if limits.tokens_per_minute:
+            self.tokens = TokenBucket(limits.tokens_per_minute / 60, limits.tokens_per_minute)
+        self.day = 0
+        self.tokens_today = 0
+        self.spend_today = 0.0
+        self.rejected = 0
+
+    def _roll_day(self, day: int):
+        if day != self.day:
+            self.day = day
+            self.tokens_today = 0
+            self.spend_today = 0.0
+
+    def _reject(self, detail: str, retry_after: float, headers: Dict[str, str]):
+        self.rejected += 1
+        raise RateLimitExceededError(f"Rate limit exceeded for key {self.name}: {detail}", retry_after, headers)
+
+    def admit(self) -> Dict[str, str]:
+        """Admit one request and return its rate-limit headers, or raise RateLimitExceededError"""
+        now = time.monotonic()
+        wall = time.time()
+        self._roll_day(int(wall // SECONDS_PER_DAY))
+        headers: Dict[str, str] = {}
+        limits = self.limits
+
+        if limits.daily_tokens and self.tokens_today >= limits.daily_tokens:
+            self._reject(f"daily token quota of {limits.daily_tokens} used", SECONDS_PER_DAY - wall % SECONDS_PER_DAY, headers)
+        if limits.daily_spend_usd and self.spend_today >= limits.daily_spend_usd:
+            self._reject(f"daily spend quota of ${limits.daily_spend_usd} used", SECONDS_PER_DAY - wall % SECONDS_PER_DAY, headers)
+
+        if self.tokens is not None:
+            available = self.tokens.available(now)
+            headers.update({
+                "x-ratelimit-limit-tokens": str(limits.tokens_per_minute),
+                "x-ratelimit-remaining-tokens": str(max(0, int(available))),
+                "x-ratelimit-reset-tokens": _duration(self.tokens.reset_after()),
+            })
+            if available <= 0:
+                self._reject(f"{limits.tokens_per_minute} tokens per minute", -available / self.tokens.rate, headers)
+
+        if self.requests is not None:
+            wait = self.requests.take(1, now)
+            headers.update({
+                "x-ratelimit-limit-requests": str(int(self.requests.capacity)),
+                "x-ratelimit-remaining-requests": str(int(self.requests.tokens)),
+                "x-ratelimit-reset-requests": _duration(self.requests.reset_after()),
+            })
+            if wait:
+                self._reject(f"{limits.requests_per_second} requests per second", wait, headers)
+        return headers
+
+    def charge(self, tokens: int, cost: float):
+        """Count a finished upstream call's tokens and list-price cost"""
+        self._roll_day(int(time.time() // SECONDS_PER_DAY))
+        self.tokens_today += tokens
+        self.spend_today += cost
+        if self.tokens is not None:
+            self.tokens.charge(tokens, time.monotonic())
+
+    def snapshot(self) -> Dict[str, object]:
+        self._roll_day(int(time.time() // SECONDS_PER_DAY))
+        return {
+            "name": self.name,
+            "limits": self.limits.model_dump(),
+            "tokens_today": self.tokens_today,
+            "spend_today_usd": round(self.spend_today, 6),
+            "rejected": self.rejected,
+        }
+
+
+class ApiKeyStore:
+    """
+    API keys and their limits, looked up in O(1) per request.
+
+    Keys come from the YAML file named by OMNI_API_KEYS_FILE:
+
+        keys:
+          team-a:
+            key: sk-...               # or key_sha256: <hex digest of the key>
+            requests_per_second: 20
+            tokens_per_minute: 400000
+            daily_spend_usd: 50
+
+    Limits a key doesn't set fall back to OMNI_RATE_LIMIT_RPS,
+    OMNI_RATE_LIMIT_BURST, OMNI_RATE_LIMIT_TPM, OMNI_QUOTA_DAILY_TOKENS and
+    OMNI_QUOTA_DAILY_SPEND (unset or 0 is unlimited). Without a file the
+    built-in development key is used. State is per worker process, so
+    with several workers each enforces the limits separately.
+    """
+
+    def __init__(self, keys: Dict[str, ApiKey], hashed: Optional[Dict[str, ApiKey]] = None):
+        self._keys = keys
+        self._hashed = hashed or {}
+
+    @staticmethod
+    def default_limits() -> Dict[str, object]:
+        env = {
+            "requests_per_second": os.getenv("OMNI_RATE_LIMIT_RPS"),
+            "burst": os.getenv("OMNI_RATE_LIMIT_BURST"),
+            "tokens_per_minute": os.getenv("OMNI_RATE_LIMIT_TPM"),
+            "daily_tokens": os.getenv("OMNI_QUOTA_DAILY_TOKENS"),
+            "daily_spend_usd": os.getenv("OMNI_QUOTA_DAILY_SPEND"),
+        }
+        return {name: value for name, value in env.items() if value and float(value) > 0}
+
+    @classmethod
+    def from_file(cls, path: str) -> "ApiKeyStore":
+        with open(path, "rb") as f:
+            config = yaml.safe_load(f) or {}
+        defaults = cls.default_limits()
+        keys, hashed = {}, {}
+        for name, entry in (config.get("keys") or {}).items():
+            entry = dict(entry)
+            key, digest = entry.pop("key", None), entry.pop("key_sha256", None)
+            if not key and not digest:
+                raise ValueError(f"API key {name} needs key or key_sha256")
+            api_key = ApiKey(name, KeyLimits(**{**defaults, **entry}))
+            if key:
+                keys[key] = api_key
+            if digest:
+                hashed[digest.lower()] = api_key
+        return cls(keys, hashed)
+
+    @classmethod
+    def from_env(cls, builtin_keys: Dict[str, str]) -> "ApiKeyStore":
+        """The store from OMNI_API_KEYS_FILE, or builtin_keys (key -> name) with the default limits"""
+        path = os.getenv("OMNI_API_KEYS_FILE")
+        if path:
+            return cls.from_file(path)
+        limits = KeyLimits(**cls.default_limits())
+        return cls({key: ApiKey(name, limits) for key, name in builtin_keys.items()})
+
+    def lookup(self, key: str) -> Optional[ApiKey]:
+        api_key = self._keys.get(key)
+        if api_key is None and self._hashed:
+            api_key = self._hashed.get(hashlib.sha256(key.encode()).hexdigest())
+        return api_key
+
+
+# The key of the request being handled; set by the auth dependency and
+# inherited by the tasks the request starts
+CURRENT_KEY: ContextVar[Optional[ApiKey]] = ContextVar("omni_api_key", default=None)
+
+
+def charge_current_key(tokens: int, cost: float):
+    """Charge a finished upstream call to the current request's key, if any"""
+    api_key = CURRENT_KEY.get()
+    if api_key is not None:
+        api_key.charge(tokens, cost)
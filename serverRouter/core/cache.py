@@ -0,0 +1,258 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from cachetools import TTLCache
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from serverRouter.core.datamodels import ChatCompletionRequest, ChatCompletionResponse
+
+
+def request_cache_key(request: ChatCompletionRequest) -> str:
+    """
+    Build a canonical hash of the fields that determine a completion.
+
+    Two requests that differ only in transport options (e.g. stream) map
+    to the same key.
+    """
+    normalized = {
+        "model": request.model,
+        "messages": [[msg.role, msg.content] for msg in request.messages],
+        "temperature": request.temperature,
+        "max_tokens": request.max_tokens,
+        "tools": [tool.model_dump() for tool in request.tools] if request.tools else None,
+        "tool_choice": (
+            request.tool_choice.model_dump()
+            if hasattr(request.tool_choice, "model_dump")
+            else request.tool_choice
+        ),
+        "response_format": request.response_format,
+    }
+    canonical = json.dumps(normalized, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    Disk tier of the response cache.
+
+    Each entry is stored as <key>.json. An append-only index file records
+    the expiry of every entry so the tier survives restarts without having
+    to scan and parse every entry file.
+
+    Worker processes can share one directory: the index is changed only
+    under an flock on index.lock, and each process catches up on lines
+    other processes appended (or reloads after one of them compacted the
+    index) before using its copy.
+    """
+
+    INDEX_FILE = "index.log"
+    LOCK_FILE = "index.lock"
+
+    def __init__(self, directory: str, ttl: float, max_entries: int = 100_000):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._index: Dict[str, float] = {}
+        self._log_lines = 0
+        # Position in (and identity of) the index file replayed so far
+        self._offset = 0
+        self._inode: Optional[int] = None
+        # Entries are read and written from worker threads
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(os.path.join(directory, self.LOCK_FILE), "a")
+        with self._exclusive():
+            self._load_index()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, self.INDEX_FILE)
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """Hold the directory's index lock across processes"""
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _sync(self):
+        """Replay index lines written since the last sync, or all of them after a compaction"""
+        now = time.time()
+        try:
+            with open(self._index_path(), "rb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                if inode != self._inode:
+                    self._index, self._offset, self._log_lines, self._inode = {}, 0, 0, inode
+                f.seek(self._offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # still being appended
+                    self._offset += len(line)
+                    self._log_lines += 1
+                    try:
+                        key, expires_at = line.decode().split()
+                        expires_at = float(expires_at)
+                    except ValueError:
+                        continue
+                    if expires_at > now:
+                        self._index[key] = expires_at
+                    else:
+                        self._index.pop(key, None)
+        except FileNotFoundError:
+            pass
+
+    def _load_index(self):
+        """Replay the index log, dropping expired entries, then compact it"""
+        try:
+            self._sync()
+        except (OSError, ValueError) as e:
+            logging.warning(f"Response cache index unreadable, starting empty: {e}")
+            self._index = {}
+
+        for key in [k for k in self._index if not os.path.exists(self._entry_path(k))]:
+            del self._index[key]
+        self._rewrite_index()
+
+    def _rewrite_index(self):
+        """Compact the index to one line per live entry; the caller holds the index lock"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=self.INDEX_FILE, suffix=".tmp")
+        with open(fd, "w", encoding="utf-8") as f:
+            for key, expires_at in self._index.items():
+                f.write(f"{key} {expires_at}\n")
+            f.flush()
+            self._inode, self._offset = os.fstat(f.fileno()).st_ino, f.tell()
+        os.replace(tmp_path, self._index_path())
+        self._log_lines = len(self._index)
+
+    def get(self, key: str) -> Optional[ChatCompletionResponse]:
+        with self._lock:
+            self._sync()
+            return self._get(key)
+
+    def _get(self, key: str) -> Optional[ChatCompletionResponse]:
+        expires_at = self._index.get(key)
+        if expires_at is None:
+            return None
+        if expires_at <= time.time():
+            self._remove(key)
+            return None
+        try:
+            with open(self._entry_path(key), "r", encoding="utf-8") as f:
+                return ChatCompletionResponse.model_validate_json(f.read())
+        except (OSError, ValueError):
+            self._remove(key)
+            return None
+
+    def set(self, key: str, response: ChatCompletionResponse):
+        with self._lock, self._exclusive():
+            self._sync()
+            self._set(key, response)
+
+    def _set(self, key: str, response: ChatCompletionResponse):
+        if len(self._index) >= self.max_entries and key not in self._index:
+            self._evict()
+        expires_at = time.time() + self.ttl
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=key, suffix=".tmp")
+        with open(fd, "w", encoding="utf-8") as f:
+            f.write(response.model_dump_json())
+        os.replace(tmp_path, self._entry_path(key))
+        self._index[key] = expires_at
+        with open(self._index_path(), "ab") as f:
+            line = f"{key} {expires_at}\n".encode()
+            f.write(line)
+            # Nobody else appends while we hold the lock, so this is where our copy ends
+            self._inode, self._offset = os.fstat(f.fileno()).st_ino, f.tell()
+        self._log_lines += 1
+        # Overwritten keys leave stale lines behind; compact once they dominate
+        if self._log_lines > 2 * len(self._index) + 1000:
+            self._rewrite_index()
+
+    def _remove(self, key: str):
+        self._index.pop(key, None)
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Drop the tenth of entries closest to expiry and compact the index"""
+        count = max(1, len(self._index) // 10)
+        for key in sorted(self._index, key=self._index.get)[:count]:
+            self._remove(key)
+        self._rewrite_index()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+class ResponseCache:
+    """
+    Two-tier cache of chat completion responses.
+
+    The memory tier is an LRU bounded TTL cache; the optional disk tier
+    holds a much larger working set and survives restarts. Disk hits are
+    promoted back into memory.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600, disk_dir: Optional[str] = None):
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.disk = DiskCache(disk_dir, ttl) if disk_dir else None
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "bypassed": 0,
+        }
+
+    async def get(self, key: str) -> Optional[ChatCompletionResponse]:
+        response = self.memory.get(key)
+        if response is not None:
+            self.stats["memory_hits"] += 1
+            return response
+
+        if self.disk is not None:
+            response = await asyncio.to_thread(self.disk.get, key)
+            if response is not None:
+                self.stats["disk_hits"] += 1
+                self.memory[key] = response
+                return response
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, response: ChatCompletionResponse):
+        self.memory[key] = response
+        self.stats["stores"] += 1
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.set, key, response)
+            except OSError as e:
+                logging.warning(f"Failed to write response cache entry: {e}")
+
+    def snapshot(self) -> Dict[str, int]:
+        """Counters and sizes for the stats endpoint"""
+        return {
+            **self.stats,
+            "memory_entries": len(self.memory),
+            "disk_entries": len(self.disk) if self.disk is not None else 0,
+        }
@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from enum import Enum
+from typing import Awaitable, Callable, Deque, Dict, Iterator, List, Optional
+
+from serverRouter.core.exceptions import CapacityExceededError, CircuitOpenError, is_connection_error, is_timeout, reported_upstream_status
+
+# Buckets per rolling window; counting is O(BUCKETS) regardless of traffic
+BUCKETS = 10
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+def failure_kind(exc: BaseException) -> Optional[str]:
+    """
+    How an upstream call's exception counts against its circuit: "timeout",
+    "failure", or None when it says nothing about the upstream's health.
+    Only timeouts, dropped connections and upstream 5xx/408/429 answers
+    count; local queueing, client errors and local failures without an
+    upstream status (parsing a response, say) don't.
+    """
+    if isinstance(exc, (CapacityExceededError, CircuitOpenError)):
+        return None
+    if getattr(exc, "timed_out", False) or is_timeout(exc):
+        return "timeout"
+    if getattr(exc, "connection_error", False) or is_connection_error(exc):
+        return "failure"
+    status = reported_upstream_status(exc)
+    if status is not None and (status >= 500 or status in (408, 429)):
+        return "failure"
+    return None
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open breaker over a rolling window of call outcomes.
+
+    While closed, the breaker opens once the window holds at least
+    min_calls calls and either the failure rate (timeouts included)
+    reaches failure_threshold or the timeout rate reaches
+    timeout_threshold. An open breaker rejects calls until open_seconds
+    have passed, then lets half_open_calls trial calls through: a
+    success closes it, a failure reopens it for twice as long (up to
+    max_open_seconds). A successful background probe also closes it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: float = 30.0,
+        min_calls: int = 10,
+        failure_threshold: float = 0.5,
+        timeout_threshold: float = 0.25,
+        open_seconds: float = 10.0,
+        max_open_seconds: float = 120.0,
+        half_open_calls: int = 1,
+    ):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.timeout_threshold = timeout_threshold
+        self.base_open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CircuitState.CLOSED
+        self.open_seconds = open_seconds
+        self.opened_at = 0.0
+        self.trials = 0
+        # [bucket start, calls, failures, timeouts]
+        self._buckets: Deque[List[float]] = deque()
+        self.stats = {"opened": 0, "rejected": 0, "probes": 0, "probe_failures": 0}
+
+    def _bucket(self, now: float) -> List[float]:
+        width = self.window / BUCKETS
+        start = now - now % width
+        if not self._buckets or self._buckets[-1][0] != start:
+            self._buckets.append([start, 0, 0, 0])
+            while self._buckets and self._buckets[0][0] <= now - self.window:
+                self._buckets.popleft()
+        return self._buckets[-1]
+
+    def _counts(self, now: float):
+        calls = failures = timeouts = 0
+        for start, bucket_calls, bucket_failures, bucket_timeouts in self._buckets:
+            if start > now - self.window:
+                calls += bucket_calls
+                failures += bucket_failures
+                timeouts += bucket_timeouts
+        return calls, failures, timeouts
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def is_open(self) -> bool:
+        """Whether calls would be rejected right now, without claiming a trial slot"""
+        if self.state == CircuitState.OPEN:
+            return self.retry_after() > 0
+        return self.state == CircuitState.HALF_OPEN and self.trials >= self.half_open_calls
+
+    def allow(self) -> bool:
+        """Admit a call; in half-open state this claims one of the trial slots"""
+        if self.state == CircuitState.CLOSED:
+            return True
+        if self.state == CircuitState.OPEN:
+            if self.retry_after() > 0:
+                self.stats["rejected"] += 1
+                return False
+            self.state = CircuitState.HALF_OPEN
+            self.trials = 0
+            logging.info(f"Circuit {self.name} half-open")
+        if self.trials < self.half_open_calls:
+            self.trials += 1
+            return True
+        self.stats["rejected"] += 1
+        return False
+
+    def release(self):
+        """Give back a trial slot for a call that ended without an outcome"""
+        if self.state == CircuitState.HALF_OPEN and self.trials:
+            self.trials -= 1
+
+    def _open(self, now: float):
+        self.state = CircuitState.OPEN
+        self.opened_at = now
+        self.stats["opened"] += 1
+        logging.warning(f"Circuit {self.name} open for {self.open_seconds:g}s")
+
+    def close(self):
+        if self.state != CircuitState.CLOSED:
+            logging.info(f"Circuit {self.name} closed")
+        self.state = CircuitState.CLOSED
+        self.open_seconds = self.base_open_seconds
+        self.trials = 0
+        self._buckets.clear()
+
+    def record(self, kind: Optional[str]):
+        """Outcome of a call: None for success, "failure" or "timeout\""""
+        now = time.monotonic()
+        if self.state == CircuitState.HALF_OPEN:
+            self.release()
+            if kind is None:
+                self.close()
+            else:
+                self.open_seconds = min(self.max_open_seconds, self.open_seconds * 2)
+                self._open(now)
+            return
+        if self.state == CircuitState.OPEN:
+            # A call that started before the circuit opened
+            return
+
+        bucket = self._bucket(now)
+        bucket[1] += 1
+        if kind is None:
+            return
+        bucket[2] += 1
+        if kind == "timeout":
+            bucket[3] += 1
+        calls, failures, timeouts = self._counts(now)
+        if calls >= self.min_calls and (
+            failures >= calls * self.failure_threshold or timeouts >= calls * self.timeout_threshold
+        ):
+            self._open(now)
+
+    def snapshot(self) -> Dict[str, object]:
+        calls, failures, timeouts = self._counts(time.monotonic())
+        return {
+            "state": self.state.value,
+            "retry_after": round(self.retry_after(), 1) if self.state == CircuitState.OPEN else None,
+            "window_calls": calls,
+            "window_failures": failures,
+            "window_timeouts": timeouts,
+            **self.stats,
+        }
+
+
+class CircuitBreakerRegistry:
+    """Lazily created breakers keyed by provider or model, sharing one configuration"""
+
+    def __init__(self, **breaker_options):
+        self.breaker_options = breaker_options
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, key: str) -> CircuitBreaker:
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            breaker = self.breakers[key] = CircuitBreaker(key, **self.breaker_options)
+        return breaker
+
+    def is_open(self, *keys: str) -> bool:
+        return any(key in self.breakers and self.breakers[key].is_open() for key in keys)
+
+    @contextmanager
+    def guard(self, *keys: str) -> Iterator[None]:
+        """
+        Run the block only if every named breaker admits it, and record its
+        outcome in each. Raises CircuitOpenError, before any upstream
+        work, when one of them is open. Cancelled calls record nothing.
+        """
+        admitted = []
+        for key in keys:
+            breaker = self.get(key)
+            if not breaker.allow():
+                for other in admitted:
+                    other.release()
+                raise CircuitOpenError(key, breaker.retry_after())
+            admitted.append(breaker)
+
+        try:
+            yield
+        except Exception as e:
+            kind = failure_kind(e)
+            for breaker in admitted:
+                if kind is None and isinstance(e, CapacityExceededError):
+                    breaker.release()
+                else:
+                    breaker.record(kind)
+            raise
+        except BaseException:
+            for breaker in admitted:
+                breaker.release()
+            raise
+        for breaker in admitted:
+            breaker.record(None)
+
+    def degraded(self) -> Dict[str, CircuitState]:
+        """States of the breakers that aren't closed"""
+        return {key: breaker.state for key, breaker in self.breakers.items() if breaker.state != CircuitState.CLOSED}
+
+    async def probe(self, check: Callable[[str], Awaitable[Optional[bool]]]):
+        """
+        Run check(key) for every breaker that isn't closed. True closes the
+        breaker, False restarts its open period, None means the key has
+        no probe and is left to half-open trial calls.
+        """
+        for key, breaker in list(self.breakers.items()):
+            if breaker.state == CircuitState.CLOSED:
+                continue
+            try:
+                healthy = await check(key)
+            except Exception as e:
+                logging.debug(f"Probe for circuit {key} failed: {e!r}")
+                healthy = False
+            if healthy is None:
+                continue
+            breaker.stats["probes"] += 1
+            if healthy:
+                breaker.close()
+            else:
+                breaker.stats["probe_failures"] += 1
+                if breaker.state == CircuitState.OPEN:
+                    breaker.opened_at = time.monotonic()
+
+    async def probe_forever(self, interval: float, check: Callable[[str], Awaitable[Optional[bool]]]):
+        """Probe open circuits every interval seconds until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            await self.probe(check)
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        return {key: breaker.snapshot() for key, breaker in self.breakers.items()}
@@ -0,0 +1,157 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from serverRouter.core.deadline import detached_context
+
+T = TypeVar("T")
+
+
+class WaitTimeout(asyncio.TimeoutError):
+    """A caller's own time budget ran out while it waited on a shared call (which keeps running)"""
+
+
+class _Flight:
+    """One in-flight upstream call and the requests waiting on it"""
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+        self.closing = False
+
+
+class SharedStream(Generic[T]):
+    """
+    One upstream stream fanned out to any number of subscribers.
+
+    A background task pumps the source into a buffer. Subscribers replay
+    the buffer from the start and then follow the live tail, so a request
+    that joins late still receives the complete stream. The source is
+    closed once the last subscriber goes away. The source runs outside
+    any request scope, so it is not bound to the request that started it.
+    """
+
+    def __init__(self, source: AsyncIterator[T]):
+        self.chunks: List[T] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.closing = False
+        self._changed = asyncio.Event()
+        self.task = asyncio.get_running_loop().create_task(self._pump(source), context=detached_context())
+
+    async def _pump(self, source: AsyncIterator[T]):
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+            await source.aclose()
+
+    def _notify(self):
+        # Wake everyone waiting on the current event and start a new one
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self) -> AsyncIterator[T]:
+        self.subscribers += 1
+        position = 0
+        try:
+            while True:
+                if position < len(self.chunks):
+                    position += 1
+                    yield self.chunks[position - 1]
+                elif self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                else:
+                    await self._changed.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                self.closing = True
+                self.task.cancel()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent requests onto one upstream call.
+
+    The first request for a key starts the call in its own task; requests
+    for the same key that arrive while it is running attach to it instead
+    of calling upstream. The call runs outside the starting request's
+    scope, and each caller waits only as long as its own timeout allows;
+    the call is cancelled only when every attached request has gone away. Keys are forgotten as soon as the call ends, so
+    this never serves stale results (that is the response cache's job).
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._streams: Dict[str, SharedStream] = {}
+        self.stats = {"calls": 0, "joined": 0, "streams": 0, "stream_joined": 0}
+
+    async def do(self, key: str, call: Callable[[], Awaitable[T]], timeout: Optional[float] = None) -> Tuple[T, bool]:
+        """
+        Run call() once for all concurrent callers with the same key,
+        waiting at most timeout seconds (WaitTimeout) for it.
+
+        Returns:
+            (result, shared) where shared is True for callers that attached
+            to another request's call
+        """
+        flight = self._flights.get(key)
+        shared = flight is not None and not flight.closing
+        if not shared:
+            task = asyncio.get_running_loop().create_task(call(), context=detached_context())
+            flight = self._flights[key] = _Flight(task)
+            flight.task.add_done_callback(lambda _: self._forget(self._flights, key, flight))
+            self.stats["calls"] += 1
+        else:
+            self.stats["joined"] += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight.task), max(0.0, timeout) if timeout is not None else None), shared
+        except asyncio.TimeoutError:
+            if flight.task.done():
+                raise  # the call itself timed out
+            raise WaitTimeout() from None
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.closing = True
+                flight.task.cancel()
+
+    def stream(self, key: str, open_stream: Callable[[], AsyncIterator[T]]) -> Tuple[AsyncIterator[T], bool]:
+        """
+        Subscribe to the in-flight stream for key, starting it if needed.
+
+        Returns:
+            (chunks, shared) where chunks replays everything produced so far
+            and then follows the live stream
+        """
+        stream = self._streams.get(key)
+        shared = stream is not None and not stream.closing
+        if not shared:
+            stream = self._streams[key] = SharedStream(open_stream())
+            stream.task.add_done_callback(lambda _: self._forget(self._streams, key, stream))
+            self.stats["streams"] += 1
+        else:
+            self.stats["stream_joined"] += 1
+        return stream.subscribe(), shared
+
+    @staticmethod
+    def _forget(registry: Dict, key: str, entry):
+        if registry.get(key) is entry:
+            del registry[key]
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "streams_in_flight": len(self._streams),
+            **self.stats,
+        }
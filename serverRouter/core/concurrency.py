@@ -0,0 +1,233 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, List, Optional
+
+from serverRouter.core.exceptions import CapacityExceededError, is_timeout
+
+# Upstream statuses that mean the upstream itself is overloaded
+CONGESTION_STATUSES = frozenset({429, 503, 529})
+
+
+def is_congestion(exc: BaseException) -> bool:
+    """Whether a failed call says the upstream is overloaded: throttling, overload or a timeout"""
+    if getattr(exc, "upstream_status", None) in CONGESTION_STATUSES:
+        return True
+    return bool(getattr(exc, "timed_out", False)) or is_timeout(exc)
+
+
+def _median(values: List[float]) -> float:
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2]
+
+
+class Admission:
+    """
+    One admitted call. The caller sets latency to a congestion signal that
+    doesn't grow with output length (time to first token, seconds per
+    output token); calls that leave it unset only feed back errors.
+    """
+
+    __slots__ = ("latency",)
+
+    def __init__(self):
+        self.latency: Optional[float] = None
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit for one upstream, adjusted by AIMD.
+
+    Calls beyond the current limit wait in a bounded FIFO queue. An
+    upstream 429, 503 or timeout halves the limit (multiplicative
+    decrease), and successes while the limit is being used grow it by
+    roughly one per round of `limit` calls (additive increase). Latency
+    samples are judged a window at a time: when the median of a window of
+    latency_window samples exceeds latency_tolerance times the median of
+    the last baseline_window samples, the limit is trimmed by 10%. A
+    single slow call never counts. Decreases are spaced by a cooldown so
+    one burst of 429s counts once.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: float = 32,
+        min_limit: float = 1,
+        max_limit: float = 512,
+        max_queue: int = 512,
+        queue_timeout: float = 10.0,
+        backoff: float = 0.5,
+        latency_tolerance: float = 2.0,
+        latency_window: int = 20,
+        baseline_window: int = 500,
+        cooldown: float = 1.0,
+    ):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.latency_window = latency_window
+        self.cooldown = cooldown
+        self.in_flight = 0
+        # Median of the long window, and of the last complete short window
+        self.baseline_latency: Optional[float] = None
+        self.window_latency: Optional[float] = None
+        self._baseline: Deque[float] = deque(maxlen=baseline_window)
+        self._window: List[float] = []
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0, "throttled": 0, "latency_decreases": 0}
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < max(1, int(self.limit))
+
+    async def acquire(self):
+        if self._has_capacity() and not self._waiters:
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise CapacityExceededError(self.name, "queue full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats["queued"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # The slot was handed over just as the wait expired
+                self.stats["admitted"] += 1
+                return
+            waiter.cancel()
+            self._waiters.remove(waiter)
+            self.stats["timed_out"] += 1
+            raise CapacityExceededError(self.name, f"no slot within {self.queue_timeout:g}s")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Give back the slot that was handed to us
+                self.in_flight -= 1
+                self._wake()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            raise
+        self.stats["admitted"] += 1
+
+    def release(self, succeeded: bool = False, latency: Optional[float] = None, congested: bool = False):
+        """
+        Free a slot. A success grows the limit and its latency signal (if
+        any) is sampled; congestion shrinks it. Calls that were cancelled
+        or failed for other reasons free the slot without feedback.
+        """
+        self.in_flight -= 1
+        if congested:
+            self.stats["throttled"] += 1
+            self._decrease(self.backoff)
+        elif succeeded:
+            if latency is not None:
+                self._observe(latency)
+            if self.in_flight + 1 >= self.limit / 2:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        self._wake()
+
+    def _observe(self, latency: float):
+        self._window.append(latency)
+        if len(self._window) < self.latency_window:
+            return
+        self.window_latency = _median(self._window)
+        # Judge only against an established baseline; the window joins it
+        # either way, so a lasting shift becomes the new normal
+        if len(self._baseline) >= 5 * self.latency_window and self.baseline_latency is not None:
+            if self.window_latency > self.baseline_latency * self.latency_tolerance:
+                self.stats["latency_decreases"] += 1
+                self._decrease(0.9)
+        self._baseline.extend(self._window)
+        self._window = []
+        self.baseline_latency = _median(list(self._baseline))
+
+    def _decrease(self, factor: float):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * factor)
+
+    def _wake(self):
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "baseline_latency": self.baseline_latency,
+            "window_latency": self.window_latency,
+            **self.stats,
+        }
+
+
+class LimiterRegistry:
+    """Lazily created limiters keyed by provider or model, sharing one configuration"""
+
+    def __init__(self, **limiter_options):
+        self.limiter_options = limiter_options
+        self.limiters: Dict[str, AdaptiveLimiter] = {}
+
+    def get(self, key: str) -> AdaptiveLimiter:
+        limiter = self.limiters.get(key)
+        if limiter is None:
+            limiter = self.limiters[key] = AdaptiveLimiter(key, **self.limiter_options)
+        return limiter
+
+    @asynccontextmanager
+    async def admit(self, *keys: str) -> AsyncIterator[Admission]:
+        """
+        Hold a slot in every named limiter for the duration of the block.
+
+        Limiters are acquired in order. The outcome of the block (success
+        with the Admission's latency signal, or congestion: an upstream
+        429/503 or a timeout) is fed back to each of them. Cancelled calls
+        and other errors release without feedback.
+        """
+        acquired = []
+        try:
+            for key in keys:
+                limiter = self.get(key)
+                await limiter.acquire()
+                acquired.append(limiter)
+        except BaseException:
+            for limiter in acquired:
+                limiter.release()
+            raise
+
+        admission = Admission()
+        succeeded, congested = False, False
+        try:
+            yield admission
+            succeeded = True
+        except Exception as e:
+            congested = is_congestion(e)
+            raise
+        finally:
+            for limiter in acquired:
+                limiter.release(succeeded, admission.latency, congested)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {key: limiter.snapshot() for key, limiter in self.limiters.items()}
@@ -1,5 +1,5 @@
 from typing import List, Optional, Dict, Literal, Union
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from enum import Enum
 
 class ModelProvider(str, Enum):
@@ -9,12 +9,66 @@ class ModelProvider(str, Enum):
     GEMINI = "gemini"
     DEEPSEEK = "deepseek"
 
+class LatencyClass(str, Enum):
+    """Rough response-time tier of a model"""
+    FAST = "fast"
+    STANDARD = "standard"
+    SLOW = "slow"
+
+class ModelPricing(BaseModel):
+    """List prices in USD"""
+    input_per_mtok: Optional[float] = Field(None, description="Per million input tokens")
+    output_per_mtok: Optional[float] = Field(None, description="Per million output tokens")
+    cached_input_per_mtok: Optional[float] = Field(None, description="Per million input tokens read from the provider's prompt cache")
+    per_image: Optional[float] = Field(None, description="Per generated image at the default size and quality")
+
 class ModelInfo(BaseModel):
     """Information about a model"""
     name: str = Field(..., description="Full name/version of the model")
     provider: ModelProvider = Field(..., description="Provider of the model")
     description: str = Field(..., description="Description of the model")
     max_tokens: Optional[int] = Field(None, description="Maximum context length")
+    supports_tools: bool = Field(default=False, description="Whether the router can pass tools to this model")
+    cost_per_mtok: Optional[float] = Field(
+        default=None,
+        description="Blended USD cost per million tokens (3:1 input:output), used by auto:cheap routing"
+    )
+    coalesce: bool = Field(
+        default=False,
+        description="Whether identical concurrent requests to this model share one upstream call"
+    )
+    pricing: Optional[ModelPricing] = Field(default=None, description="List prices")
+    capabilities: List[str] = Field(
+        default_factory=list,
+        description="Features the model supports through the router, e.g. streaming, tools, vision"
+    )
+    latency_class: Optional[LatencyClass] = Field(default=None, description="Rough response-time tier")
+    max_concurrent_images: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="Image models: single-image upstream calls in flight at once, across all requests"
+    )
+
+    @model_validator(mode="after")
+    def _derive_fields(self) -> "ModelInfo":
+        # "tools" in capabilities and supports_tools are the same fact
+        if self.supports_tools and "tools" not in self.capabilities:
+            self.capabilities.append("tools")
+        self.supports_tools = "tools" in self.capabilities
+        pricing = self.pricing
+        if self.cost_per_mtok is None and pricing and pricing.input_per_mtok is not None and pricing.output_per_mtok is not None:
+            self.cost_per_mtok = round((3 * pricing.input_per_mtok + pricing.output_per_mtok) / 4, 4)
+        return self
+
+class ModelAlias(BaseModel):
+    """An ordered group of interchangeable chat models"""
+    members: List[str] = Field(..., description="Model IDs in order of preference")
+    description: str = Field(..., description="Description of the alias")
+    hedge_delay: float = Field(
+        default=2.0,
+        gt=0,
+        description="Seconds before a hedge request is sent, used until enough latency samples exist"
+    )
 
 ## Chat Completion Models
 
@@ -22,6 +76,10 @@ class ChatMessage(BaseModel):
     """Represents a single message in a chat conversation"""
     role: str = Field(..., description="Role of the message sender (e.g. 'user', 'assistant', 'system')")
     content: str = Field(..., description="Content of the message")
+    cache_control: Optional[Dict[str, str]] = Field(
+        default=None,
+        description="Prompt-cache breakpoint after this message, e.g. {'type': 'ephemeral'} (Anthropic only)"
+    )
 
 class ToolFunctionParameters(BaseModel):
     type: Literal["object"] = Field(default="object")
@@ -57,6 +115,11 @@ class ChatCompletionRequest(BaseModel):
         default=None,
         description="Response format specification (e.g., {'type': 'json_object'})"
     )
+    timeout: Optional[float] = Field(
+        default=None,
+        gt=0,
+        description="Seconds to wait for the whole request before it fails with 504 and upstream work is cancelled (also settable with X-Request-Timeout)"
+    )
 
 class ToolCall(BaseModel):
     id: str
@@ -77,6 +140,72 @@ class ChatCompletionResponse(BaseModel):
         description="Token usage statistics"
     )
 
+class ChatCompletionChunk(BaseModel):
+    """A single incremental piece of a streamed chat completion"""
+    model: str = Field(..., description="Name of the model used")
+    provider: str = Field(..., description="Provider that generated the chunk")
+    delta: str = Field(default="", description="Content generated since the previous chunk")
+    tool_calls: Optional[List[ToolCall]] = Field(
+        default=None,
+        description="Completed tool calls (only sent on the final chunk)"
+    )
+    finish_reason: Optional[str] = Field(
+        default=None,
+        description="Why generation stopped (only set on the final chunk)"
+    )
+    usage: Optional[Dict[str, int]] = Field(
+        default=None,
+        description="Token usage statistics (only set on the final chunk)"
+    )
+
+class ChatCompletionBatchRequest(BaseModel):
+    """A batch of independent chat completion requests"""
+    requests: List[ChatCompletionRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=1000,
+        description="Requests to run; they may target different models"
+    )
+    stream: bool = Field(
+        default=False,
+        description="Stream results as NDJSON lines in completion order instead of one ordered response"
+    )
+
+class BatchItemError(BaseModel):
+    """Error for a single batch item"""
+    status_code: int = Field(..., description="HTTP status the item would have returned on its own")
+    detail: str = Field(..., description="Error message")
+
+class ChatCompletionBatchItem(BaseModel):
+    """Result for a single batch item: a response or an error"""
+    index: int = Field(..., description="Position of the request in the batch")
+    response: Optional[ChatCompletionResponse] = Field(default=None, description="Completion, if the item succeeded")
+    error: Optional[BatchItemError] = Field(default=None, description="Error, if the item failed")
+
+class ChatCompletionBatchResponse(BaseModel):
+    """Results of a batch, in request order"""
+    results: List[ChatCompletionBatchItem] = Field(..., description="One result per request")
+
+## Tokenization Models
+
+class TokenizeRequest(BaseModel):
+    """Texts and/or a chat prompt to count tokens for with a model's tokenizer"""
+    model: str = Field(..., description="Chat model ID whose tokenizer to use")
+    texts: List[str] = Field(default_factory=list, max_length=4096, description="Texts to count individually")
+    messages: Optional[List[ChatMessage]] = Field(
+        default=None,
+        description="Chat messages to count as one prompt, including formatting overhead"
+    )
+
+class TokenizeResponse(BaseModel):
+    """Token counts for a TokenizeRequest"""
+    model: str = Field(..., description="Model ID the counts apply to")
+    encoding: str = Field(..., description="Tokenizer encoding used, or 'heuristic' when none was available")
+    exact: bool = Field(..., description="Whether counts are exact or estimated (non-OpenAI models)")
+    counts: List[int] = Field(..., description="Token count of each text, in order")
+    prompt_tokens: Optional[int] = Field(default=None, description="Prompt tokens for messages, if given")
+    context_length: Optional[int] = Field(default=None, description="Model's maximum context length")
+
 ## Image Generation Models
 class ImageSize(str, Enum):
     """Supported image sizes"""
@@ -94,9 +223,41 @@ class ImageGenerationRequest(BaseModel):
     #They are optional because they are only needed for Gemini.
     google_cloud_project_id: Optional[str] = Field(None, description="Google Cloud Project ID (required for Gemini)") # Added field
     google_cloud_location: Optional[str] = Field(None, description="Google Cloud Location (required for Gemini)") # Added field
+    background: bool = Field(
+        default=False,
+        description="Return a job right away (202) and generate in the background; poll /v1/images/jobs/{id} for the result"
+    )
+
+class ImageError(BaseModel):
+    """Failure of one image in a multi-image request"""
+    index: int = Field(..., description="Position of the image in the request (0 to n-1)")
+    status_code: int = Field(..., description="HTTP status the image's call failed with")
+    detail: str = Field(..., description="Error message")
 
 class ImageGenerationResponse(BaseModel):
     """Response from an image generation request"""
     urls: List[str] = Field(..., description="URLs of the generated images")
     model: str = Field(..., description="Name of the model used")
-    provider: str = Field(..., description="Provider that generated the images")
\ No newline at end of file
+    provider: str = Field(..., description="Provider that generated the images")
+    errors: Optional[List[ImageError]] = Field(
+        default=None,
+        description="Images that failed while others succeeded; urls then holds fewer than n"
+    )
+
+class ImageJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class ImageJob(BaseModel):
+    """A background image generation request and, once finished, its outcome"""
+    id: str = Field(..., description="Job ID to poll")
+    status: ImageJobStatus = Field(default=ImageJobStatus.QUEUED, description="queued, running, succeeded or failed")
+    model: str = Field(..., description="Requested model")
+    n: int = Field(..., description="Images requested")
+    completed: int = Field(default=0, description="Images finished so far, successfully or not")
+    created_at: float = Field(..., description="Unix time the job was accepted")
+    finished_at: Optional[float] = Field(default=None, description="Unix time the job finished")
+    result: Optional[ImageGenerationResponse] = Field(default=None, description="Generated images, once succeeded")
+    error: Optional[BatchItemError] = Field(default=None, description="Why the job failed, if it did")
\ No newline at end of file
@@ -0,0 +1,181 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import Context, ContextVar, copy_context
+from typing import Iterator, Mapping, Optional
+
+from fastapi import HTTPException
+from starlette.types import Receive
+
+from serverRouter.core.exceptions import ClientDisconnectedError, DeadlineExceededError
+
+# Seconds the client is willing to wait for the whole request
+TIMEOUT_HEADER = "x-request-timeout"
+
+# Provider timeouts run this much past the deadline, so the scope's own
+# cancellation wins and a call cut short by the client's deadline isn't
+# counted as an upstream timeout (by circuit breakers, for one)
+UPSTREAM_GRACE = 0.25
+
+
+def request_timeout(
+    headers: Mapping[str, str],
+    requested: Optional[float] = None,
+    default: Optional[float] = None,
+    maximum: Optional[float] = None,
+) -> Optional[float]:
+    """
+    The request's time budget in seconds: the smaller of the
+    X-Request-Timeout header and the body's timeout field, else default,
+    at most maximum. None (or 0) means no deadline.
+    """
+    timeout = requested
+    header = headers.get(TIMEOUT_HEADER)
+    if header is not None:
+        try:
+            value = float(header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid X-Request-Timeout: {header!r}")
+        if value <= 0:
+            raise HTTPException(status_code=400, detail="X-Request-Timeout must be positive")
+        timeout = value if timeout is None else min(timeout, value)
+    if timeout is None:
+        timeout = default or None
+    if maximum and (timeout is None or timeout > maximum):
+        timeout = maximum
+    return timeout
+
+
+class RequestScope:
+    """
+    Deadline and client-disconnect cancellation for one request.
+
+    Upstream work runs inside armed() blocks. When the deadline passes or
+    the client disconnects (seen by a task waiting on the ASGI receive
+    channel), the task in the armed block is cancelled, which cancels
+    the SDK call or stream it awaits, and the block raises
+    DeadlineExceededError or ClientDisconnectedError instead. If no block
+    is armed at that moment the next one raises on entry, so code between
+    blocks (writing a streamed chunk, say) is never interrupted. Tasks
+    started from the creating context see the scope via current_scope();
+    a scope created under another one (a batch item) is its child.
+    requested marks a deadline the client asked for, rather than a server
+    default or cap.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, receive: Optional[Receive] = None, requested: bool = False):
+        self.parent = _CURRENT.get()
+        self.requested = requested or (self.parent is not None and self.parent.requested)
+        # A child's deadline is never later than its parent's
+        if self.parent is not None and self.parent.deadline is not None:
+            inherited = max(0.0, self.parent.deadline - time.monotonic())
+            timeout = inherited if not timeout else min(timeout, inherited)
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        # "deadline" or "disconnect" once the request has been abandoned
+        self.reason: Optional[str] = None
+        self._armed: Optional[asyncio.Task] = None
+        self._cancelled: Optional[asyncio.Task] = None
+        # loop.call_later rather than call_at: uvloop's clock isn't time.monotonic()
+        self._timer = asyncio.get_running_loop().call_later(timeout, self._abandon, "deadline") if timeout is not None else None
+        self._watcher = asyncio.ensure_future(self._watch(receive)) if receive is not None else None
+        _CURRENT.set(self)
+
+    async def _watch(self, receive: Receive):
+        # The body has already been read, so the next message is the disconnect
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                self._abandon("disconnect")
+                return
+
+    def _abandon(self, reason: str):
+        if self.reason is not None:
+            return
+        self.reason = reason
+        if self._armed is not None and not self._armed.done():
+            self._cancelled = self._armed
+            self._armed.cancel()
+
+    def _error(self) -> Exception:
+        return DeadlineExceededError(self.timeout) if self.reason == "deadline" else ClientDisconnectedError()
+
+    def cause(self) -> Optional[str]:
+        """Why this request, or the one it is part of, was abandoned, if it was"""
+        scope = self
+        while scope is not None:
+            if scope.reason is not None:
+                return scope.reason
+            scope = scope.parent
+        return None
+
+    def remaining(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def check(self):
+        """Raise if the request has been abandoned or its deadline has passed"""
+        if self.reason is None and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.reason = "deadline"
+        if self.reason is not None:
+            raise self._error()
+
+    def clamp(self, timeout: float) -> float:
+        """An upstream call's timeout, cut to the time left (plus a grace period)"""
+        self.check()
+        remaining = self.remaining()
+        return timeout if remaining is None else min(timeout, remaining + UPSTREAM_GRACE)
+
+    @contextmanager
+    def armed(self) -> Iterator[None]:
+        """Let the block be cancelled when the request is abandoned; not reentrant"""
+        self.check()
+        task = asyncio.current_task()
+        self._armed = task
+        try:
+            yield
+        except asyncio.CancelledError:
+            if self._cancelled is task:
+                self._cancelled = None
+                # Only ours: any other pending cancellation keeps propagating
+                if task.uncancel() == 0:
+                    raise self._error() from None
+            raise
+        finally:
+            self._armed = None
+            if self._cancelled is task:
+                # Cancelled, but the block swallowed it and finished anyway
+                self._cancelled = None
+                task.uncancel()
+
+    def close(self):
+        """Stop the deadline timer and the disconnect watcher; idempotent"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+
+_CURRENT: ContextVar[Optional[RequestScope]] = ContextVar("omni_request_scope", default=None)
+
+
+def current_scope() -> Optional[RequestScope]:
+    return _CURRENT.get()
+
+
+def current_deadline() -> Optional[float]:
+    """The current request's deadline as a time.monotonic() instant, if it has one"""
+    scope = _CURRENT.get()
+    return None if scope is None else scope.deadline
+
+
+def detached_context() -> Context:
+    """
+    A copy of the current context outside any request scope, for work
+    shared between requests: it must not inherit one request's deadline,
+    timeout clamp or disconnect.
+    """
+    context = copy_context()
+    context.run(_CURRENT.set, None)
+    return context
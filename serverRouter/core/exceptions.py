@@ -1,3 +1,8 @@
+import asyncio
+import math
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
 from fastapi import HTTPException
 
 class ProviderNotFoundException(HTTPException):
@@ -8,10 +13,132 @@ class ProviderNotFoundException(HTTPException):
             detail=f"Unknown provider: {provider_name}"
         )
 
+def upstream_status(exc: Optional[BaseException]) -> Optional[int]:
+    """Best-effort HTTP status of an SDK exception (openai/anthropic status_code, google code)"""
+    for attr in ("status_code", "code"):
+        status = getattr(exc, attr, None)
+        if isinstance(status, int) and 100 <= status < 600:
+            return status
+    return None
+
+def reported_upstream_status(exc: Optional[BaseException]) -> Optional[int]:
+    """
+    The HTTP status the upstream actually answered with, if exc carries
+    one: a ProviderError's recorded upstream status, or an unwrapped SDK
+    exception's own. The router's HTTPExceptions (a ProviderError's own
+    500 included) are local and have none.
+    """
+    if hasattr(exc, "upstream_status"):
+        return exc.upstream_status
+    if isinstance(exc, HTTPException):
+        return None
+    return upstream_status(exc)
+
+def retry_after_seconds(exc: Optional[BaseException]) -> Optional[float]:
+    """
+    Parse the upstream response's retry-after-ms (OpenAI, Anthropic) or
+    Retry-After header, in seconds or as an HTTP date, if any.
+    """
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after-ms")) / 1000
+    except (TypeError, ValueError):
+        pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def is_timeout(exc: Optional[BaseException]) -> bool:
+    """Whether an exception represents an upstream timeout in any SDK"""
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    # openai/anthropic APITimeoutError, google DeadlineExceeded, httpx *Timeout
+    return exc is not None and ("Timeout" in type(exc).__name__ or type(exc).__name__ == "DeadlineExceeded")
+
+def is_connection_error(exc: Optional[BaseException]) -> bool:
+    """Whether an exception is a failure to reach the upstream or a dropped connection, in any SDK"""
+    if exc is None:
+        return False
+    # openai/anthropic APIConnectionError, httpx ConnectError/ReadError/RemoteProtocolError, builtin ConnectionError
+    name = type(exc).__name__
+    return "Connection" in name or name in ("ConnectError", "ReadError", "WriteError", "RemoteProtocolError")
+
 class ProviderError(HTTPException):
-    """Raised when a provider encounters an error"""
-    def __init__(self, message: str):
+    """
+    Raised when a provider encounters an error.
+
+    When the underlying SDK exception is passed as cause, its upstream HTTP
+    status, Retry-After, timeout and connection-failure nature are kept for
+    the router's resilience layers. Upstream 429s are surfaced to the client
+    as 429 and overload (503, Anthropic's 529) as 503.
+    """
+    def __init__(self, message: str, cause: Optional[BaseException] = None):
+        self.upstream_status = upstream_status(cause)
+        self.retry_after = retry_after_seconds(cause)
+        self.timed_out = is_timeout(cause)
+        self.connection_error = is_connection_error(cause)
+        if self.upstream_status == 429:
+            status_code = 429
+        elif self.upstream_status in (503, 529):
+            status_code = 503
+        else:
+            status_code = 500
+        super().__init__(
+            status_code=status_code,
+            detail=message,
+            headers={"Retry-After": str(int(self.retry_after))} if self.retry_after is not None else None
+        )
+
+class CapacityExceededError(HTTPException):
+    """Raised when a request cannot be admitted to an upstream within its queue budget"""
+    def __init__(self, name: str, reason: str, retry_after: int = 1):
+        super().__init__(
+            status_code=503,
+            detail=f"Upstream capacity exhausted for {name}: {reason}",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+class RateLimitExceededError(HTTPException):
+    """Raised when an API key is over one of its rate limits or quotas"""
+    def __init__(self, detail: str, retry_after: float, headers: Optional[dict] = None):
+        super().__init__(
+            status_code=429,
+            detail=detail,
+            headers={**(headers or {}), "Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+class CircuitOpenError(HTTPException):
+    """Raised without calling upstream when a model's or provider's circuit breaker is open"""
+    def __init__(self, name: str, retry_after: float):
         super().__init__(
-            status_code=500,
-            detail=message
-        ) 
\ No newline at end of file
+            status_code=503,
+            detail=f"Circuit open for {name}: recent calls are failing",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+class DeadlineExceededError(HTTPException):
+    """Raised when a request's deadline passes before it completes; its upstream work is cancelled"""
+    def __init__(self, timeout: float):
+        super().__init__(
+            status_code=504,
+            detail=f"Request deadline of {timeout:g}s exceeded"
+        )
+
+class ClientDisconnectedError(HTTPException):
+    """Raised when the client goes away mid-request; 499 as in nginx, though nobody is left to read it"""
+    def __init__(self):
+        super().__init__(
+            status_code=499,
+            detail="Client closed request"
+        )
@@ -0,0 +1,95 @@
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class LatencyTracker:
+    """
+    Rolling window of successful call latencies per alias.
+
+    The p95 of the window is used as the hedge delay: a request that has
+    not answered by then is in the slow tail and worth duplicating.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, key: str, seconds: float):
+        self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, key: str, q: float) -> Optional[float]:
+        """Return the q-th percentile, or None until min_samples are collected"""
+        samples = self._samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    def hedge_delay(self, key: str, default: float) -> float:
+        p95 = self.percentile(key, 95)
+        return p95 if p95 is not None else default
+
+
+async def hedged_call(
+    candidates: Sequence[T],
+    call: Callable[[T], Awaitable[R]],
+    hedge_delay: Optional[float],
+    max_in_flight: int = 2,
+) -> Tuple[T, R]:
+    """
+    Call candidates in order until one succeeds, hedging slow attempts.
+
+    The first candidate is started immediately. If it has not finished
+    after hedge_delay seconds the next candidate is started alongside it,
+    up to max_in_flight concurrent attempts. A failed attempt is
+    immediately replaced by the next candidate. The first success wins
+    and every other attempt is cancelled. With hedge_delay None the
+    candidates are only used as an ordered fallback chain.
+
+    Returns:
+        (candidate, result) of the winning attempt
+
+    Raises:
+        The last error if every candidate failed.
+    """
+    remaining: List[T] = list(candidates)
+    pending: Dict[asyncio.Task, T] = {}
+    last_error: Optional[BaseException] = None
+
+    def launch():
+        candidate = remaining.pop(0)
+        pending[asyncio.ensure_future(call(candidate))] = candidate
+
+    if not remaining:
+        raise ValueError("hedged_call needs at least one candidate")
+    launch()
+    try:
+        while pending:
+            can_hedge = hedge_delay is not None and remaining and len(pending) < max_in_flight
+            done, _ = await asyncio.wait(
+                pending,
+                timeout=hedge_delay if can_hedge else None,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                launch()
+                continue
+
+            for task in done:
+                candidate = pending.pop(task)
+                if task.exception() is None:
+                    return candidate, task.result()
+                last_error = task.exception()
+                # Replace the failed attempt rather than widening the fan-out
+                if remaining:
+                    launch()
+
+        raise last_error
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,387 @@
+import asyncio
+import hashlib
+import logging
+import mmap
+import multiprocessing
+import os
+import re
+import secrets
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import httpx
+from starlette.responses import FileResponse
+from starlette.types import Send
+
+from serverRouter.core.coalescing import SingleFlight
+
+# Extension and media type by leading bytes; anything else isn't stored
+IMAGE_TYPES = {"png": "image/png", "jpg": "image/jpeg", "webp": "image/webp", "gif": "image/gif"}
+
+BLOB_NAME = re.compile(r"^[0-9a-f]{64}\.(png|jpg|webp|gif)$")
+
+# Stored images never change under their name
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """The stored extension for an image's first bytes, or None if it isn't one we keep"""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    return None
+
+
+def make_thumbnail(source: str, target: str, size: int) -> int:
+    """
+    Write a WebP of source that fits in size x size to target and return
+    its length. Runs in the thumbnail pool, so it only takes paths.
+    """
+    # Imported here: only pool workers pay for Pillow
+    from PIL import Image
+
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    with Image.open(source) as image:
+        image.thumbnail((size, size))
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        image.save(tmp_path, "WEBP", quality=80, method=4)
+    os.replace(tmp_path, target)
+    return os.path.getsize(target)
+
+
+class StoredImage(NamedTuple):
+    name: str
+    size: int
+    deduplicated: bool
+
+
+class MappedFileResponse(FileResponse):
+    """
+    FileResponse that sends the file from a read-only memory map.
+
+    Body chunks are memoryview slices of the map, so file pages go from
+    the page cache to the socket without a read() into a fresh buffer,
+    and without a thread hop per chunk. Range, If-Range and HEAD handling
+    is FileResponse's; multi-range requests still use its chunked reads.
+    ASGI servers that accept bytes-like bodies (uvicorn does) are assumed.
+    """
+
+    chunk_size = 1024 * 1024
+
+    async def _send_mapped(self, send: Send, start: int, end: int):
+        with open(self.path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Not closed explicitly: the server may still hold a slice after
+        # send() returns, and the map is unmapped once the last one is dropped
+        view = memoryview(mapped)
+        for offset in range(start, end, self.chunk_size):
+            stop = min(offset + self.chunk_size, end)
+            await send({"type": "http.response.body", "body": view[offset:stop], "more_body": stop < end})
+
+    async def _handle_simple(self, send: Send, send_header_only: bool) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        size = self.stat_result.st_size
+        if send_header_only or size == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        else:
+            await self._send_mapped(send, 0, size)
+
+    async def _handle_single_range(
+        self, send: Send, start: int, end: int, file_size: int, send_header_only: bool
+    ) -> None:
+        self.headers["content-range"] = f"bytes {start}-{end - 1}/{file_size}"
+        self.headers["content-length"] = str(end - start)
+        await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+        if send_header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        else:
+            await self._send_mapped(send, start, end)
+
+
+class ImageStore:
+    """
+    Content-addressed local copies of generated images.
+
+    Images are downloaded from the provider's URL and kept under their
+    SHA-256 as blobs/<ab>/<sha256>.<ext>, so the same image is only stored
+    once; thumbnails are cached next to them as thumbs/<ab>/<sha256>-<size>.webp
+    and rendered by Pillow in a process pool. Blobs and thumbnails are
+    evicted least recently used first once they take more than max_bytes.
+    Each worker keeps its own recency order (rebuilt from file times on
+    start), so with several workers eviction order is approximate.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        max_image_bytes: int = 32 * 1024 * 1024,
+        download_timeout: float = 60.0,
+        thumbnail_sizes: Sequence[int] = (128, 256, 512),
+        thumbnail_workers: int = 2,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_image_bytes = max_image_bytes
+        self.download_timeout = download_timeout
+        self.thumbnail_sizes = tuple(sorted(thumbnail_sizes))
+        self.thumbnail_workers = thumbnail_workers
+        # Relative path -> bytes, least recently used first
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+        self._loaded: Optional[asyncio.Future] = None
+        self._pool: Optional[Executor] = None
+        self._thumbnails = SingleFlight()
+        self.stats = {
+            "stored": 0, "deduplicated": 0, "download_failures": 0, "hits": 0, "misses": 0,
+            "thumbnails": 0, "thumbnail_failures": 0, "evicted": 0,
+        }
+        os.makedirs(os.path.join(directory, "tmp"), exist_ok=True)
+
+    @staticmethod
+    def _blob(name: str) -> str:
+        return os.path.join("blobs", name[:2], name)
+
+    @staticmethod
+    def _thumb(name: str, size: int) -> str:
+        return os.path.join("thumbs", name[:2], f"{name.split('.')[0]}-{size}.webp")
+
+    def _path(self, relative: str) -> str:
+        return os.path.join(self.directory, relative)
+
+    def _scan(self) -> List[Tuple[float, str, int]]:
+        """Files already on disk, oldest first; abandoned temp files are removed"""
+        files = []
+        # Other workers may be downloading into tmp right now
+        stale = time.time() - 3600
+        for top in ("blobs", "thumbs", "tmp"):
+            for root, _, names in os.walk(self._path(top)):
+                for name in names:
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                        if top == "tmp":
+                            if stat.st_mtime < stale:
+                                os.remove(path)
+                            continue
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, os.path.relpath(path, self.directory), stat.st_size))
+        files.sort()
+        return files
+
+    async def _load(self):
+        for _, relative, size in await asyncio.to_thread(self._scan):
+            self._add(relative, size)
+        logging.info(f"Image store {self.directory}: {len(self._files)} files, {self.total_bytes} bytes")
+
+    async def _ensure_loaded(self):
+        # One scan shared by concurrent first callers; cheap once done. A
+        # cancelled caller doesn't cancel it, and a failed one is retried
+        # by the next caller.
+        if self._loaded is None:
+            self._loaded = asyncio.ensure_future(self._load())
+        loaded = self._loaded
+        try:
+            await asyncio.shield(loaded)
+        except Exception:
+            if self._loaded is loaded:
+                self._loaded = None
+            raise
+
+    def _touch(self, relative: str) -> bool:
+        if relative not in self._files:
+            return False
+        self._files.move_to_end(relative)
+        return True
+
+    def _add(self, relative: str, size: int):
+        previous = self._files.pop(relative, 0)
+        self._files[relative] = size
+        self.total_bytes += size - previous
+
+    def _forget(self, relative: str):
+        self.total_bytes -= self._files.pop(relative, 0)
+
+    async def _evict(self):
+        """Remove the least recently used files until the store fits in max_bytes"""
+        victims = []
+        # Never the file just added, which is last
+        while self.total_bytes > self.max_bytes and len(self._files) > 1:
+            relative, size = self._files.popitem(last=False)
+            self.total_bytes -= size
+            victims.append(relative)
+        if not victims:
+            return
+
+        def remove():
+            for relative in victims:
+                try:
+                    os.remove(self._path(relative))
+                except OSError:
+                    pass
+
+        await asyncio.to_thread(remove)
+        self.stats["evicted"] += len(victims)
+
+    async def _download(self, client: httpx.AsyncClient, url: str, tmp_path: str) -> Tuple[str, int]:
+        digest = hashlib.sha256()
+        extension = None
+        size = 0
+        with open(tmp_path, "wb") as f:
+            async with client.stream("GET", url, timeout=self.download_timeout) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes(256 * 1024):
+                    if extension is None:
+                        extension = sniff_image_type(chunk)
+                        if extension is None:
+                            raise ValueError(f"Not a PNG, JPEG, WebP or GIF image: {url}")
+                    size += len(chunk)
+                    if size > self.max_image_bytes:
+                        raise ValueError(f"Image larger than {self.max_image_bytes} bytes: {url}")
+                    digest.update(chunk)
+                    # Chunks are small enough that a blocking write beats a thread hop per chunk
+                    f.write(chunk)
+        if extension is None:
+            raise ValueError(f"Empty image: {url}")
+        return f"{digest.hexdigest()}.{extension}", size
+
+    async def store(self, client: httpx.AsyncClient, url: str) -> StoredImage:
+        """Download url into the store, hashing as it streams, and return its blob"""
+        await self._ensure_loaded()
+        tmp_path = self._path(os.path.join("tmp", secrets.token_hex(8)))
+        try:
+            name, size = await self._download(client, url, tmp_path)
+            relative = self._blob(name)
+            path = self._path(relative)
+            if self._touch(relative) or await asyncio.to_thread(os.path.exists, path):
+                # Already stored (possibly by another worker): keep that copy, refresh its age
+                await asyncio.to_thread(os.utime, path)
+                self._add(relative, size)
+                self.stats["deduplicated"] += 1
+                return StoredImage(name, size, True)
+
+            def commit():
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+
+            await asyncio.to_thread(commit)
+            self._add(relative, size)
+            self.stats["stored"] += 1
+            await self._evict()
+            return StoredImage(name, size, False)
+        except BaseException:
+            self.stats["download_failures"] += 1
+            raise
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    async def store_all(self, client: httpx.AsyncClient, urls: List[str]) -> List[Optional[StoredImage]]:
+        """store() each URL concurrently; a failed one is logged and comes back as None"""
+        results = await asyncio.gather(*(self.store(client, url) for url in urls), return_exceptions=True)
+        stored = []
+        for url, result in zip(urls, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result
+                logging.warning(f"Could not store image {url}: {result!r}")
+                result = None
+            stored.append(result)
+        return stored
+
+    async def _lookup(self, relative: str) -> Optional[Tuple[str, os.stat_result]]:
+        path = self._path(relative)
+        try:
+            stat = await asyncio.to_thread(os.stat, path)
+        except OSError:
+            # Evicted, possibly by another worker
+            self._forget(relative)
+            return None
+        if not self._touch(relative):
+            self._add(relative, stat.st_size)
+        return path, stat
+
+    async def open(self, name: str) -> Optional[Tuple[str, os.stat_result]]:
+        """Path and stat of a stored image, or None if it isn't (or no longer is) stored"""
+        if not BLOB_NAME.match(name):
+            return None
+        await self._ensure_loaded()
+        found = await self._lookup(self._blob(name))
+        self.stats["hits" if found is not None else "misses"] += 1
+        return found
+
+    def thumbnail_size(self, requested: int) -> int:
+        """The smallest configured thumbnail size at least as large as requested"""
+        for size in self.thumbnail_sizes:
+            if size >= requested:
+                return size
+        return self.thumbnail_sizes[-1]
+
+    def _executor(self) -> Optional[Executor]:
+        if self._pool is None and self.thumbnail_workers > 0:
+            # spawn rather than fork: the workers don't inherit the event loop or its threads
+            self._pool = ProcessPoolExecutor(self.thumbnail_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def _render(self, source: str, relative: str, size: int) -> int:
+        path = self._path(relative)
+        await asyncio.to_thread(os.makedirs, os.path.dirname(path), exist_ok=True)
+        # No pool configured: Pillow releases the GIL while resizing, so a thread will do
+        pool = self._executor()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, make_thumbnail, source, path, size)
+        except BrokenProcessPool:
+            # A worker died (out of memory on a huge image, say); start a fresh pool next time
+            if self._pool is pool:
+                self._pool = None
+            raise
+
+    async def thumbnail(self, name: str, size: int) -> Optional[Tuple[str, os.stat_result]]:
+        """
+        Path and stat of the image's thumbnail at size (one of
+        thumbnail_sizes), rendered on first request; None if the image
+        isn't stored.
+        """
+        found = await self.open(name)
+        if found is None:
+            return None
+        relative = self._thumb(name, size)
+        cached = await self._lookup(relative)
+        if cached is not None:
+            return cached
+        try:
+            length, shared = await self._thumbnails.do(relative, lambda: self._render(found[0], relative, size))
+        except Exception:
+            self.stats["thumbnail_failures"] += 1
+            raise
+        if not shared:
+            self._add(relative, length)
+            self.stats["thumbnails"] += 1
+            await self._evict()
+        return await self._lookup(relative)
+
+    async def aclose(self):
+        """Stop the thumbnail workers (on shutdown)"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "directory": self.directory,
+            "files": len(self._files),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "thumbnail_sizes": list(self.thumbnail_sizes),
+            **self.stats,
+        }
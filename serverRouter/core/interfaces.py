@@ -1,13 +1,58 @@
 from abc import ABC, abstractmethod
-from .datamodels import ChatCompletionRequest, ChatCompletionResponse, ImageGenerationRequest, ImageGenerationResponse
+from typing import AsyncIterator, Dict, NamedTuple, Optional
+from .datamodels import ChatCompletionRequest, ChatCompletionResponse, ChatCompletionChunk, ImageGenerationRequest, ImageGenerationResponse
 
 class ChatProvider(ABC):
     """Abstract base class for chat completion providers"""
     
     @abstractmethod
-    async def chat_complete(self, request: ChatCompletionRequest) -> ChatCompletionResponse:
+    async def chat_complete(self, request: ChatCompletionRequest, timeout: Optional[float] = None) -> ChatCompletionResponse:
         """
-        Generate a chat completion response for the given request
+        Generate a chat completion response for the given request.
+
+        timeout bounds the upstream call in seconds; None keeps the SDK default.
+        """
+        pass
+
+    async def chat_stream(self, request: ChatCompletionRequest, timeout: Optional[float] = None) -> AsyncIterator[ChatCompletionChunk]:
+        """
+        Stream a chat completion as a sequence of chunks.
+
+        Providers without native streaming fall back to a single chunk
+        carrying the whole completion.
+        """
+        response = await self.chat_complete(request, timeout=timeout)
+        yield ChatCompletionChunk(
+            model=response.model,
+            provider=response.provider,
+            delta=response.content,
+            tool_calls=response.tool_calls,
+            finish_reason="stop",
+            usage=response.usage
+        )
+
+class RawChatCompletion(NamedTuple):
+    """An upstream response body forwarded as-is, with the usage the router needs for accounting"""
+    body: bytes
+    usage: Dict[str, int]
+
+class PassthroughChatProvider(ABC):
+    """Providers whose upstream already speaks the OpenAI chat completions schema"""
+
+    @abstractmethod
+    async def chat_complete_raw(self, request: ChatCompletionRequest, timeout: Optional[float] = None) -> RawChatCompletion:
+        """
+        Generate a chat completion and return the upstream JSON body unparsed.
+        """
+        pass
+
+class ProbedProvider(ABC):
+    """Providers with a cheap health check that costs no tokens"""
+
+    @abstractmethod
+    async def probe(self, timeout: float) -> None:
+        """
+        Make a minimal authenticated call to the upstream; raise if it fails.
         """
         pass
 
@@ -15,13 +60,8 @@ class ImageProvider(ABC):
     """Abstract base class for image generation providers"""
     
     @abstractmethod
-    async def generate_image(self, request: ImageGenerationRequest) -> ImageGenerationResponse:
+    async def generate_image(self, request: ImageGenerationRequest, timeout: Optional[float] = None) -> ImageGenerationResponse:
         """
         Generate an image based on the given request
         """
         pass
-
-
-
-
-
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import logging
+import os
+import secrets
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from serverRouter.core.datamodels import BatchItemError, ImageGenerationResponse, ImageJob, ImageJobStatus
+from serverRouter.core.exceptions import CapacityExceededError
+
+
+class ImageJobStore:
+    """
+    Background image generation jobs.
+
+    Each job runs as a task in the worker that accepted it and is written
+    to <directory>/<id>.json whenever it changes, so a poll that lands on
+    any worker (or arrives after a restart) can answer it. Jobs are only
+    visible to the API key that created them and are deleted ttl seconds
+    after they were created. A job still running when its worker shuts
+    down is recorded as failed.
+    """
+
+    def __init__(self, directory: str, ttl: float = 3600.0, max_running: int = 64):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_running = max_running
+        self._running: Dict[str, asyncio.Task] = {}
+        self._last_sweep = 0.0
+        self.stats = {"submitted": 0, "succeeded": 0, "failed": 0, "rejected": 0, "expired": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _write(self, owner: str, job: ImageJob):
+        path = self._path(job.id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"owner": owner, "job": job.model_dump(mode="json")}))
+        os.replace(tmp_path, path)
+
+    def _read(self, job_id: str, owner: str) -> Optional[ImageJob]:
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("owner") != owner:
+            return None
+        job = ImageJob.model_validate(entry["job"])
+        if job.created_at + self.ttl <= time.time():
+            return None
+        return job
+
+    def _sweep(self):
+        """Delete job files older than the TTL"""
+        cutoff = time.time() - self.ttl
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff and name[:-5] not in self._running:
+                    os.remove(path)
+                    self.stats["expired"] += 1
+            except OSError:
+                pass
+
+    async def submit(
+        self,
+        owner: str,
+        model: str,
+        n: int,
+        work: Callable[[Callable[[], None]], Awaitable[ImageGenerationResponse]]
+    ) -> ImageJob:
+        """
+        Start work(progress) in the background and return its queued job.
+        work calls progress() as each image finishes.
+        """
+        if len(self._running) >= self.max_running:
+            self.stats["rejected"] += 1
+            raise CapacityExceededError("image jobs", f"{self.max_running} jobs already running")
+        now = time.time()
+        if now - self._last_sweep > self.ttl / 10:
+            self._last_sweep = now
+            await asyncio.to_thread(self._sweep)
+
+        job = ImageJob(id=f"imgjob_{secrets.token_urlsafe(16)}", model=model, n=n, created_at=now)
+        await asyncio.to_thread(self._write, owner, job)
+        self._running[job.id] = asyncio.ensure_future(self._run(owner, job, work))
+        self.stats["submitted"] += 1
+        return job
+
+    async def _run(self, owner: str, job: ImageJob, work: Callable[[Callable[[], None]], Awaitable[ImageGenerationResponse]]):
+        writes: Optional[asyncio.Task] = None
+
+        def progress():
+            nonlocal writes
+            job.completed += 1
+            # At most one progress write in flight; a count skipped here goes out with the next one
+            if writes is None or writes.done():
+                writes = asyncio.ensure_future(asyncio.to_thread(self._write, owner, job.model_copy()))
+
+        job.status = ImageJobStatus.RUNNING
+        try:
+            await asyncio.to_thread(self._write, owner, job)
+            job.result = await work(progress)
+            job.status = ImageJobStatus.SUCCEEDED
+            self.stats["succeeded"] += 1
+        except asyncio.CancelledError:
+            job.status = ImageJobStatus.FAILED
+            job.error = BatchItemError(status_code=503, detail="Job cancelled: the router shut down")
+            self.stats["failed"] += 1
+            raise
+        except Exception as e:
+            status_code, detail = getattr(e, "status_code", 500), getattr(e, "detail", str(e))
+            if status_code == 500 and not hasattr(e, "detail"):
+                logging.exception(f"Image job {job.id} failed:")
+            job.status = ImageJobStatus.FAILED
+            job.error = BatchItemError(status_code=status_code, detail=str(detail))
+            self.stats["failed"] += 1
+        finally:
+            job.finished_at = time.time()
+            self._running.pop(job.id, None)
+            # A progress write still in its thread must not land after the final state
+            if writes is not None and not writes.done():
+                await asyncio.wait([writes])
+            self._write(owner, job)
+
+    async def get(self, job_id: str, owner: str) -> Optional[ImageJob]:
+        """The job if it exists, belongs to owner and hasn't expired"""
+        if not job_id.replace("_", "").replace("-", "").isalnum():
+            return None
+        return await asyncio.to_thread(self._read, job_id, owner)
+
+    async def aclose(self):
+        """Cancel the jobs this worker is running and record them as failed (on shutdown)"""
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+
+    def snapshot(self) -> Dict[str, object]:
+        return {"running": len(self._running), "max_running": self.max_running, "ttl": self.ttl, **self.stats}
@@ -0,0 +1,91 @@
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class RequestSizeLimitMiddleware:
+    """
+    Rejects oversized requests before they reach the endpoints.
+
+    Requests whose headers exceed max_header_bytes get a 431. Bodies are
+    checked against Content-Length up front and counted as they arrive,
+    so chunked uploads can't get around the limit; oversized ones get a
+    413. A limit of 0 disables that check.
+    """
+
+    def __init__(self, app: ASGIApp, max_body_bytes: int = 0, max_header_bytes: int = 0):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.max_header_bytes = max_header_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = scope["headers"]
+        if self.max_header_bytes and sum(len(name) + len(value) for name, value in headers) > self.max_header_bytes:
+            await JSONResponse({"detail": "Request headers too large"}, status_code=431)(scope, receive, send)
+            return
+        if not self.max_body_bytes:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in headers:
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = 0
+                if declared > self.max_body_bytes:
+                    await JSONResponse(
+                        {"detail": f"Request body exceeds {self.max_body_bytes} bytes"}, status_code=413
+                    )(scope, receive, send)
+                    return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    # Surfaces through the app's exception handlers like any other HTTP error
+                    raise HTTPException(status_code=413, detail=f"Request body exceeds {self.max_body_bytes} bytes")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class ResponseHeadersMiddleware:
+    """
+    Adds the headers a dependency left in request.state.response_headers
+    to the response, including streamed and error responses.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # request.state reads and writes this dict
+        state = scope.setdefault("state", {})
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                extra = state.get("response_headers")
+                if extra:
+                    message = {
+                        **message,
+                        "headers": [
+                            *message.get("headers", []),
+                            *((name.encode("latin-1"), value.encode("latin-1")) for name, value in extra.items())
+                        ]
+                    }
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
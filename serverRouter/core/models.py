@@ -1,119 +1,225 @@
-from serverRouter.core.datamodels import ModelInfo, ModelProvider
-
-# Primary chat models registry
-CHAT_MODELS = {
-    "gpt-4": ModelInfo(
-        name="gpt-4",
-        provider=ModelProvider.OPENAI,
-        description="OpenAI's most capable model for both language understanding and generation",
-        max_tokens=8192
-    ),
-    "gpt-3.5-turbo": ModelInfo(
-        name="gpt-3.5-turbo",
-        provider=ModelProvider.OPENAI,
-        description="OpenAI's fast and efficient model with good capabilities",
-        max_tokens=4096
-    ),
-    "gpt-4o-mini": ModelInfo(
-        name="gpt-4o-mini",
-        provider=ModelProvider.OPENAI,
-        description="OpenAI's GPT-4o variant (mini) for lightweight generation (requires reasoning access, Tier 5)",
-        max_tokens=4096
-    ),
-    "gpt-4o": ModelInfo(
-        name="gpt-4o",
-        provider=ModelProvider.OPENAI,
-        description="OpenAI's GPT-4o model for generation without heavy reasoning (suitable for non–Tier 5 accounts)",
-        max_tokens=4096
-    ),
-    "claude-3-opus": ModelInfo(
-        name="claude-3-opus-20240229",
-        provider=ModelProvider.ANTHROPIC,
-        description="Anthropic's most capable model",
-        max_tokens=4096,
-    ),
-    "claude-3-5-sonnet": ModelInfo(
-        name="claude-3-5-sonnet-20241022",
-        provider=ModelProvider.ANTHROPIC,
-        description="Anthropic's balanced model for performance and efficiency",
-        max_tokens=4096,
-    ),
-    "deepseek-v3": ModelInfo(
-        name="deepseek-chat",   # Use the exact string expected by the API.
-        provider=ModelProvider.DEEPSEEK,
-        description="DeepSeek's general-purpose chat model.",
-        max_tokens=4096
-    ),
-    "deepseek-r1": ModelInfo(
-        name="deepseek-reasoner",  # Must match API's exact model name
-        provider=ModelProvider.DEEPSEEK,
-        description="DeepSeek-R1 model for tool/API calling",
-        max_tokens=4096
-    ),
-    # --- New Gemini Chat Models ---
-    "gemini-2.0-flash": ModelInfo(
-        name="gemini-2.0-flash",
-        provider=ModelProvider.GEMINI,
-        description="Google Gemini 2.0 Flash for chat completions",
-        max_tokens=4096,
-    ),
-    "gemini-2.0-pro-exp-02-05": ModelInfo(
-        name="gemini-2.0-pro-exp-02-05",
-        provider=ModelProvider.GEMINI,
-        description="Gemini 2.0 Pro (Improved quality)",
-        max_tokens=8192,  # Adjust as needed
-    ),
-    "gemini-2.0-flash-thinking-exp-01-21": ModelInfo(
-        name="gemini-2.0-flash-thinking-exp-01-21",
-        provider=ModelProvider.GEMINI,
-        description="Gemini 2.0 Flash Thinking (Reasoning)",
-        max_tokens=8192,  # Adjust as needed
-    ),
-    "gemini-2.0-flash-exp": ModelInfo(
-        name="gemini-2.0-flash-exp",
-        provider=ModelProvider.GEMINI,
-        description="Gemini 2.0 Flash (Next generation features)",
-        max_tokens=8192,  # Adjust as needed
-    ),
-    "gemini-exp-1206": ModelInfo(
-        name="gemini-exp-1206",
-        provider=ModelProvider.GEMINI,
-        description="Gemini (Quality improvements)",
-        max_tokens=8192, # Adjust as needed
-    ),
-    "learnlm-1.5-pro-experimental": ModelInfo(
-        name="learnlm-1.5-pro-experimental",
-        provider=ModelProvider.GEMINI,
-        description="LearnLM 1.5 Pro Experimental (Audio, images, videos, and text input)",
-        max_tokens=8192,  # Adjust as needed
-    )
-}
-
-# Primary image models registry
-IMAGE_MODELS = {
-    "dall-e-3": ModelInfo(
-        name="dall-e-3",
-        provider=ModelProvider.OPENAI,
-        description="OpenAI's most advanced image generation model"
-    ),
-    "dall-e-2": ModelInfo(
-        name="dall-e-2",
-        provider=ModelProvider.OPENAI,
-        description="OpenAI's efficient image generation model",
-    ),
-}
-
-# Combined models dictionary
-MODELS = {**CHAT_MODELS, **IMAGE_MODELS}
-
-# Index models by provider for easy lookup
-MODELS_BY_PROVIDER = {}
-for model_id, model in MODELS.items():
-    MODELS_BY_PROVIDER.setdefault(model.provider, []).append(model_id)
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+import yaml
+
+from serverRouter.core.datamodels import ModelInfo, ModelProvider, ModelAlias
+from serverRouter.core.serialization import dumps
+
+DEFAULT_MODELS_FILE = os.path.join(os.path.dirname(__file__), "models.yaml")
+
+# Listings kept per snapshot; the circuit states in the key make them churn
+MAX_LISTINGS = 256
+
+# libyaml's loader is several times faster when PyYAML was built with it
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class Listing(NamedTuple):
+    """A serialized model listing and its entity tag"""
+    body: bytes
+    etag: str
+
+
+class ModelRegistry:
+    """
+    An immutable snapshot of the chat models, image models and aliases.
+
+    Lookups by provider and capability go through indexes built once per
+    snapshot. Listings are serialized on first use for each set of
+    available providers and reused until the registry is replaced.
+    """
+
+    def __init__(self, chat: Dict[str, ModelInfo], image: Dict[str, ModelInfo], aliases: Dict[str, ModelAlias]):
+        for alias_id, alias in aliases.items():
+            unknown = [model_id for model_id in alias.members if model_id not in chat]
+            if unknown:
+                raise ValueError(f"Alias {alias_id} references unknown chat models: {unknown}")
+        overlap = sorted(set(chat) & set(image))
+        if overlap:
+            raise ValueError(f"Models listed as both chat and image models: {overlap}")
+
+        self.chat = chat
+        self.image = image
+        self.aliases = aliases
+        self.models = {**chat, **image}
+
+        by_provider: Dict[ModelProvider, set] = {}
+        by_capability: Dict[str, set] = {}
+        for model_id, model in self.models.items():
+            by_provider.setdefault(model.provider, set()).add(model_id)
+            for capability in model.capabilities:
+                by_capability.setdefault(capability, set()).add(model_id)
+        self.by_provider: Dict[ModelProvider, FrozenSet[str]] = {provider: frozenset(ids) for provider, ids in by_provider.items()}
+        self.by_capability: Dict[str, FrozenSet[str]] = {capability: frozenset(ids) for capability, ids in by_capability.items()}
+
+        self._listings: Dict[Tuple, Listing] = {}
+
+    @classmethod
+    def from_file(cls, path: str) -> "ModelRegistry":
+        with open(path, "rb") as f:
+            config = yaml.load(f, Loader=_YAML_LOADER) or {}
+        return cls(
+            chat={model_id: ModelInfo(**entry) for model_id, entry in (config.get("chat") or {}).items()},
+            image={model_id: ModelInfo(**entry) for model_id, entry in (config.get("image") or {}).items()},
+            aliases={alias_id: ModelAlias(**entry) for alias_id, entry in (config.get("aliases") or {}).items()},
+        )
+
+    def _group(self, kind: str) -> Dict[str, ModelInfo]:
+        return {"all": self.models, "chat": self.chat, "image": self.image}[kind]
+
+    def select(
+        self,
+        kind: str = "all",
+        providers: Optional[Iterable[ModelProvider]] = None,
+        capabilities: Iterable[str] = ()
+    ) -> List[str]:
+        """Model IDs of a kind (all, chat, image) from the given providers with every capability, in file order"""
+        group = self._group(kind)
+        matches = None
+        if providers is not None:
+            matches = frozenset().union(*(self.by_provider.get(provider, ()) for provider in providers))
+        for capability in capabilities:
+            ids = self.by_capability.get(capability, frozenset())
+            matches = ids if matches is None else matches & ids
+        if matches is None:
+            return list(group)
+        return [model_id for model_id in group if model_id in matches]
+
+    def listing(
+        self,
+        kind: str,
+        providers: FrozenSet[ModelProvider],
+        capability: Optional[str] = None,
+        provider: Optional[ModelProvider] = None,
+        health: Optional[Mapping[str, str]] = None
+    ) -> Listing:
+        """
+        The JSON listing of a kind (all, chat, image, aliases) restricted to
+        the available providers and optionally one capability or provider.
+        Models carry their circuit state from health, closed if absent.
+        """
+        health = health or {}
+        key = (kind, providers, capability, provider, frozenset(health.items()))
+        listing = self._listings.get(key)
+        if listing is None:
+            if kind == "aliases":
+                content = {"aliases": [
+                    {"id": alias_id, **alias.model_dump(mode="json")}
+                    for alias_id, alias in self.aliases.items()
+                    if any(self.chat[model_id].provider in providers for model_id in alias.members)
+                ]}
+            else:
+                selected = providers if provider is None else providers & {provider}
+                model_ids = self.select(kind, selected, (capability,) if capability else ())
+                content = {"models": [
+                    {"id": model_id, **self.models[model_id].model_dump(mode="json"), "circuit": health.get(model_id, "closed")}
+                    for model_id in model_ids
+                ]}
+            body = dumps(content)
+            listing = Listing(body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+            # Unknown capabilities list nothing and aren't kept, so arbitrary
+            # query strings can't grow the cache. Two requests may race to
+            # build the same listing; the results are identical.
+            if capability is None or capability in self.by_capability:
+                if len(self._listings) >= MAX_LISTINGS:
+                    self._listings.clear()
+                self._listings[key] = listing
+        return listing
+
+
+class ReloadableRegistry:
+    """
+    Holds the current ModelRegistry and replaces it when its file changes.
+
+    Readers take `current` once per request and keep using that snapshot,
+    so a reload never changes models under a request in progress. Reloads
+    parse the file off the event loop and swap the reference in one
+    assignment; a file that fails to parse or validate is logged and the
+    previous registry stays in use.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._stamp = self._file_stamp()
+        self.current = ModelRegistry.from_file(path)
+        self.reloads = 0
+        self.reload_failures = 0
+
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    async def reload_if_changed(self) -> bool:
+        stamp = await asyncio.to_thread(self._file_stamp)
+        if stamp is None or stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        try:
+            registry = await asyncio.to_thread(ModelRegistry.from_file, self.path)
+        except Exception:
+            self.reload_failures += 1
+            logging.exception(f"Failed to reload model registry from {self.path}; keeping the previous one")
+            return False
+        self.current = registry
+        self.reloads += 1
+        logging.info(f"Reloaded model registry from {self.path}: {len(registry.chat)} chat, {len(registry.image)} image models")
+        return True
+
+    async def watch(self, interval: float):
+        """Check the file for changes every interval seconds until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            await self.reload_if_changed()
+
+
+class _LiveView(Mapping):
+    """A read-only mapping that follows REGISTRY.current across reloads"""
+
+    def __init__(self, build: Callable[[ModelRegistry], Mapping]):
+        self._build = build
+        self._registry: Optional[ModelRegistry] = None
+        self._data: Mapping = {}
+
+    def _current(self) -> Mapping:
+        registry = REGISTRY.current
+        if registry is not self._registry:
+            self._data = self._build(registry)
+            self._registry = registry
+        return self._data
+
+    def __getitem__(self, key):
+        return self._current()[key]
+
+    def __iter__(self) -> Iterator:
+        return iter(self._current())
+
+    def __len__(self) -> int:
+        return len(self._current())
+
+    def __repr__(self) -> str:
+        return repr(dict(self._current()))
+
+
+REGISTRY = ReloadableRegistry(os.getenv("OMNI_MODELS_FILE") or DEFAULT_MODELS_FILE)
+
+# Module-level views kept for code written against the static tables
+CHAT_MODELS: Mapping[str, ModelInfo] = _LiveView(lambda registry: registry.chat)
+IMAGE_MODELS: Mapping[str, ModelInfo] = _LiveView(lambda registry: registry.image)
+MODELS: Mapping[str, ModelInfo] = _LiveView(lambda registry: registry.models)
+MODELS_BY_PROVIDER: Mapping[ModelProvider, List[str]] = _LiveView(
+    lambda registry: {provider: registry.select(providers=(provider,)) for provider in registry.by_provider}
+)
 
 def get_model_by_id(model_id: str) -> ModelInfo | None:
-    return MODELS.get(model_id)
+    return REGISTRY.current.models.get(model_id)
 
 def get_models_by_provider(provider: ModelProvider) -> list[ModelInfo]:
-    model_ids = MODELS_BY_PROVIDER.get(provider, [])
-    return [MODELS[model_id] for model_id in model_ids]
+    registry = REGISTRY.current
+    return [registry.models[model_id] for model_id in registry.select(providers=(provider,))]
@@ -0,0 +1,112 @@
+import hashlib
+from typing import List, NamedTuple, Optional, Sequence, TypeVar
+
+from cachetools import TTLCache
+
+from serverRouter.core.datamodels import ChatCompletionRequest, ModelProvider
+from serverRouter.core.tokenizer import TOKENS_PER_MESSAGE, heuristic_tokens
+
+# Providers whose prompt caching needs explicit cache_control breakpoints.
+# OpenAI and DeepSeek cache long prefixes automatically; they only need affinity.
+EXPLICIT_CACHE_PROVIDERS = {ModelProvider.ANTHROPIC}
+# Anthropic accepts at most four breakpoints per request
+MAX_BREAKPOINTS = 4
+EPHEMERAL = {"type": "ephemeral"}
+
+T = TypeVar("T")
+
+
+class PrefixPlan(NamedTuple):
+    breakpoints: List[int]    # message indexes to mark with cache_control
+    keys: List[str]           # hash of the prefix ending at each breakpoint, recorded for affinity
+    lookup_keys: List[str]    # hash of the prefix ending at every message, longest first
+
+
+class PromptCachePlanner:
+    """
+    Finds long, stable prompt prefixes and keeps them on one model.
+
+    The stable prefix is everything before the final message: system
+    prompts and earlier turns are resent verbatim on the next request.
+    Prefixes of at least min_tokens get cache breakpoints after the
+    leading system messages and at the end of the prefix. The model that
+    served a request is remembered for each breakpoint prefix for
+    affinity_ttl seconds (the lifetime of provider caches), and a request
+    is sent to the model holding the longest of its prefixes: the next
+    turn of a conversation starts with the previous turn's prefix, so it
+    goes back to the model that has it cached.
+    """
+
+    def __init__(self, min_tokens: int = 1024, affinity_ttl: float = 300.0, affinity_size: int = 10000):
+        self.min_tokens = min_tokens
+        self._affinity: TTLCache = TTLCache(maxsize=affinity_size, ttl=affinity_ttl)
+        self.stats = {"marked": 0, "affinity_hits": 0}
+
+    def plan(self, request: ChatCompletionRequest) -> Optional[PrefixPlan]:
+        messages = request.messages
+        prefix = messages[:-1]
+        if not prefix:
+            return None
+        if sum(heuristic_tokens(msg.content) + TOKENS_PER_MESSAGE for msg in prefix) < self.min_tokens:
+            return None
+
+        # Hash of messages[:i + 1] for every i, built incrementally
+        digest = hashlib.sha256()
+        hashes = []
+        for msg in prefix:
+            digest.update(msg.role.encode("utf-8") + b"\x00" + msg.content.encode("utf-8") + b"\x00")
+            hashes.append(digest.hexdigest())
+
+        breakpoints = []
+        system_end = 0
+        while system_end < len(prefix) and prefix[system_end].role == "system":
+            system_end += 1
+        if 0 < system_end < len(prefix):
+            breakpoints.append(system_end - 1)
+        breakpoints.append(len(prefix) - 1)
+        return PrefixPlan(breakpoints, [hashes[i] for i in breakpoints], hashes[::-1])
+
+    def mark(self, request: ChatCompletionRequest, plan: Optional[PrefixPlan]) -> ChatCompletionRequest:
+        """Copy of the request with cache_control set on the plan's breakpoints"""
+        if plan is None:
+            return request
+        existing = sum(1 for msg in request.messages if msg.cache_control)
+        available = MAX_BREAKPOINTS - existing
+        if available <= 0:
+            # The client placed its own breakpoints
+            return request
+        messages = list(request.messages)
+        for index in plan.breakpoints[-available:]:
+            if not messages[index].cache_control:
+                messages[index] = messages[index].model_copy(update={"cache_control": EPHEMERAL})
+        self.stats["marked"] += 1
+        return request.model_copy(update={"messages": messages})
+
+    def prefer(self, plan: Optional[PrefixPlan], candidates: Sequence[T], model_id_of) -> List[T]:
+        """Move the model holding the longest cached prefix of this request to the front of the candidates"""
+        candidates = list(candidates)
+        if plan is None or len(candidates) < 2:
+            return candidates
+        preferred = None
+        for key in plan.lookup_keys:
+            preferred = self._affinity.get(key)
+            if preferred is not None:
+                break
+        else:
+            return candidates
+        for i, candidate in enumerate(candidates):
+            if model_id_of(candidate) == preferred:
+                if i:
+                    candidates.insert(0, candidates.pop(i))
+                self.stats["affinity_hits"] += 1
+                break
+        return candidates
+
+    def record(self, plan: Optional[PrefixPlan], model_id: str):
+        """Remember which model now holds this request's breakpoint prefixes in its cache"""
+        if plan is not None:
+            for key in plan.keys:
+                self._affinity[key] = model_id
+
+    def snapshot(self):
+        return {"prefixes": len(self._affinity), **self.stats}
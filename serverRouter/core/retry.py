@@ -0,0 +1,183 @@
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+from tenacity import AsyncRetrying, RetryCallState, retry_if_exception, wait_random_exponential
+
+from serverRouter.core.exceptions import CapacityExceededError, CircuitOpenError, is_connection_error, is_timeout, reported_upstream_status
+
+T = TypeVar("T")
+
+# Buckets per budget window, as for circuit breakers
+BUCKETS = 10
+
+# Upstream statuses worth another attempt: timeout, conflict, throttling and
+# server errors (Anthropic's 529 overloaded included)
+RETRYABLE_STATUSES = frozenset({408, 409, 429})
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    Whether an upstream call's exception is transient: throttling, server
+    errors, timeouts and dropped connections. Local rejections (capacity,
+    open circuits), client errors and failures with no upstream status
+    (an adapter choking on a response, say) are terminal.
+    """
+    if not isinstance(exc, Exception) or isinstance(exc, (CapacityExceededError, CircuitOpenError)):
+        return False
+    if getattr(exc, "timed_out", False) or getattr(exc, "connection_error", False):
+        return True
+    if is_timeout(exc) or is_connection_error(exc):
+        return True
+    status = reported_upstream_status(exc)
+    return status is not None and (status in RETRYABLE_STATUSES or status >= 500)
+
+
+class RetryBudget:
+    """
+    Caps retries at a ratio of first attempts over a rolling window, plus
+    a floor of min_per_second so quiet periods can still retry. When an
+    upstream fails everything, retries add at most ratio more load instead
+    of multiplying it by the attempt count.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 1.0, window: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = window
+        # [bucket start, first attempts, retries]
+        self._buckets: Deque[List[float]] = deque()
+        self.stats = {"attempts": 0, "retries": 0, "exhausted": 0}
+
+    def _bucket(self, now: float) -> List[float]:
+        width = self.window / BUCKETS
+        start = now - now % width
+        if not self._buckets or self._buckets[-1][0] != start:
+            self._buckets.append([start, 0, 0])
+            while self._buckets and self._buckets[0][0] <= now - self.window:
+                self._buckets.popleft()
+        return self._buckets[-1]
+
+    def _counts(self, now: float):
+        attempts = retries = 0
+        for start, bucket_attempts, bucket_retries in self._buckets:
+            if start > now - self.window:
+                attempts += bucket_attempts
+                retries += bucket_retries
+        return attempts, retries
+
+    def deposit(self):
+        """Count a first attempt"""
+        self._bucket(time.monotonic())[1] += 1
+        self.stats["attempts"] += 1
+
+    def withdraw(self) -> bool:
+        """Claim one retry, or return False when the budget is spent"""
+        now = time.monotonic()
+        bucket = self._bucket(now)
+        attempts, retries = self._counts(now)
+        if retries >= self.min_per_second * self.window + attempts * self.ratio:
+            self.stats["exhausted"] += 1
+            return False
+        bucket[2] += 1
+        self.stats["retries"] += 1
+        return True
+
+    def snapshot(self) -> Dict[str, object]:
+        attempts, retries = self._counts(time.monotonic())
+        return {
+            "ratio": self.ratio,
+            "min_per_second": self.min_per_second,
+            "window_attempts": attempts,
+            "window_retries": retries,
+            **self.stats,
+        }
+
+
+class RetryPolicy:
+    """
+    Retries transient upstream failures with exponential backoff and full
+    jitter (a random wait between 0 and base_delay * 2**n, at most
+    max_delay). An upstream Retry-After is used as the wait instead; one
+    longer than max_delay ends the retries. Retries also stop at the
+    deadline, after attempts calls, or when the shared budget is spent,
+    and the last error is raised.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        base_delay: float = 0.25,
+        max_delay: float = 8.0,
+        max_elapsed: float = 30.0,
+        budget: Optional[RetryBudget] = None,
+    ):
+        self.attempts = attempts
+        self.max_delay = max_delay
+        self.max_elapsed = max_elapsed
+        self.budget = budget or RetryBudget()
+        self._backoff = wait_random_exponential(multiplier=base_delay, max=max_delay)
+
+    def _retry_after(self, retry_state: RetryCallState) -> Optional[float]:
+        return getattr(retry_state.outcome.exception(), "retry_after", None)
+
+    def _wait(self, deadline: float) -> Callable[[RetryCallState], float]:
+        def wait(retry_state: RetryCallState) -> float:
+            retry_after = self._retry_after(retry_state)
+            delay = self._backoff(retry_state) if retry_after is None else retry_after
+            return max(0.0, min(delay, deadline - time.monotonic()))
+        return wait
+
+    def _stop(self, deadline: float) -> Callable[[RetryCallState], bool]:
+        def stop(retry_state: RetryCallState) -> bool:
+            if retry_state.attempt_number >= self.attempts:
+                return True
+            retry_after = self._retry_after(retry_state)
+            if retry_after is not None and retry_after > self.max_delay:
+                return True
+            # The wait has already been computed and capped at the deadline;
+            # a retry that would start with no time left is pointless
+            if time.monotonic() + retry_state.upcoming_sleep >= deadline:
+                return True
+            # Last, so only retries that will actually happen are charged
+            return not self.budget.withdraw()
+        return stop
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        deadline: Optional[float] = None,
+        on_retry: Optional[Callable[[BaseException, float], None]] = None,
+    ) -> T:
+        """
+        Await fn() until it succeeds or fails terminally. deadline is a
+        time.monotonic() instant; max_elapsed from now applies regardless.
+        on_retry(error, wait) is called before each backoff.
+        """
+        self.budget.deposit()
+        limit = time.monotonic() + self.max_elapsed
+        deadline = limit if deadline is None else min(deadline, limit)
+
+        def before_sleep(retry_state: RetryCallState):
+            error = retry_state.outcome.exception()
+            logging.info(f"Retrying after {error!r} in {retry_state.upcoming_sleep:.2f}s (attempt {retry_state.attempt_number + 1})")
+            if on_retry is not None:
+                on_retry(error, retry_state.upcoming_sleep)
+
+        retrying = AsyncRetrying(
+            retry=retry_if_exception(is_retryable),
+            wait=self._wait(deadline),
+            stop=self._stop(deadline),
+            before_sleep=before_sleep,
+            reraise=True,
+        )
+        return await retrying(fn)
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "attempts": self.attempts,
+            "max_delay": self.max_delay,
+            "max_elapsed": self.max_elapsed,
+            "budget": self.budget.snapshot(),
+        }
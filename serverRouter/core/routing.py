@@ -0,0 +1,216 @@
+import bisect
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from serverRouter.core.datamodels import ChatCompletionRequest, ModelInfo
+from serverRouter.core.tokenizer import PromptBudget
+
+# Latency histogram bucket upper bounds: 40 geometric buckets from 10ms to ~160s
+LATENCY_BUCKETS = [0.01 * (1.28 ** i) for i in range(40)]
+
+ROUTING_STRATEGIES = ("auto", "fast", "cheap")
+
+
+def parse_auto_model(model: str) -> Optional[str]:
+    """Return the strategy for "auto" / "auto:<strategy>" model names, else None"""
+    if model == "auto":
+        return "auto"
+    if model.startswith("auto:"):
+        strategy = model[len("auto:"):]
+        if strategy not in ROUTING_STRATEGIES:
+            raise ValueError(f"Unknown routing strategy: {strategy}")
+        return strategy
+    return None
+
+
+class ModelStats:
+    """
+    Rolling latency, throughput and error statistics for one model.
+
+    Averages are exponentially weighted. Percentiles come from a fixed
+    log-bucketed histogram whose counts are halved once they reach
+    decay_after, so old samples fade out without storing them.
+    """
+
+    def __init__(self, alpha: float = 0.2, decay_after: int = 1000):
+        self.alpha = alpha
+        self.decay_after = decay_after
+        self.ewma_latency: Optional[float] = None
+        self.ewma_tokens_per_sec: Optional[float] = None
+        self.ewma_output_tokens: Optional[float] = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self._buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._histogram_total = 0
+
+    def _ewma(self, current: Optional[float], value: float) -> float:
+        return value if current is None else current + self.alpha * (value - current)
+
+    def record(self, latency: float, output_tokens: int = 0, error: bool = False):
+        self.requests += 1
+        self.error_rate = self._ewma(self.error_rate, 1.0 if error else 0.0)
+        if error:
+            self.errors += 1
+            return
+
+        self.ewma_latency = self._ewma(self.ewma_latency, latency)
+        if output_tokens:
+            self.ewma_output_tokens = self._ewma(self.ewma_output_tokens, output_tokens)
+            if latency > 0:
+                self.ewma_tokens_per_sec = self._ewma(self.ewma_tokens_per_sec, output_tokens / latency)
+
+        self._buckets[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+        self._histogram_total += 1
+        if self._histogram_total >= self.decay_after:
+            self._buckets = [count // 2 for count in self._buckets]
+            self._histogram_total = sum(self._buckets)
+
+    @property
+    def samples(self) -> int:
+        return self._histogram_total
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket containing the q-th percentile (overflow reports the top bound)"""
+        if self._histogram_total == 0:
+            return None
+        target = q / 100 * self._histogram_total
+        seen = 0
+        for i, count in enumerate(self._buckets):
+            seen += count
+            if seen >= target and count:
+                return LATENCY_BUCKETS[min(i, len(LATENCY_BUCKETS) - 1)]
+        return LATENCY_BUCKETS[-1]
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.error_rate, 4),
+            "ewma_latency": self.ewma_latency,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "tokens_per_sec": self.ewma_tokens_per_sec,
+            "output_tokens": self.ewma_output_tokens,
+        }
+
+
+class RoutingEngine:
+    """
+    Picks chat models for "auto" requests and sizes upstream timeouts
+    from live per-model statistics.
+    """
+
+    def __init__(
+        self,
+        default_timeout: float = 60.0,
+        timeout_multiplier: float = 3.0,
+        min_timeout: float = 5.0,
+        max_timeout: float = 120.0,
+        min_samples: int = 20,
+        prior_latency: float = 0.0,
+    ):
+        self.default_timeout = default_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.min_samples = min_samples
+        # Optimistic latency assumed for models never tried, so each one is explored
+        self.prior_latency = prior_latency
+        self.stats: Dict[str, ModelStats] = {}
+
+    def _stats(self, model_id: str) -> ModelStats:
+        stats = self.stats.get(model_id)
+        if stats is None:
+            stats = self.stats[model_id] = ModelStats()
+        return stats
+
+    def record(self, model_id: str, latency: float, output_tokens: int = 0, error: bool = False):
+        self._stats(model_id).record(latency, output_tokens, error)
+
+    def expected_output_tokens(self, model_id: str) -> Optional[float]:
+        """Typical completion length of the model, once it has served one"""
+        stats = self.stats.get(model_id)
+        return None if stats is None else stats.ewma_output_tokens
+
+    def timeout_for(self, model_id: str, max_tokens: Optional[int] = None) -> float:
+        """
+        Upstream timeout: a multiple of the observed p99 (within bounds),
+        raised to cover the generation the request may ask for. That is
+        max_tokens at the model's observed tokens/sec, or default_timeout
+        when the request sets no max_tokens, since past completions don't
+        bound how long this one will be.
+        """
+        stats = self.stats.get(model_id)
+        if stats is None or stats.samples < self.min_samples:
+            return self.default_timeout
+        p99 = stats.percentile(99)
+        timeout = min(self.max_timeout, max(self.min_timeout, p99 * self.timeout_multiplier))
+        if not max_tokens:
+            return max(timeout, self.default_timeout)
+        if stats.ewma_tokens_per_sec:
+            # Not capped by max_timeout: a long generation that was asked for must get its time
+            timeout = max(timeout, max_tokens / stats.ewma_tokens_per_sec * self.timeout_multiplier)
+        return timeout
+
+    def _expected_latency(self, model_id: str) -> float:
+        stats = self.stats.get(model_id)
+        if stats is None:
+            return self.prior_latency
+        if stats.ewma_latency is None:
+            # Tried but never succeeded
+            return self.default_timeout
+        latency = stats.ewma_latency
+        error_rate = stats.error_rate
+        # A model that fails half the time costs roughly two attempts
+        return latency / max(1.0 - error_rate, 0.05)
+
+    def eligible(
+        self,
+        request: ChatCompletionRequest,
+        models: Dict[str, ModelInfo],
+        budget: Optional[PromptBudget] = None
+    ) -> List[str]:
+        """Models that can fit the request's context and provide the tools it needs"""
+        budget = budget or PromptBudget(request)
+        return [
+            model_id for model_id, info in models.items()
+            if (not request.tools or info.supports_tools) and budget.fits(info)
+        ]
+
+    def rank(
+        self,
+        request: ChatCompletionRequest,
+        models: Dict[str, ModelInfo],
+        strategy: str,
+        budget: Optional[PromptBudget] = None
+    ) -> List[str]:
+        """
+        Order eligible models best-first for the given strategy.
+
+        fast:  lowest expected latency (EWMA latency inflated by error rate)
+        cheap: lowest cost, latency as tie-breaker; unpriced models last
+        auto:  balances both by scoring latency * sqrt(cost)
+        """
+        candidates = self.eligible(request, models, budget)
+
+        def score(model_id: str) -> Tuple[float, float]:
+            latency = self._expected_latency(model_id)
+            cost = models[model_id].cost_per_mtok
+            if strategy == "fast":
+                return latency, 0.0
+            if strategy == "cheap":
+                return (cost if cost is not None else math.inf), latency
+            return latency * math.sqrt(cost if cost is not None else 100.0), 0.0
+
+        return sorted(candidates, key=score)
+
+    def snapshot(self, model_ids: Iterable[str]) -> Dict[str, Dict]:
+        return {
+            model_id: {
+                **self.stats[model_id].snapshot(),
+                "timeout": self.timeout_for(model_id),
+            }
+            for model_id in model_ids if model_id in self.stats
+        }
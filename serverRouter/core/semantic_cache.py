@@ -0,0 +1,291 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import zlib
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from serverRouter.core.datamodels import ChatCompletionRequest, ChatCompletionResponse
+
+EmbedFn = Callable[[str], np.ndarray]
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Worker processes sharing OMNI_SEMANTIC_PATH each claim one of this many files
+MAX_INDEX_FILES = 64
+
+_STOPWORDS = frozenset({
+    "a", "an", "the", "of", "is", "are", "was", "what", "whats", "s", "to",
+    "in", "on", "for", "me", "please", "tell", "can", "you", "i", "do", "does",
+})
+
+
+class HashingEmbedder:
+    """
+    Offline embedding based on the hashing trick.
+
+    Word unigrams, word bigrams and character trigrams are hashed into a
+    fixed number of signed buckets and the result is L2-normalized, so
+    cosine similarity reduces to a dot product. It needs no model download
+    and is fast enough to benchmark the cache on its own.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = [w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS]
+        features = list(words)
+        features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"<{word}>"
+            features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+        return features
+
+    def __call__(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+
+def _namespace(request: ChatCompletionRequest) -> int:
+    """
+    Hash everything except the final message, so a paraphrase only matches
+    entries with the same model, conversation history and options.
+    """
+    normalized = {
+        "model": request.model,
+        "history": [[msg.role, msg.content] for msg in request.messages[:-1]],
+        "max_tokens": request.max_tokens,
+        "temperature": request.temperature,
+        "tools": [tool.model_dump() for tool in request.tools] if request.tools else None,
+        "response_format": request.response_format,
+        "tool_choice": request.tool_choice.model_dump() if hasattr(request.tool_choice, "model_dump") else request.tool_choice,
+    }
+    digest = hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little", signed=True)
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache of chat completions keyed on the final user message.
+
+    Embeddings live in a preallocated (capacity x dim) float32 matrix,
+    memory-mapped when a path is given, and are searched with a single
+    vectorized dot product. When the cache is full the least recently
+    used slot is overwritten.
+
+    With a path, the responses are appended to a "<path>.entries" log next
+    to the matrix, so a restart reopens both instead of starting empty.
+    Slot metadata lives in the process, so an index file is never shared:
+    each process locks the first free one of path, path.1, path.2, ...
+    The log is compacted once it holds twice as many records as slots.
+
+    Embedding and the search are CPU work; on the event loop use get() and
+    set(), which run lookup() and store() in a thread.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 10_000,
+        dim: int = 512,
+        embed_fn: Optional[EmbedFn] = None,
+        path: Optional[str] = None,
+        default_threshold: float = 0.9,
+        thresholds: Optional[Dict[str, float]] = None,
+        top_k: int = 4,
+    ):
+        self.capacity = capacity
+        self.dim = dim
+        self.embed_fn = embed_fn or HashingEmbedder(dim)
+        self.default_threshold = default_threshold
+        self.thresholds = thresholds or {}
+        self.top_k = top_k
+
+        self._namespaces = np.zeros(capacity, dtype=np.int64)
+        # Logical clock of the last access per slot; 0 marks an empty slot
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._responses: List[Optional[ChatCompletionResponse]] = [None] * capacity
+        self._clock = 0
+        self._size = 0
+        self.path: Optional[str] = None
+        self._log_path: Optional[str] = None
+        self._log_records = 0
+        self._lock_file = None
+        # lookup() and store() may run in threads (see get() and set())
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        self.path = self._claim(path) if path else None
+        if self.path:
+            self._log_path = self.path + ".entries"
+            # Reuse an existing matrix of the same shape; "w+" would truncate it
+            reuse = os.path.exists(self.path) and os.path.getsize(self.path) == capacity * dim * 4
+            self._matrix = np.memmap(self.path, dtype=np.float32, mode="r+" if reuse else "w+", shape=(capacity, dim))
+            if reuse:
+                self._restore()
+            self._compact()
+        else:
+            self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+
+    def _claim(self, path: str) -> Optional[str]:
+        """Lock the first index file no other process holds; None (in memory) if all are taken"""
+        if fcntl is None:
+            return f"{path}.{os.getpid()}"
+        for i in range(MAX_INDEX_FILES):
+            candidate = path if i == 0 else f"{path}.{i}"
+            lock_file = open(candidate + ".lock", "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+            # Held (and the lock kept) for the life of the process
+            self._lock_file = lock_file
+            return candidate
+        logging.warning(f"All {MAX_INDEX_FILES} semantic cache files at {path} are in use; keeping this one in memory")
+        return None
+
+    def _restore(self):
+        """Rebuild slot metadata from the entries log, keeping the latest record per slot"""
+        if not os.path.exists(self._log_path):
+            return
+        latest = {}
+        with open(self._log_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    slot = int(record["slot"])
+                except (ValueError, KeyError, TypeError):
+                    continue  # torn final line after a crash
+                if 0 <= slot < self.capacity:
+                    latest[slot] = record
+        for slot, record in latest.items():
+            self._namespaces[slot] = record["namespace"]
+            self._last_used[slot] = record["clock"]
+            self._responses[slot] = ChatCompletionResponse.model_validate(record["response"])
+        self._size = max(latest, default=-1) + 1
+        self._clock = int(self._last_used.max()) if latest else 0
+
+    def _record(self, slot: int) -> str:
+        return json.dumps({
+            "slot": slot,
+            "namespace": int(self._namespaces[slot]),
+            "clock": int(self._last_used[slot]),
+            "response": self._responses[slot].model_dump(mode="json"),
+        }) + "\n"
+
+    def _compact(self):
+        """Rewrite the log with one record per occupied slot"""
+        tmp_path = self._log_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for slot in range(self._size):
+                if self._responses[slot] is not None:
+                    f.write(self._record(slot))
+        os.replace(tmp_path, self._log_path)
+        self._log_records = self._size
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def _query_text(self, request: ChatCompletionRequest) -> Optional[str]:
+        if not request.messages or request.messages[-1].role != "user":
+            return None
+        return request.messages[-1].content
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embed_fn(text), dtype=np.float32)
+        if vector.shape != (self.dim,):
+            raise ValueError(f"Embedding has shape {vector.shape}, expected ({self.dim},)")
+        return vector
+
+    def threshold_for(self, model: str) -> float:
+        return self.thresholds.get(model, self.default_threshold)
+
+    def lookup(self, request: ChatCompletionRequest) -> Optional[ChatCompletionResponse]:
+        """Return the closest cached response above the model's threshold (blocking)"""
+        text = self._query_text(request)
+        if text is None or self._size == 0:
+            self.stats["misses"] += 1
+            return None
+        query = self._embed(text)
+        with self._lock:
+            return self._search(query, _namespace(request), request.model)
+
+    def _search(self, query: np.ndarray, namespace: int, model: str) -> Optional[ChatCompletionResponse]:
+        n = self._size
+        scores = self._matrix[:n] @ query
+        scores[self._namespaces[:n] != namespace] = -np.inf
+
+        k = min(self.top_k, n)
+        candidates = np.argpartition(scores, -k)[-k:]
+        candidates = candidates[np.argsort(scores[candidates])[::-1]]
+
+        threshold = self.threshold_for(model)
+        for slot in candidates:
+            if scores[slot] < threshold:
+                break
+            response = self._responses[slot]
+            if response is not None:
+                self._last_used[slot] = self._tick()
+                self.stats["hits"] += 1
+                return response
+
+        self.stats["misses"] += 1
+        return None
+
+    def store(self, request: ChatCompletionRequest, response: ChatCompletionResponse):
+        """Add a response, overwriting the least recently used slot when full (blocking)"""
+        text = self._query_text(request)
+        if text is None:
+            return
+        vector = self._embed(text)
+        namespace = _namespace(request)
+
+        with self._lock:
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.stats["evictions"] += 1
+
+            self._matrix[slot] = vector
+            self._namespaces[slot] = namespace
+            self._last_used[slot] = self._tick()
+            self._responses[slot] = response
+            self.stats["stores"] += 1
+            if self._log_path:
+                if self._log_records >= 2 * self.capacity:
+                    self._compact()
+                else:
+                    with open(self._log_path, "a", encoding="utf-8") as f:
+                        f.write(self._record(slot))
+                    self._log_records += 1
+
+    async def get(self, request: ChatCompletionRequest) -> Optional[ChatCompletionResponse]:
+        """lookup() off the event loop"""
+        return await asyncio.to_thread(self.lookup, request)
+
+    async def set(self, request: ChatCompletionRequest, response: ChatCompletionResponse):
+        """store() off the event loop"""
+        await asyncio.to_thread(self.store, request, response)
+
+    def snapshot(self) -> Dict[str, int]:
+        """Counters and sizes for the stats endpoint"""
+        return {**self.stats, "entries": self._size, "capacity": self.capacity}
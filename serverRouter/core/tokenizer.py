@@ -0,0 +1,215 @@
+import logging
+import math
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from serverRouter.core.datamodels import ChatCompletionRequest, ChatMessage, ModelInfo, ModelProvider
+
+# Chat formatting overhead, following OpenAI's published counting rules
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+# Non-OpenAI tokenizers aren't public; their counts are estimated with this encoding
+APPROXIMATE_ENCODING = "cl100k_base"
+# How long to wait before retrying an encoding that failed to load (e.g. offline)
+LOAD_RETRY_SECONDS = 300.0
+# Below this many texts, tiktoken's threaded batch API costs more than it saves
+BATCH_THRESHOLD = 8
+
+
+class TokenCount(NamedTuple):
+    tokens: int
+    exact: bool          # False for estimates (non-OpenAI models, or no encoder available)
+    encoding: str        # tiktoken encoding used, or "heuristic"
+
+
+class TokenCounts(NamedTuple):
+    tokens: List[int]
+    exact: bool
+    encoding: str
+
+
+def heuristic_tokens(text: str) -> int:
+    """About four ASCII characters per token; other scripts about one character per token"""
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+def _message_text(msg: ChatMessage) -> str:
+    return msg.role + "\n" + msg.content
+
+
+class TokenizerRegistry:
+    """
+    tiktoken encoders cached per encoding (model family).
+
+    OpenAI models are counted exactly with their own encoding; other
+    providers are estimated with cl100k_base. tiktoken may download an
+    encoding on first use, so encoders are loaded at startup or in a
+    background thread, never on the request path; until one is ready (or
+    if it fails to load) counts fall back to a character heuristic and
+    loading is retried later.
+    """
+
+    def __init__(self):
+        self._encoders: Dict[str, object] = {}
+        self._failed: Dict[str, float] = {}
+        self._model_encodings: Dict[str, str] = {}
+        self._loading: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+    def encoding_name(self, model_info: ModelInfo) -> str:
+        if model_info.provider != ModelProvider.OPENAI:
+            return APPROXIMATE_ENCODING
+        name = self._model_encodings.get(model_info.name)
+        if name is None:
+            try:
+                import tiktoken
+                name = tiktoken.encoding_name_for_model(model_info.name)
+            except (ImportError, KeyError):
+                name = APPROXIMATE_ENCODING
+            self._model_encodings[model_info.name] = name
+        return name
+
+    def _load(self, encoding: str):
+        """Load one encoder (blocking; may download it)"""
+        try:
+            import tiktoken
+            self._encoders[encoding] = tiktoken.get_encoding(encoding)
+        except Exception as e:
+            self._failed[encoding] = time.monotonic()
+            logging.warning(f"Tokenizer {encoding} unavailable, using estimates: {e!r}")
+        finally:
+            with self._lock:
+                self._loading.pop(encoding, None)
+
+    def _start_load(self, encoding: str) -> Optional[threading.Thread]:
+        """Begin loading an encoder in the background unless it is loaded, loading or recently failed"""
+        with self._lock:
+            if encoding in self._encoders:
+                return None
+            thread = self._loading.get(encoding)
+            if thread is not None:
+                return thread
+            if time.monotonic() - self._failed.get(encoding, -math.inf) < LOAD_RETRY_SECONDS:
+                return None
+            thread = self._loading[encoding] = threading.Thread(
+                target=self._load, args=(encoding,), name=f"tokenizer-{encoding}", daemon=True
+            )
+        thread.start()
+        return thread
+
+    def encoder(self, encoding: str):
+        """The cached encoder, or None while it is loading or unavailable (never blocks)"""
+        encoder = self._encoders.get(encoding)
+        if encoder is None:
+            self._start_load(encoding)
+        return encoder
+
+    def preload(self, encodings: Sequence[str]):
+        """Load encoders ahead of traffic (blocking; run it in a thread)"""
+        threads = [self._start_load(encoding) for encoding in encodings]
+        for thread in threads:
+            if thread is not None:
+                thread.join()
+
+    def count_texts(self, texts: List[str], model_info: ModelInfo) -> TokenCounts:
+        """Token count of each text with the model's tokenizer"""
+        encoding = self.encoding_name(model_info)
+        encoder = self.encoder(encoding)
+        if encoder is None:
+            return TokenCounts([heuristic_tokens(text) for text in texts], False, "heuristic")
+        if len(texts) < BATCH_THRESHOLD:
+            counts = [len(encoder.encode_ordinary(text)) for text in texts]
+        else:
+            counts = [len(tokens) for tokens in encoder.encode_ordinary_batch(texts)]
+        return TokenCounts(counts, model_info.provider == ModelProvider.OPENAI, encoding)
+
+    def count_messages(self, messages: List[ChatMessage], model_info: ModelInfo) -> TokenCounts:
+        """Per-message token counts including formatting overhead"""
+        counts = self.count_texts([_message_text(msg) for msg in messages], model_info)
+        return TokenCounts([count + TOKENS_PER_MESSAGE for count in counts.tokens], counts.exact, counts.encoding)
+
+    def count_prompt(self, messages: List[ChatMessage], model_info: ModelInfo) -> TokenCount:
+        """Prompt tokens for a list of chat messages"""
+        counts = self.count_messages(messages, model_info)
+        return TokenCount(sum(counts.tokens) + TOKENS_PER_REPLY, counts.exact, counts.encoding)
+
+
+TOKENIZERS = TokenizerRegistry()
+
+
+class PromptBudget:
+    """
+    Checks one request against model context lengths.
+
+    A BPE token covers at least one UTF-8 byte, so requests whose byte
+    size already fits are accepted without tokenizing. Otherwise the
+    prompt is tokenized at most once per encoding. Estimated counts get
+    `tolerance` slack before a request is considered too large.
+    """
+
+    def __init__(self, request: ChatCompletionRequest, tolerance: float = 0.1, tokenizers: TokenizerRegistry = TOKENIZERS):
+        self.request = request
+        self.tolerance = tolerance
+        self.tokenizers = tokenizers
+        self._counts: Dict[str, TokenCount] = {}
+        self._upper_bound: Optional[int] = None
+
+    @property
+    def reserved(self) -> int:
+        """Tokens held back for the completion"""
+        return self.request.max_tokens or 0
+
+    def upper_bound(self) -> int:
+        if self._upper_bound is None:
+            self._upper_bound = sum(
+                len(_message_text(msg).encode("utf-8")) + TOKENS_PER_MESSAGE for msg in self.request.messages
+            ) + TOKENS_PER_REPLY
+        return self._upper_bound
+
+    def prompt_tokens(self, model_info: ModelInfo) -> TokenCount:
+        encoding = self.tokenizers.encoding_name(model_info)
+        count = self._counts.get(encoding)
+        if count is None:
+            count = self._counts[encoding] = self.tokenizers.count_prompt(self.request.messages, model_info)
+        return count
+
+    def limit(self, model_info: ModelInfo, exact: bool) -> float:
+        return model_info.max_tokens if exact else model_info.max_tokens * (1 + self.tolerance)
+
+    def fits(self, model_info: ModelInfo) -> bool:
+        if model_info.max_tokens is None:
+            return True
+        if self.upper_bound() + self.reserved <= model_info.max_tokens:
+            return True
+        count = self.prompt_tokens(model_info)
+        return count.tokens + self.reserved <= self.limit(model_info, count.exact)
+
+    def trim(self, model_info: ModelInfo) -> int:
+        """
+        Drop the oldest non-system messages (never the last one) until the
+        request fits the model. The request is only modified on success.
+
+        Returns:
+            Number of messages dropped, or -1 if it can't be made to fit
+        """
+        messages = self.request.messages
+        counts = self.tokenizers.count_messages(messages, model_info)
+        budget = self.limit(model_info, counts.exact) - self.reserved - TOKENS_PER_REPLY
+        total = sum(counts.tokens)
+        droppable = [i for i, msg in enumerate(messages[:-1]) if msg.role != "system"]
+        dropped = set()
+        for i in droppable:
+            if total <= budget:
+                break
+            dropped.add(i)
+            total -= counts.tokens[i]
+        if total > budget:
+            return -1
+        if dropped:
+            self.request.messages = [msg for i, msg in enumerate(messages) if i not in dropped]
+            self._counts.clear()
+            self._upper_bound = None
+        return len(dropped)
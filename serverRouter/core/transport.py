@@ -0,0 +1,151 @@
+"""
+Shared, tuned HTTP connection pools for upstream provider SDKs.
+
+Every provider gets one long-lived httpx.AsyncClient with explicit pool
+limits, keep-alive, HTTP/2 when the h2 package is installed, and
+configurable timeouts. Settings come from OMNI_POOL_<SETTING> and can be
+overridden per pool with OMNI_POOL_<NAME>_<SETTING>, e.g.
+OMNI_POOL_OPENAI_MAX_CONNECTIONS=400.
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import time
+from typing import Dict, Iterable, Optional
+
+import httpx
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def _setting(name: str, key: str, default: str) -> str:
+    return os.getenv(f"OMNI_POOL_{name.upper()}_{key}", os.getenv(f"OMNI_POOL_{key}", default))
+
+
+class _PoolStats:
+    __slots__ = ("requests", "last_used", "warmups", "warmup_failures")
+
+    def __init__(self):
+        self.requests = 0
+        self.last_used = 0.0
+        self.warmups = 0
+        self.warmup_failures = 0
+
+
+class UpstreamTransport:
+    """
+    Named connection pools shared by the provider SDKs.
+
+    Providers pass client(name, base_url) as their SDK's http_client. The
+    base URL is remembered so warm() can open connections ahead of real
+    traffic (a HEAD request costs no tokens and needs no credentials) and
+    keep_warm() can refresh pools that have been idle.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._base_urls: Dict[str, str] = {}
+        self._stats: Dict[str, _PoolStats] = {}
+
+    def timeout(self, name: str) -> httpx.Timeout:
+        """Default timeouts for a pool; per-call timeouts still override the read timeout"""
+        return httpx.Timeout(
+            float(_setting(name, "READ_TIMEOUT", "120")),
+            connect=float(_setting(name, "CONNECT_TIMEOUT", "5"))
+        )
+
+    def client(self, name: str, base_url: Optional[str] = None) -> httpx.AsyncClient:
+        """The shared client for a pool, created on first use"""
+        client = self._clients.get(name)
+        if client is None:
+            http2 = HTTP2_AVAILABLE and _setting(name, "HTTP2", "1") == "1"
+            stats = self._stats[name] = _PoolStats()
+
+            async def on_request(request: httpx.Request):
+                stats.requests += 1
+                stats.last_used = time.monotonic()
+
+            client = self._clients[name] = httpx.AsyncClient(
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=int(_setting(name, "MAX_CONNECTIONS", "200")),
+                    max_keepalive_connections=int(_setting(name, "MAX_KEEPALIVE", "50")),
+                    # httpx drops idle connections after 5s by default
+                    keepalive_expiry=float(_setting(name, "KEEPALIVE_EXPIRY", "90"))
+                ),
+                timeout=self.timeout(name),
+                event_hooks={"request": [on_request]},
+                follow_redirects=True
+            )
+            logging.info(f"Created upstream pool {name} (http2={http2})")
+        if base_url:
+            self._base_urls[name] = base_url
+        return client
+
+    async def warm(self, names: Optional[Iterable[str]] = None, idle_for: float = 0.0):
+        """
+        Open a connection in each pool (or the named ones) that has been
+        idle for at least idle_for seconds. Failures are only logged.
+        """
+        now = time.monotonic()
+        targets = [
+            name for name in (names if names is not None else list(self._base_urls))
+            if name in self._base_urls and now - self._stats[name].last_used >= idle_for
+        ]
+
+        async def warm_one(name: str):
+            stats = self._stats[name]
+            try:
+                await self._clients[name].head(self._base_urls[name])
+                stats.warmups += 1
+            except httpx.HTTPError as e:
+                stats.warmup_failures += 1
+                logging.warning(f"Warm-up of upstream pool {name} failed: {e!r}")
+
+        await asyncio.gather(*(warm_one(name) for name in targets))
+
+    async def keep_warm(self, interval: float):
+        """Re-warm idle pools every interval seconds until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            await self.warm(idle_for=interval)
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        """Per-pool limits, connection counts and request totals, for sizing pools"""
+        now = time.monotonic()
+        pools = {}
+        for name, client in self._clients.items():
+            stats = self._stats[name]
+            entry = {
+                "base_url": self._base_urls.get(name),
+                "requests": stats.requests,
+                "idle_seconds": round(now - stats.last_used, 1) if stats.last_used else None,
+                "warmups": stats.warmups,
+                "warmup_failures": stats.warmup_failures,
+            }
+            # httpcore exposes no public pool introspection; read it defensively
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            if pool is not None:
+                connections = list(getattr(pool, "connections", []))
+                idle = sum(1 for connection in connections if connection.is_idle())
+                entry.update({
+                    "http2": bool(getattr(pool, "_http2", False)),
+                    "max_connections": getattr(pool, "_max_connections", None),
+                    "max_keepalive_connections": getattr(pool, "_max_keepalive_connections", None),
+                    "connections": len(connections),
+                    "idle_connections": idle,
+                    "active_connections": len(connections) - idle,
+                    "queued_requests": sum(1 for request in getattr(pool, "_requests", []) if request.is_queued()),
+                })
+            pools[name] = entry
+        return pools
+
+    async def aclose(self):
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+
+# Process-wide pools; providers attach to these when they are constructed
+UPSTREAM = UpstreamTransport()
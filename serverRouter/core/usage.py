@@ -0,0 +1,65 @@
+from typing import Dict, Optional
+
+# Providers report usage under different key schemes
+INPUT_TOKEN_KEYS = ("prompt_tokens", "input_tokens")
+OUTPUT_TOKEN_KEYS = ("completion_tokens", "output_tokens")
+# Added by every provider that reports prompt-cache hits
+CACHED_INPUT_KEY = "cached_input_tokens"
+
+
+def _first(usage: Dict[str, int], keys) -> int:
+    for key in keys:
+        value = usage.get(key)
+        if value is not None:
+            return value
+    return 0
+
+
+def cache_usage(input_tokens: int, cached_tokens: Optional[int], cache_write_tokens: Optional[int] = None) -> Dict[str, int]:
+    """
+    Cached vs uncached split of a request's input tokens.
+
+    input_tokens is the full prompt, cache hits included. Providers merge
+    the result into their usage dict.
+    """
+    cached = cached_tokens or 0
+    usage = {CACHED_INPUT_KEY: cached, "uncached_input_tokens": max(input_tokens - cached, 0)}
+    if cache_write_tokens:
+        usage["cache_write_input_tokens"] = cache_write_tokens
+    return usage
+
+
+def normalize_usage(usage: Optional[Dict[str, int]]) -> Dict[str, int]:
+    """
+    Map a provider usage dict onto input/output token counts.
+
+    OpenAI, DeepSeek and Gemini report prompt_tokens/completion_tokens,
+    Anthropic reports input_tokens/output_tokens. Prompt-cache hits are
+    included in input_tokens and also reported as cached_input_tokens.
+    """
+    usage = usage or {}
+    input_tokens = _first(usage, INPUT_TOKEN_KEYS)
+    output_tokens = _first(usage, OUTPUT_TOKEN_KEYS)
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cached_input_tokens": usage.get(CACHED_INPUT_KEY, 0)
+    }
+
+
+def usage_cost(tokens: Dict[str, int], pricing) -> float:
+    """
+    USD cost of normalized token counts at a model's list prices (a
+    ModelPricing); 0 when the model is unpriced. Cache hits are billed at
+    the cached input rate when the model has one.
+    """
+    if pricing is None:
+        return 0.0
+    input_rate = pricing.input_per_mtok or 0.0
+    cached_rate = pricing.cached_input_per_mtok if pricing.cached_input_per_mtok is not None else input_rate
+    cached = min(tokens["cached_input_tokens"], tokens["input_tokens"])
+    return (
+        (tokens["input_tokens"] - cached) * input_rate
+        + cached * cached_rate
+        + tokens["output_tokens"] * (pricing.output_per_mtok or 0.0)
+    ) / 1_000_000
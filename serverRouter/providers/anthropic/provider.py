@@ -1,41 +1,90 @@
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, Optional
 import anthropic
-from serverRouter.core.interfaces import ChatProvider
-from serverRouter.core.datamodels import ChatCompletionRequest, ChatCompletionResponse, ChatMessage
+from serverRouter.core.interfaces import ChatProvider, ProbedProvider
+from serverRouter.core.datamodels import ChatCompletionRequest, ChatCompletionResponse, ChatCompletionChunk, ChatMessage
 from serverRouter.core.exceptions import ProviderError
+from serverRouter.core.transport import UPSTREAM
+from serverRouter.core.usage import cache_usage
 from dotenv import load_dotenv
+import os
 
 load_dotenv(".env")
 
-class AnthropicProvider(ChatProvider):
+def _content(msg: ChatMessage):
+    """Plain string content, or a text block when the message is a cache breakpoint"""
+    if not msg.cache_control:
+        return msg.content
+    return [{"type": "text", "text": msg.content, "cache_control": msg.cache_control}]
+
+def _prompt(request: ChatCompletionRequest):
+    """
+    Split a request into Anthropic's system blocks and messages.
+
+    Anthropic takes system prompts as a separate parameter rather than as
+    messages with role "system".
+    """
+    system = [
+        {"type": "text", "text": msg.content, **({"cache_control": msg.cache_control} if msg.cache_control else {})}
+        for msg in request.messages if msg.role == "system"
+    ]
+    messages = [
+        {"role": msg.role, "content": _content(msg)}
+        for msg in request.messages if msg.role != "system"
+    ]
+    return system or anthropic.NOT_GIVEN, messages
+
+def _usage(usage) -> Dict[str, int]:
+    """
+    Anthropic's input_tokens excludes cache reads and writes; report the
+    full prompt as input_tokens and the cache split alongside it.
+    """
+    cache_read = usage.cache_read_input_tokens or 0
+    cache_write = usage.cache_creation_input_tokens or 0
+    input_tokens = usage.input_tokens + cache_read + cache_write
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": usage.output_tokens,
+        **cache_usage(input_tokens, cache_read, cache_write)
+    }
+
+class AnthropicProvider(ChatProvider, ProbedProvider):
     """Anthropic chat completion provider"""
     
     def __init__(self):
         """Initialize the Anthropic provider with API key from environment"""
         try:
-            self.client = anthropic.AsyncAnthropic()
+            base_url = os.getenv("ANTHROPIC_BASE_URL", "https://api.anthropic.com")
+            self.client = anthropic.AsyncAnthropic(
+                base_url=base_url,
+                http_client=UPSTREAM.client("anthropic", base_url),
+                timeout=UPSTREAM.timeout("anthropic"),
+                # The router retries with backoff and a shared budget (core/retry.py)
+                max_retries=0
+            )
         except Exception as e:
             raise ProviderError(f"Failed to initialize Anthropic client: {str(e)}")
     
-    async def chat_complete(self, request: ChatCompletionRequest) -> ChatCompletionResponse:
+    async def chat_complete(self, request: ChatCompletionRequest, timeout: Optional[float] = None) -> ChatCompletionResponse:
         """
         Generate a chat completion using Anthropic's API
         
         Args:
             request: ChatCompletionRequest containing the input parameters
+            timeout: Upstream timeout in seconds (SDK default if None)
             
         Returns:
             ChatCompletionResponse containing the generated response
         """
         try:
+            system, messages = _prompt(request)
+
             # Create the completion
             response = await self.client.messages.create(
                 model=request.model,
-                messages=[
-                    {"role": msg.role, "content": msg.content}
-                    for msg in request.messages
-                ],
-                max_tokens=request.max_tokens if request.max_tokens else None
+                system=system,
+                messages=messages,
+                max_tokens=request.max_tokens if request.max_tokens else None,
+                timeout=timeout if timeout is not None else anthropic.NOT_GIVEN
             )
             
             # Convert Anthropic response to our generic format
@@ -43,14 +92,50 @@ class AnthropicProvider(ChatProvider):
                 model=response.model,
                 content=response.content[0].text,
                 provider="anthropic",
-                usage={
-                    "input_tokens": response.usage.input_tokens,
-                    "output_tokens": response.usage.output_tokens
-                }
-
+                usage=_usage(response.usage)
             )
             
         except anthropic.APIError as e:
-            raise ProviderError(f"Anthropic API error: {str(e)}")
+            raise ProviderError(f"Anthropic API error: {str(e)}", cause=e)
+        except Exception as e:
+            raise ProviderError(f"Unexpected error: {str(e)}", cause=e)
+
+    async def probe(self, timeout: float) -> None:
+        # Listing models is free
+        await self.client.with_options(max_retries=0).models.list(limit=1, timeout=timeout)
+
+    async def chat_stream(self, request: ChatCompletionRequest, timeout: Optional[float] = None) -> AsyncIterator[ChatCompletionChunk]:
+        """
+        Stream a chat completion using Anthropic's messages streaming API
+        
+        Args:
+            request: ChatCompletionRequest containing the input parameters
+            timeout: Upstream timeout in seconds (SDK default if None)
+            
+        Yields:
+            ChatCompletionChunk objects, the last one carrying usage
+        """
+        try:
+            system, messages = _prompt(request)
+            async with self.client.messages.stream(
+                model=request.model,
+                system=system,
+                messages=messages,
+                max_tokens=request.max_tokens if request.max_tokens else None,
+                timeout=timeout if timeout is not None else anthropic.NOT_GIVEN
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield ChatCompletionChunk(model=request.model, provider="anthropic", delta=text)
+                message = await stream.get_final_message()
+
+            yield ChatCompletionChunk(
+                model=message.model,
+                provider="anthropic",
+                finish_reason=message.stop_reason,
+                usage=_usage(message.usage)
+            )
+
+        except anthropic.APIError as e:
+            raise ProviderError(f"Anthropic API error: {str(e)}", cause=e)
         except Exception as e:
-            raise ProviderError(f"Unexpected error: {str(e)}")
+            raise ProviderError(f"Unexpected error: {str(e)}", cause=e)
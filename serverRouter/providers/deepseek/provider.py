@@ -1,15 +1,28 @@
-from typing import Dict, Any, List, Optional
-from openai import AsyncOpenAI
-from serverRouter.core.interfaces import ChatProvider
-from serverRouter.core.datamodels import ChatCompletionRequest, ChatCompletionResponse
+from typing import Dict, Any, List, Optional, AsyncIterator
+from openai import AsyncOpenAI, NOT_GIVEN
+from openai.types import CompletionUsage
+from serverRouter.core.interfaces import ChatProvider, PassthroughChatProvider, ProbedProvider, RawChatCompletion
+from serverRouter.core.datamodels import ChatCompletionRequest, ChatCompletionResponse, ChatCompletionChunk
 from serverRouter.core.exceptions import ProviderError
+from serverRouter.core.transport import UPSTREAM
+from serverRouter.providers.passthrough import post_chat_completion
+from serverRouter.core.usage import cache_usage
 from dotenv import load_dotenv, find_dotenv
 import os
 import logging
 
 load_dotenv(find_dotenv())
 
-class DeepSeekProvider(ChatProvider):
+def _usage(usage) -> Dict[str, int]:
+    """Token usage; DeepSeek's context cache reports hits as prompt_cache_hit_tokens"""
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+        **cache_usage(usage.prompt_tokens, getattr(usage, "prompt_cache_hit_tokens", None))
+    }
+
+class DeepSeekProvider(ChatProvider, PassthroughChatProvider, ProbedProvider):
     """DeepSeek R1 provider with tool calling support"""
     
     def __init__(self, api_key: str = None, base_url: str = None):
@@ -20,37 +33,53 @@ class DeepSeekProvider(ChatProvider):
         base_url = base_url or os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
         
         try:
-            self.client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+            self.client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=UPSTREAM.client("deepseek", base_url),
+                timeout=UPSTREAM.timeout("deepseek"),
+                # The router retries with backoff and a shared budget (core/retry.py)
+                max_retries=0
+            )
             self.supported_models = ["deepseek-r1"]
         except Exception as e:
             logging.exception("Client init error")
             raise ProviderError(f"Client init failed: {str(e)}")
 
-    async def chat_complete(self, request: ChatCompletionRequest) -> ChatCompletionResponse:
-        try:
-            # Convert messages to API format
-            messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
+    def _build_params(self, request: ChatCompletionRequest, stream: bool, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Translate a ChatCompletionRequest into DeepSeek API parameters"""
+        # Convert messages to API format
+        messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
+        
+        # Base parameters
+        params = {
+            "model": request.model,
+            "messages": messages,
+            "max_tokens": request.max_tokens,
+            "temperature": request.temperature,
+            "stream": stream,
+            "timeout": timeout if timeout is not None else NOT_GIVEN
+        }
+        if stream:
+            params["stream_options"] = {"include_usage": True}
+
+        # Add tools if specified
+        if hasattr(request, "tools") and request.tools:
+            params["tools"] = request.tools
+            
+        # Add tool choice if specified
+        if hasattr(request, "tool_choice") and request.tool_choice:
+            params["tool_choice"] = request.tool_choice
             
-            # Base parameters
-            params = {
-                "model": request.model,
-                "messages": messages,
-                "max_tokens": request.max_tokens,
-                "temperature": request.temperature,
-                "stream": False
-            }
+        # Add response format if specified
+        if hasattr(request, "response_format") and request.response_format:
+            params["response_format"] = request.response_format
 
-            # Add tools if specified
-            if hasattr(request, "tools") and request.tools:
-                params["tools"] = request.tools
-                
-            # Add tool choice if specified
-            if hasattr(request, "tool_choice") and request.tool_choice:
-                params["tool_choice"] = request.tool_choice
-                
-            # Add response format if specified
-            if hasattr(request, "response_format") and request.response_format:
-                params["response_format"] = request.response_format
+        return params
+
+    async def chat_complete(self, request: ChatCompletionRequest, timeout: Optional[float] = None) -> ChatCompletionResponse:
+        try:
+            params = self._build_params(request, stream=False, timeout=timeout)
 
             # API call
             response = await self.client.chat.completions.create(**params)
@@ -75,13 +104,65 @@ class DeepSeekProvider(ChatProvider):
                 content=response.choices[0].message.content,
                 provider="deepseek",
                 tool_calls=tool_calls,
-                usage={
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                }
+                usage=_usage(response.usage)
             )
             
         except Exception as e:
             logging.error(f"DeepSeek R1 API Error: {str(e)}")
-            raise ProviderError(f"API request failed: {str(e)}")
\ No newline at end of file
+            raise ProviderError(f"API request failed: {str(e)}", cause=e)
+
+    async def chat_complete_raw(self, request: ChatCompletionRequest, timeout: Optional[float] = None) -> RawChatCompletion:
+        try:
+            body, usage = await post_chat_completion(self.client, self._build_params(request, stream=False, timeout=timeout))
+            return RawChatCompletion(body=body, usage=_usage(CompletionUsage.model_validate(usage)) if usage else {})
+        except Exception as e:
+            logging.error(f"DeepSeek R1 API Error: {str(e)}")
+            raise ProviderError(f"API request failed: {str(e)}", cause=e)
+
+    async def probe(self, timeout: float) -> None:
+        # Listing models is free
+        await self.client.with_options(max_retries=0).models.list(timeout=timeout)
+
+    async def chat_stream(self, request: ChatCompletionRequest, timeout: Optional[float] = None) -> AsyncIterator[ChatCompletionChunk]:
+        try:
+            stream = await self.client.chat.completions.create(**self._build_params(request, stream=True, timeout=timeout))
+
+            model = request.model
+            finish_reason = None
+            usage = {}
+            # Tool call arguments arrive as fragments keyed by index
+            tool_calls: Dict[int, Dict[str, Any]] = {}
+            async with stream:
+                async for chunk in stream:
+                    model = chunk.model or model
+                    if chunk.usage:
+                        usage = _usage(chunk.usage)
+                    if not chunk.choices:
+                        continue
+                    choice = chunk.choices[0]
+                    finish_reason = choice.finish_reason or finish_reason
+                    for tc in choice.delta.tool_calls or []:
+                        call = tool_calls.setdefault(tc.index, {
+                            "id": "",
+                            "type": "function",
+                            "function": {"name": "", "arguments": ""}
+                        })
+                        if tc.id:
+                            call["id"] = tc.id
+                        if tc.function and tc.function.name:
+                            call["function"]["name"] += tc.function.name
+                        if tc.function and tc.function.arguments:
+                            call["function"]["arguments"] += tc.function.arguments
+                    if choice.delta.content:
+                        yield ChatCompletionChunk(model=model, provider="deepseek", delta=choice.delta.content)
+
+            yield ChatCompletionChunk(
+                model=model,
+                provider="deepseek",
+                tool_calls=[tool_calls[i] for i in sorted(tool_calls)] or None,
+                finish_reason=finish_reason or "stop",
+                usage=usage
+            )
+        except Exception as e:
+            logging.error(f"DeepSeek R1 API Error: {str(e)}")
+            raise ProviderError(f"API request failed: {str(e)}", cause=e)
@@ -1,21 +1,40 @@
 # serverRouter/providers/gemini/provider.py
 import asyncio
-from typing import Dict, Any, List, Union
+from typing import Dict, Any, List, Union, AsyncIterator, Optional
 from google import generativeai as genai
 import asyncio
 from typing import Dict, Any, List, Union
-from serverRouter.core.interfaces import ChatProvider
+from serverRouter.core.interfaces import ChatProvider, ProbedProvider
 from serverRouter.core.datamodels import (
     ChatCompletionRequest,
     ChatCompletionResponse,
+    ChatCompletionChunk,
 )
 from serverRouter.core.exceptions import ProviderError
+from serverRouter.core.usage import cache_usage
 from dotenv import load_dotenv, find_dotenv
 import os
 import logging
 load_dotenv(find_dotenv())
 
-class GeminiProvider(ChatProvider):
+def _usage(metadata) -> Dict[str, int]:
+    """Usage from Gemini's usage_metadata; prompt_token_count includes cached content"""
+    if not metadata:
+        return {}
+    return {
+        "prompt_tokens": metadata.prompt_token_count,
+        "completion_tokens": metadata.candidates_token_count,
+        **cache_usage(metadata.prompt_token_count, metadata.cached_content_token_count)
+    }
+
+def _request_options(timeout: Optional[float]) -> Dict[str, Any]:
+    """The SDK's own retries are disabled; the router retries with backoff and a shared budget"""
+    options: Dict[str, Any] = {"retry": None}
+    if timeout is not None:
+        options["timeout"] = timeout
+    return options
+
+class GeminiProvider(ChatProvider, ProbedProvider):
     def __init__(self, api_key: str = None):
         if api_key is None:
             api_key = os.getenv("GEMINI_API_KEY")
@@ -24,26 +43,44 @@ class GeminiProvider(ChatProvider):
 
         try:
             # genai.configure(api_key=api_key) #no longer using this
-            pass
             # Removed self.model_name, as we'll handle models dynamically
+            endpoint = os.getenv("GEMINI_API_ENDPOINT")
+            if endpoint:
+                # Alternative gRPC endpoint ("host:port"), e.g. a local stand-in server
+                genai.configure(api_key=api_key, client_options={"api_endpoint": endpoint})
         except Exception as e:
             logging.exception("Error initializing Gemini client:")
             raise ProviderError(f"Failed to initialize Gemini client: {str(e)}")
 
-    async def chat_complete(self, request: ChatCompletionRequest) -> ChatCompletionResponse:
-        try:
-            messages = []
-            for msg in request.messages:
-                messages.append({"role": msg.role, "parts": [msg.content]})
+        # GenerativeModel handles are reusable, so build one per model name
+        self._models: Dict[str, genai.GenerativeModel] = {}
+
+    def _model(self, model_name: str) -> genai.GenerativeModel:
+        model = self._models.get(model_name)
+        if model is None:
+            model = self._models[model_name] = genai.GenerativeModel(model_name=model_name)
+        return model
 
-            model = genai.GenerativeModel(model_name=request.model)
+    def _build_contents(self, request: ChatCompletionRequest) -> List[Dict[str, Any]]:
+        messages = []
+        for msg in request.messages:
+            messages.append({"role": msg.role, "parts": [msg.content]})
+        return messages
+
+    def _generation_config(self, request: ChatCompletionRequest):
+        return genai.types.GenerationConfig(
+            max_output_tokens=request.max_tokens or 2048,  # Increased default
+            temperature=request.temperature
+        )
+
+    async def chat_complete(self, request: ChatCompletionRequest, timeout: Optional[float] = None) -> ChatCompletionResponse:
+        try:
+            model = self._model(request.model)
 
             response = await model.generate_content_async(
-                contents=messages,
-                generation_config=genai.types.GenerationConfig(
-                    max_output_tokens=request.max_tokens or 2048,  # Increased default
-                    temperature=request.temperature
-                )
+                contents=self._build_contents(request),
+                generation_config=self._generation_config(request),
+                request_options=_request_options(timeout)
             )
 
             if response and response.text:
@@ -51,9 +88,46 @@ class GeminiProvider(ChatProvider):
                     model=request.model,
                     content=response.text,
                     provider="gemini",
-                    usage={}  #  Gemini doesn't directly provide usage in the same way
+                    usage=_usage(response.usage_metadata)
                 )
         except Exception as e:
             logging.exception("Gemini API error (chat):")
-            raise ProviderError(f"Gemini API error (chat): {str(e)}")
-        
+            raise ProviderError(f"Gemini API error (chat): {str(e)}", cause=e)
+        raise ProviderError("Gemini API error (chat): empty response")
+
+    async def probe(self, timeout: float) -> None:
+        # Listing models is free; the SDK's model client is synchronous
+        await asyncio.to_thread(
+            lambda: next(iter(genai.list_models(page_size=1, request_options={"timeout": timeout, "retry": None})), None)
+        )
+
+    async def chat_stream(self, request: ChatCompletionRequest, timeout: Optional[float] = None) -> AsyncIterator[ChatCompletionChunk]:
+        try:
+            model = self._model(request.model)
+
+            response = await model.generate_content_async(
+                contents=self._build_contents(request),
+                generation_config=self._generation_config(request),
+                stream=True,
+                request_options=_request_options(timeout)
+            )
+
+            finish_reason = None
+            usage = {}
+            async for chunk in response:
+                if chunk.candidates and chunk.candidates[0].finish_reason:
+                    finish_reason = chunk.candidates[0].finish_reason.name.lower()
+                if chunk.usage_metadata:
+                    usage = _usage(chunk.usage_metadata)
+                if chunk.parts and chunk.text:
+                    yield ChatCompletionChunk(model=request.model, provider="gemini", delta=chunk.text)
+
+            yield ChatCompletionChunk(
+                model=request.model,
+                provider="gemini",
+                finish_reason=finish_reason or "stop",
+                usage=usage
+            )
+        except Exception as e:
+            logging.exception("Gemini API error (chat stream):")
+            raise ProviderError(f"Gemini API error (chat stream): {str(e)}", cause=e)
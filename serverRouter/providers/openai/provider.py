@@ -1,15 +1,20 @@
-from typing import Dict, Any
-from openai import AsyncOpenAI
+from typing import Dict, Any, AsyncIterator, Optional
+from openai import AsyncOpenAI, NOT_GIVEN
 import os
 import openai
-from serverRouter.core.interfaces import ChatProvider, ImageProvider
+from openai.types import CompletionUsage
+from serverRouter.core.interfaces import ChatProvider, ImageProvider, PassthroughChatProvider, ProbedProvider, RawChatCompletion
 from serverRouter.core.datamodels import (
     ChatCompletionRequest, 
     ChatCompletionResponse,
+    ChatCompletionChunk,
     ImageGenerationRequest,
     ImageGenerationResponse
 )
 from serverRouter.core.exceptions import ProviderError
+from serverRouter.core.transport import UPSTREAM
+from serverRouter.providers.passthrough import post_chat_completion
+from serverRouter.core.usage import cache_usage
 import os
 from dotenv import load_dotenv
 
@@ -18,7 +23,16 @@ load_dotenv()
 from dotenv import load_dotenv
 load_dotenv()
 
-class OpenAIProvider(ChatProvider, ImageProvider):
+def _usage(usage) -> Dict[str, int]:
+    """Token usage; OpenAI caches long prompt prefixes automatically and reports the hits"""
+    details = usage.prompt_tokens_details
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        **cache_usage(usage.prompt_tokens, details.cached_tokens if details else None)
+    }
+
+class OpenAIProvider(ChatProvider, PassthroughChatProvider, ImageProvider, ProbedProvider):
     """OpenAI provider supporting both chat and image generation"""
     
     def __init__(self, api_key: str = None):
@@ -28,44 +42,99 @@ class OpenAIProvider(ChatProvider, ImageProvider):
                 api_key = os.getenv("OPENAI_API_KEY")
             if not api_key:
                 raise ProviderError("OPENAI_API_KEY not set in environment.")
-            self.client = AsyncOpenAI(api_key=api_key)
+            base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+            self.client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=UPSTREAM.client("openai", base_url),
+                timeout=UPSTREAM.timeout("openai"),
+                # The router retries with backoff and a shared budget (core/retry.py)
+                max_retries=0
+            )
 
         except Exception as e:
             raise ProviderError(f"Failed to initialize OpenAI client: {str(e)}")
 
             
-    async def chat_complete(self, request: ChatCompletionRequest) -> ChatCompletionResponse:
+    def _params(self, request: ChatCompletionRequest, timeout: Optional[float], stream: bool = False) -> Dict[str, Any]:
+        """Chat completion parameters, shared by the plain, raw and streaming calls"""
+        params = {
+            "model": request.model,
+            "messages": [
+                {"role": msg.role, "content": msg.content}
+                for msg in request.messages
+            ],
+            "temperature": request.temperature,
+            "max_tokens": request.max_tokens,
+            "timeout": timeout if timeout is not None else NOT_GIVEN
+        }
+        if stream:
+            # The usage block arrives in a final chunk after the last delta
+            params.update(stream=True, stream_options={"include_usage": True})
+        return params
+
+    async def chat_complete(self, request: ChatCompletionRequest, timeout: Optional[float] = None) -> ChatCompletionResponse:
         try:
-            response = await self.client.chat.completions.create(
-                model=request.model,
-                messages=[
-                    {"role": msg.role, "content": msg.content}
-                    for msg in request.messages
-                ],
-                temperature=request.temperature,
-                max_tokens=request.max_tokens
-            )
+            response = await self.client.chat.completions.create(**self._params(request, timeout))
             
             return ChatCompletionResponse(
                 model=response.model,
                 content=response.choices[0].message.content,
                 provider="openai",
-                usage={
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens
-                }
+                usage=_usage(response.usage)
+            )
+        except Exception as e:
+            raise ProviderError(f"OpenAI API error: {str(e)}", cause=e)
+
+    async def chat_complete_raw(self, request: ChatCompletionRequest, timeout: Optional[float] = None) -> RawChatCompletion:
+        try:
+            body, usage = await post_chat_completion(self.client, self._params(request, timeout))
+            return RawChatCompletion(body=body, usage=_usage(CompletionUsage.model_validate(usage)) if usage else {})
+        except Exception as e:
+            raise ProviderError(f"OpenAI API error: {str(e)}", cause=e)
+
+    async def probe(self, timeout: float) -> None:
+        # Listing models is free
+        await self.client.with_options(max_retries=0).models.list(timeout=timeout)
+
+    async def chat_stream(self, request: ChatCompletionRequest, timeout: Optional[float] = None) -> AsyncIterator[ChatCompletionChunk]:
+        try:
+            stream = await self.client.chat.completions.create(**self._params(request, timeout, stream=True))
+
+            model = request.model
+            finish_reason = None
+            usage = {}
+            async with stream:
+                async for chunk in stream:
+                    model = chunk.model or model
+                    if chunk.usage:
+                        usage = _usage(chunk.usage)
+                    if not chunk.choices:
+                        continue
+                    choice = chunk.choices[0]
+                    finish_reason = choice.finish_reason or finish_reason
+                    if choice.delta.content:
+                        yield ChatCompletionChunk(model=model, provider="openai", delta=choice.delta.content)
+
+            # With include_usage the usage block arrives after the last delta
+            yield ChatCompletionChunk(
+                model=model,
+                provider="openai",
+                finish_reason=finish_reason or "stop",
+                usage=usage
             )
         except Exception as e:
-            raise ProviderError(f"OpenAI API error: {str(e)}")
+            raise ProviderError(f"OpenAI API error: {str(e)}", cause=e)
 
-    async def generate_image(self, request: ImageGenerationRequest) -> ImageGenerationResponse:
+    async def generate_image(self, request: ImageGenerationRequest, timeout: Optional[float] = None) -> ImageGenerationResponse:
         try:
             response = await self.client.images.generate(
                 model=request.model,
                 prompt=request.prompt,
                 size=request.size.value,
                 quality=request.quality,
-                n=request.n
+                n=request.n,
+                timeout=timeout if timeout is not None else NOT_GIVEN
             )
             
             return ImageGenerationResponse(
@@ -74,4 +143,4 @@ class OpenAIProvider(ChatProvider, ImageProvider):
                 provider="openai"
             )
         except Exception as e:
-            raise ProviderError(f"OpenAI API error: {str(e)}")
\ No newline at end of file
+            raise ProviderError(f"OpenAI API error: {str(e)}", cause=e)
\ No newline at end of file
@@ -0,0 +1,39 @@
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+import orjson
+from openai import NOT_GIVEN, AsyncOpenAI
+from pydantic import BaseModel
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(exclude_none=True)
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    return value
+
+
+async def post_chat_completion(client: AsyncOpenAI, params: Dict[str, Any]) -> Tuple[bytes, Optional[Dict[str, Any]]]:
+    """
+    POST a chat completion through an OpenAI-compatible SDK client and
+    return the raw response body and its usage block.
+
+    The client still supplies auth, base URL, connection pool, retries and
+    error mapping, but create()'s per-call parameter transformation and
+    response model construction are skipped; both cost more CPU than the
+    rest of the router's work for a typical request.
+    """
+    timeout = params.get("timeout", NOT_GIVEN)
+    body = {
+        key: _plain(value) for key, value in params.items()
+        if key != "timeout" and value is not None and value is not NOT_GIVEN
+    }
+    response = await client.post(
+        "/chat/completions",
+        body=body,
+        cast_to=httpx.Response,
+        options={"timeout": timeout} if timeout is not NOT_GIVEN else {}
+    )
+    content = response.content
+    return content, orjson.loads(content).get("usage")
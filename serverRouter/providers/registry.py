@@ -0,0 +1,124 @@
+import asyncio
+import importlib
+import logging
+import os
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from dotenv import find_dotenv, load_dotenv
+
+from serverRouter.core.datamodels import ModelProvider
+
+load_dotenv(find_dotenv())
+
+
+class ProviderSpec(NamedTuple):
+    """Where a provider class lives and the environment it needs"""
+    target: str                 # "module:Class", imported on first use
+    required_env: Tuple[str, ...]
+
+
+# Provider SDKs are only imported when one of their models is first used
+PROVIDER_SPECS: Dict[ModelProvider, ProviderSpec] = {
+    ModelProvider.OPENAI: ProviderSpec("serverRouter.providers.openai.provider:OpenAIProvider", ("OPENAI_API_KEY",)),
+    ModelProvider.ANTHROPIC: ProviderSpec("serverRouter.providers.anthropic.provider:AnthropicProvider", ("ANTHROPIC_API_KEY",)),
+    ModelProvider.GEMINI: ProviderSpec("serverRouter.providers.gemini.provider:GeminiProvider", ("GEMINI_API_KEY",)),
+    ModelProvider.DEEPSEEK: ProviderSpec("serverRouter.providers.deepseek.provider:DeepSeekProvider", ("DEEPSEEK_API_KEY",)),
+}
+
+
+class ProviderRegistry:
+    """
+    Lazily constructed provider instances keyed by ModelProvider.
+
+    A provider counts as available when its required environment variables
+    are set and it hasn't failed to initialize. Its module (and SDK) is
+    imported and constructed on first use, by load() in a thread when called
+    from the event loop or by get() inline; an import or constructor failure disables
+    only that provider. Instances can also be assigned directly, e.g. to
+    plug in a custom or fake provider.
+    """
+
+    def __init__(self, specs: Dict[ModelProvider, ProviderSpec]):
+        self.specs = dict(specs)
+        self._instances: Dict[ModelProvider, object] = {}
+        self._failures: Dict[ModelProvider, str] = {}
+        # Concurrent first uses construct a provider once
+        self._lock = threading.Lock()
+
+    def missing_env(self, provider: ModelProvider) -> List[str]:
+        spec = self.specs.get(provider)
+        if spec is None:
+            return []
+        return [name for name in spec.required_env if not os.getenv(name)]
+
+    def available(self, provider: ModelProvider) -> bool:
+        if provider in self._instances:
+            return True
+        if provider not in self.specs or provider in self._failures:
+            return False
+        return not self.missing_env(provider)
+
+    def __contains__(self, provider: ModelProvider) -> bool:
+        return self.available(provider)
+
+    def __setitem__(self, provider: ModelProvider, instance: object):
+        self._instances[provider] = instance
+        self._failures.pop(provider, None)
+
+    def __iter__(self) -> Iterator[ModelProvider]:
+        return iter([provider for provider in ModelProvider if self.available(provider)])
+
+    def get(self, provider: ModelProvider, default=None):
+        """The provider instance, importing and constructing it on first use"""
+        instance = self._instances.get(provider)
+        if instance is not None:
+            return instance
+        with self._lock:
+            instance = self._instances.get(provider)
+            if instance is not None:
+                return instance
+            if not self.available(provider):
+                return default
+
+            module_name, _, class_name = self.specs[provider].target.partition(":")
+            try:
+                provider_class = getattr(importlib.import_module(module_name), class_name)
+                instance = self._instances[provider] = provider_class()
+            except Exception as e:
+                logging.exception(f"Failed to initialize provider {provider.value}; its models are disabled")
+                self._failures[provider] = str(e)
+                return default
+        logging.info(f"Initialized provider {provider.value}")
+        return instance
+
+    async def load(self, provider: ModelProvider, default=None):
+        """
+        get() for the event loop: a first use imports the SDK and builds its
+        client (TLS setup included) in a thread, not on the loop
+        """
+        instance = self._instances.get(provider)
+        if instance is not None:
+            return instance
+        if not self.available(provider):
+            return default
+        return await asyncio.to_thread(self.get, provider, default)
+
+    def status(self) -> Dict[str, Dict[str, object]]:
+        """Availability of every known provider and why it is disabled, if it is"""
+        status = {}
+        for provider in ModelProvider:
+            reason: Optional[str] = None
+            if provider in self._failures:
+                reason = f"initialization failed: {self._failures[provider]}"
+            elif provider not in self._instances:
+                if provider not in self.specs:
+                    reason = "not registered"
+                elif self.missing_env(provider):
+                    reason = f"missing {', '.join(self.missing_env(provider))}"
+            status[provider.value] = {
+                "available": reason is None,
+                "loaded": provider in self._instances,
+                "reason": reason,
+            }
+        return status
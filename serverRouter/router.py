@@ -1,162 +1,1361 @@
-from fastapi import FastAPI, HTTPException, Security, Depends
+from fastapi import FastAPI, HTTPException, Security, Depends, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from serverRouter.core.datamodels import (
     ChatCompletionRequest,
     ChatCompletionResponse,
+    ChatCompletionChunk,
+    ChatCompletionBatchRequest,
+    ChatCompletionBatchResponse,
+    ChatCompletionBatchItem,
+    BatchItemError,
+    ModelInfo,
     ModelProvider,
+    ImageError,
     ImageGenerationRequest,
-    ImageGenerationResponse
+    ImageGenerationResponse,
+    ImageJob,
+    TokenizeRequest,
+    TokenizeResponse
 )
-from serverRouter.providers.anthropic.provider import AnthropicProvider
-from serverRouter.providers.openai.provider import OpenAIProvider
-from serverRouter.providers.gemini.provider import GeminiProvider  # Make sure the path is correct
-from serverRouter.providers.deepseek.provider import DeepSeekProvider
-from serverRouter.core.models import (
-    MODELS,
-    CHAT_MODELS,
-    IMAGE_MODELS
+from serverRouter.providers.registry import PROVIDER_SPECS, ProviderRegistry
+from serverRouter.core.auth import CURRENT_KEY, ApiKey, ApiKeyStore, charge_current_key
+from serverRouter.core.cache import ResponseCache, request_cache_key
+from serverRouter.core.circuit import CircuitBreakerRegistry, CircuitState
+from serverRouter.core.coalescing import SingleFlight, WaitTimeout
+from serverRouter.core.deadline import TIMEOUT_HEADER, RequestScope, current_deadline, current_scope, request_timeout
+from serverRouter.core.concurrency import LimiterRegistry
+from serverRouter.core.exceptions import CapacityExceededError, CircuitOpenError, ClientDisconnectedError, DeadlineExceededError
+from serverRouter.core.interfaces import ImageProvider, PassthroughChatProvider, ProbedProvider, RawChatCompletion
+from serverRouter.core.hedging import LatencyTracker, hedged_call
+from serverRouter.core.image_store import IMAGE_TYPES, IMMUTABLE, ImageStore, MappedFileResponse
+from serverRouter.core.jobs import ImageJobStore
+from serverRouter.core.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    OVERHEAD_BUCKETS,
+    MetricsRegistry,
+    add_upstream_time,
+    start_upstream_timer
 )
+from serverRouter.core.middleware import RequestSizeLimitMiddleware, ResponseHeadersMiddleware
+from serverRouter.core.retry import RetryBudget, RetryPolicy
+from serverRouter.core.prompt_cache import EXPLICIT_CACHE_PROVIDERS, PrefixPlan, PromptCachePlanner
+from serverRouter.core.routing import ROUTING_STRATEGIES, RoutingEngine, parse_auto_model
+from serverRouter.core.serialization import FastJSONResponse
+from serverRouter.core.tokenizer import TOKENIZERS, PromptBudget
+from serverRouter.core.transport import UPSTREAM
+from serverRouter.core.usage import normalize_usage, usage_cost
+from serverRouter.core.models import REGISTRY, Listing
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
 import os
+import math
+import time
+import json
 import logging
 import asyncio
+import importlib
 
 # Configure logging (if not already configured)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-app = FastAPI(title="OmniLLM", description="One Key, One API, Hundreds of Models")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_task = asyncio.ensure_future(_warm_providers()) if WARMUP_ENABLED else None
+    tokenizer_task = asyncio.ensure_future(_load_tokenizers())
+    reload_task = asyncio.ensure_future(REGISTRY.watch(MODELS_RELOAD_INTERVAL)) if MODELS_RELOAD_INTERVAL > 0 else None
+    probe_task = None
+    if BREAKERS is not None and CIRCUIT_PROBE_INTERVAL > 0:
+        probe_task = asyncio.ensure_future(BREAKERS.probe_forever(CIRCUIT_PROBE_INTERVAL, _probe_circuit))
+    yield
+    for task in (warm_task, tokenizer_task, reload_task, probe_task):
+        if task is not None:
+            task.cancel()
+    await IMAGE_JOBS.aclose()
+    if IMAGE_STORE is not None:
+        await IMAGE_STORE.aclose()
+    await UPSTREAM.aclose()
+
+app = FastAPI(
+    title="OmniLLM",
+    description="One Key, One API, Hundreds of Models",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
+)
 security = HTTPBearer()
 
-# Provider instances cache
-PROVIDERS = {}
+# Request size caps (0 disables); prompts near the largest context windows are a few MB
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    max_body_bytes=int(os.getenv("OMNI_MAX_BODY_BYTES", str(16 * 1024 * 1024))),
+    max_header_bytes=int(os.getenv("OMNI_MAX_HEADER_BYTES", str(64 * 1024)))
+)
+# Per-key rate-limit headers set by verify_api_key
+app.add_middleware(ResponseHeadersMiddleware)
 
-# Function to initialize providers (allows for error handling)
-def initialize_providers():
-    global PROVIDERS
-    try:
-        PROVIDERS = {
-            ModelProvider.OPENAI: OpenAIProvider(),
-            ModelProvider.ANTHROPIC: AnthropicProvider(),
-            ModelProvider.GEMINI: GeminiProvider(), # modified to be variable
-            ModelProvider.DEEPSEEK: DeepSeekProvider()
-        }
-    except Exception as e:
-        logging.error(f"Failed to initialize providers: {e}")
-        raise  # Re-raise to prevent the server from starting
-
-# Initialize providers during startup
-try:
-    initialize_providers()
-except Exception:
-    # Handle the error appropriately (e.g., log, exit)
-    import sys
-    sys.exit(1)  # Exit if provider initialization fails
-
-VALID_API_KEYS = {
-    "test-sk1o83e",
-}
-
-def verify_api_key(credentials: HTTPAuthorizationCredentials = Security(security)) -> str:
-    if credentials.credentials not in VALID_API_KEYS:
+# Provider instances, created on the first request for one of their models.
+# A provider without credentials (or that fails to start) is disabled along
+# with its models; the others keep serving.
+PROVIDERS = ProviderRegistry(PROVIDER_SPECS)
+for provider_name, provider_status in PROVIDERS.status().items():
+    if not provider_status["available"]:
+        logging.warning(f"Provider {provider_name} disabled: {provider_status['reason']}")
+
+# Seconds between checks of the model registry file for changes (0 disables hot reload)
+MODELS_RELOAD_INTERVAL = float(os.getenv("OMNI_MODELS_RELOAD_INTERVAL", "2"))
+
+# Open upstream connections at startup, then re-warm pools idle this long (0 disables)
+WARMUP_ENABLED = os.getenv("OMNI_WARMUP", "1") == "1"
+KEEP_WARM_INTERVAL = float(os.getenv("OMNI_KEEP_WARM_INTERVAL", "30"))
+
+async def _warm_providers():
+    """Construct every available provider and pre-open its connection pool"""
+    for provider in list(PROVIDERS):
+        await PROVIDERS.load(provider)
+    await UPSTREAM.warm()
+    if KEEP_WARM_INTERVAL > 0:
+        await UPSTREAM.keep_warm(KEEP_WARM_INTERVAL)
+
+async def _load_tokenizers():
+    """Load the tokenizers of every chat model off the event loop (tiktoken may download them)"""
+    def load():
+        TOKENIZERS.preload({TOKENIZERS.encoding_name(model_info) for model_info in REGISTRY.current.chat.values()})
+    await asyncio.to_thread(load)
+
+# Response cache for deterministic completions. The disk tier is skipped
+# when OMNI_CACHE_DIR is set to an empty string.
+CACHE_ENABLED = os.getenv("OMNI_CACHE_ENABLED", "1") == "1"
+CACHE_MAX_TEMPERATURE = float(os.getenv("OMNI_CACHE_MAX_TEMPERATURE", "0"))
+RESPONSE_CACHE = ResponseCache(
+    maxsize=int(os.getenv("OMNI_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("OMNI_CACHE_TTL", "3600")),
+    disk_dir=os.getenv("OMNI_CACHE_DIR", ".omni_cache") or None
+) if CACHE_ENABLED else None
+
+def _load_semantic_cache():
+    """
+    Build the optional semantic cache from the environment.
+
+    OMNI_SEMANTIC_EMBEDDER may name a "module:callable" that maps text to a
+    vector; otherwise the offline hashing embedder is used. numpy is only
+    imported when the cache is enabled.
+    """
+    from serverRouter.core.semantic_cache import SemanticCache
+
+    embed_fn = None
+    embedder_path = os.getenv("OMNI_SEMANTIC_EMBEDDER")
+    if embedder_path:
+        module_name, _, attr = embedder_path.partition(":")
+        embed_fn = getattr(importlib.import_module(module_name), attr)
+
+    # e.g. OMNI_SEMANTIC_THRESHOLDS="gpt-4o=0.92,claude-3-opus-20240229=0.95"
+    thresholds = {}
+    for item in filter(None, os.getenv("OMNI_SEMANTIC_THRESHOLDS", "").split(",")):
+        model, _, value = item.partition("=")
+        thresholds[model.strip()] = float(value)
+
+    return SemanticCache(
+        capacity=int(os.getenv("OMNI_SEMANTIC_CAPACITY", "10000")),
+        dim=int(os.getenv("OMNI_SEMANTIC_DIM", "512")),
+        embed_fn=embed_fn,
+        path=os.getenv("OMNI_SEMANTIC_PATH") or None,
+        default_threshold=float(os.getenv("OMNI_SEMANTIC_THRESHOLD", "0.9")),
+        thresholds=thresholds
+    )
+
+SEMANTIC_CACHE = _load_semantic_cache() if os.getenv("OMNI_SEMANTIC_CACHE", "0") == "1" else None
+
+# API keys with per-key rate limits and daily quotas (see ApiKeyStore)
+API_KEYS = ApiKeyStore.from_env({"test-sk1o83e": "dev"})
+
+def authenticate_api_key(credentials: HTTPAuthorizationCredentials = Security(security)) -> ApiKey:
+    """The caller's key, without counting the request against its limits"""
+    api_key = API_KEYS.lookup(credentials.credentials)
+    if api_key is None:
         raise HTTPException(
             status_code=401,
             detail=f"Invalid API key"
         )
-    return credentials.credentials
+    return api_key
+
+async def verify_api_key(request: Request, api_key: ApiKey = Depends(authenticate_api_key)) -> ApiKey:
+    """
+    Admit the request against its key's rate limits and quotas before any
+    other work; over-limit keys get a 429 with Retry-After. Async so the
+    key stays in the request's context for usage accounting.
+    """
+    request.state.response_headers = api_key.admit()
+    CURRENT_KEY.set(api_key)
+    return api_key
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison, which is weak: W/ prefixes are ignored"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+def _listing_response(request: Request, listing: Listing) -> Response:
+    """Serve a precomputed listing, or 304 Not Modified when the client's copy is current"""
+    headers = {"ETag": listing.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), listing.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(listing.body, media_type="application/json", headers=headers)
 
 @app.get("/v1/models")
-async def list_models(api_key: str = Depends(verify_api_key)):
-    """List all available models"""
-    return {
-        "models": [
-            {
-                "id": model_id,
-                **model_info.model_dump()
-            }
-            for model_id, model_info in MODELS.items()
-        ]
-    }
+async def list_models(
+    request: Request,
+    capability: Optional[str] = None,
+    provider: Optional[ModelProvider] = None,
+    api_key: ApiKey = Depends(verify_api_key)
+):
+    """
+    List all available models, optionally only those with a capability or
+    from one provider. Each model's "circuit" is closed, open (calls fail
+    fast) or half_open (recovering).
+    """
+    registry = REGISTRY.current
+    return _listing_response(request, registry.listing("all", frozenset(PROVIDERS), capability, provider, _model_health(registry)))
 
 @app.get("/v1/models/chat")
-async def list_chat_models(api_key: str = Depends(verify_api_key)):
-    """List all available chat models"""
-    return {
-        "models": [
-            {
-                "id": model_id,
-                **model_info.model_dump()
-            }
-            for model_id, model_info in CHAT_MODELS.items()
-        ]
-    }
+async def list_chat_models(
+    request: Request,
+    capability: Optional[str] = None,
+    provider: Optional[ModelProvider] = None,
+    api_key: ApiKey = Depends(verify_api_key)
+):
+    """List all available chat models, optionally only those with a capability or from one provider"""
+    registry = REGISTRY.current
+    return _listing_response(request, registry.listing("chat", frozenset(PROVIDERS), capability, provider, _model_health(registry)))
+
+@app.get("/v1/providers")
+async def list_providers(api_key: ApiKey = Depends(verify_api_key)):
+    """Which providers are available, which are loaded, and why any are disabled"""
+    return {"providers": PROVIDERS.status()}
+
+@app.get("/v1/models/aliases")
+async def list_model_aliases(request: Request, api_key: ApiKey = Depends(verify_api_key)):
+    """List model aliases and the chat models they fall back through"""
+    return _listing_response(request, REGISTRY.current.listing("aliases", frozenset(PROVIDERS)))
 
 @app.get("/v1/models/image")
-async def list_image_models(api_key: str = Depends(verify_api_key)):
-    """List all available image models"""
-    return {
-        "models": [
-            {
-                "id": model_id,
-                **model_info.model_dump()
-            }
-            for model_id, model_info in IMAGE_MODELS.items()
-        ]
-    }
+async def list_image_models(
+    request: Request,
+    provider: Optional[ModelProvider] = None,
+    api_key: ApiKey = Depends(verify_api_key)
+):
+    """List all available image models, optionally only those from one provider"""
+    registry = REGISTRY.current
+    return _listing_response(request, registry.listing("image", frozenset(PROVIDERS), provider=provider, health=_model_health(registry)))
 
-@app.post("/v1/chat/completions")
-async def create_chat_completion(
-    request: ChatCompletionRequest,
-    api_key: str = Depends(verify_api_key)
-) -> ChatCompletionResponse:
+# Successful attempt latencies per alias, used to derive hedge delays
+HEDGE_LATENCY = LatencyTracker()
+# Concurrent attempts allowed per aliased request (1 disables hedging)
+HEDGE_MAX_IN_FLIGHT = int(os.getenv("OMNI_HEDGE_MAX_IN_FLIGHT", "2"))
+
+# Rolling per-model statistics for "auto" routing and adaptive timeouts
+ROUTING = RoutingEngine(
+    default_timeout=float(os.getenv("OMNI_TIMEOUT_DEFAULT", "60")),
+    timeout_multiplier=float(os.getenv("OMNI_TIMEOUT_MULTIPLIER", "3")),
+    min_timeout=float(os.getenv("OMNI_TIMEOUT_MIN", "5")),
+    max_timeout=float(os.getenv("OMNI_TIMEOUT_MAX", "120"))
+)
+# Number of ranked models an "auto" request may fall back through
+AUTO_FALLBACKS = int(os.getenv("OMNI_AUTO_FALLBACKS", "3"))
+
+# Adaptive (AIMD) concurrency limits per provider and per model
+LIMITS = LimiterRegistry(
+    initial_limit=float(os.getenv("OMNI_LIMIT_INITIAL", "32")),
+    min_limit=float(os.getenv("OMNI_LIMIT_MIN", "1")),
+    max_limit=float(os.getenv("OMNI_LIMIT_MAX", "512")),
+    max_queue=int(os.getenv("OMNI_LIMIT_QUEUE", "512")),
+    queue_timeout=float(os.getenv("OMNI_LIMIT_QUEUE_TIMEOUT", "10"))
+)
+
+def _limiter_keys(model_id: str, model_info: ModelInfo) -> Tuple[str, str]:
+    """Model limiter first, so requests queued on a model don't hold provider slots"""
+    return f"model:{model_id}", f"provider:{model_info.provider.value}"
+
+# Circuit breakers per provider and per model: after a burst of failures or
+# timeouts, calls fail fast (or reroute to another candidate) until a probe
+# or a trial call succeeds
+BREAKERS = CircuitBreakerRegistry(
+    window=float(os.getenv("OMNI_CIRCUIT_WINDOW", "30")),
+    min_calls=int(os.getenv("OMNI_CIRCUIT_MIN_CALLS", "10")),
+    failure_threshold=float(os.getenv("OMNI_CIRCUIT_FAILURE_RATE", "0.5")),
+    timeout_threshold=float(os.getenv("OMNI_CIRCUIT_TIMEOUT_RATE", "0.25")),
+    open_seconds=float(os.getenv("OMNI_CIRCUIT_OPEN_SECONDS", "10")),
+    max_open_seconds=float(os.getenv("OMNI_CIRCUIT_MAX_OPEN_SECONDS", "120"))
+) if os.getenv("OMNI_CIRCUIT", "1") == "1" else None
+# Seconds between health probes of providers with open circuits (0 disables)
+CIRCUIT_PROBE_INTERVAL = float(os.getenv("OMNI_CIRCUIT_PROBE_INTERVAL", "5"))
+CIRCUIT_PROBE_TIMEOUT = float(os.getenv("OMNI_CIRCUIT_PROBE_TIMEOUT", "5"))
+
+def _circuit_keys(model_id: str, model_info: ModelInfo) -> Tuple[str, str]:
+    return f"model:{model_id}", f"provider:{model_info.provider.value}"
+
+def _circuit(model_id: str, model_info: ModelInfo):
+    """Guard one upstream call with the model's and provider's breakers"""
+    return BREAKERS.guard(*_circuit_keys(model_id, model_info)) if BREAKERS is not None else nullcontext()
+
+async def _probe_circuit(key: str) -> Optional[bool]:
+    """Health check for an open provider circuit; models have none and rely on trial calls"""
+    kind, _, name = key.partition(":")
+    if kind != "provider":
+        return None
+    provider = await PROVIDERS.load(ModelProvider(name))
+    if not isinstance(provider, ProbedProvider):
+        return None
+    await asyncio.wait_for(provider.probe(CIRCUIT_PROBE_TIMEOUT), CIRCUIT_PROBE_TIMEOUT)
+    return True
+
+def _model_health(registry) -> Dict[str, str]:
+    """Circuit state of every model whose model or provider circuit isn't closed"""
+    health: Dict[str, str] = {}
+    if BREAKERS is None:
+        return health
+    for key, state in BREAKERS.degraded().items():
+        kind, _, name = key.partition(":")
+        model_ids = registry.by_provider.get(ModelProvider(name), ()) if kind == "provider" else (name,)
+        for model_id in model_ids:
+            if health.get(model_id) != CircuitState.OPEN.value:
+                health[model_id] = state.value
+    return health
+
+# Retries of transient upstream failures (throttling, 5xx, timeouts, dropped
+# connections) with jittered backoff or the upstream's Retry-After. Across the
+# process, retries are capped at a ratio of first attempts so an outage can't
+# turn into a retry storm. The SDKs' own retries are disabled.
+RETRY = RetryPolicy(
+    attempts=int(os.getenv("OMNI_RETRY_ATTEMPTS", "3")),
+    base_delay=float(os.getenv("OMNI_RETRY_BASE_DELAY", "0.25")),
+    max_delay=float(os.getenv("OMNI_RETRY_MAX_DELAY", "8")),
+    max_elapsed=float(os.getenv("OMNI_RETRY_MAX_ELAPSED", "30")),
+    budget=RetryBudget(
+        ratio=float(os.getenv("OMNI_RETRY_BUDGET_RATIO", "0.2")),
+        min_per_second=float(os.getenv("OMNI_RETRY_BUDGET_MIN_PER_SECOND", "1"))
+    )
+)
+
+# Request deadlines, from X-Request-Timeout or the body's timeout field (0: none
+# by default), and cancelling upstream work when the client disconnects
+DEFAULT_REQUEST_TIMEOUT = float(os.getenv("OMNI_DEFAULT_REQUEST_TIMEOUT", "0"))
+MAX_REQUEST_TIMEOUT = float(os.getenv("OMNI_MAX_REQUEST_TIMEOUT", "600"))
+CANCEL_ON_DISCONNECT = os.getenv("OMNI_CANCEL_ON_DISCONNECT", "1") == "1"
+
+def _request_scope(http_request: Request, requested: Optional[float] = None) -> RequestScope:
+    timeout = request_timeout(http_request.headers, requested, DEFAULT_REQUEST_TIMEOUT, MAX_REQUEST_TIMEOUT)
+    return RequestScope(
+        timeout,
+        http_request.receive if CANCEL_ON_DISCONNECT else None,
+        requested=requested is not None or TIMEOUT_HEADER in http_request.headers
+    )
+
+def _upstream_timeout(model_id: str, request: ChatCompletionRequest) -> float:
     """
-    Create a chat completion using the specified model.
+    The model's adaptive timeout for the request, cut to the time left
+    before its deadline. When the client set the deadline itself, the
+    upstream call gets all of the time left instead.
     """
+    scope = current_scope()
+    if scope is None:
+        return ROUTING.timeout_for(model_id, request.max_tokens)
+    if scope.requested and scope.deadline is not None:
+        return scope.clamp(math.inf)
+    return scope.clamp(ROUTING.timeout_for(model_id, request.max_tokens))
+
+def _retry_counter(model_id: str, model_info: ModelInfo):
+    """on_retry callback counting a model's retries by the kind of error that caused them"""
+    def on_retry(error: BaseException, wait: float):
+        UPSTREAM_RETRIES.labels(model_id, model_info.provider.value, _error_kind(error)).inc()
+    return on_retry
+
+# Concurrent items per provider within one batch request
+BATCH_PROVIDER_PARALLELISM = int(os.getenv("OMNI_BATCH_PROVIDER_PARALLELISM", "16"))
+
+# Prometheus metrics served at /metrics (per worker process)
+METRICS = MetricsRegistry()
+CHAT_REQUESTS = METRICS.counter(
+    "omni_chat_requests_total", "Chat completion requests by requested model and HTTP status", ("model", "stream", "status"))
+REQUESTS_IN_FLIGHT = METRICS.gauge(
+    "omni_requests_in_flight", "Requests being handled (streams until their first chunk)", ("endpoint",))
+STREAMS_OPEN = METRICS.gauge(
+    "omni_streams_open", "Chat completion streams currently sending", ("model",))
+REQUEST_LATENCY = METRICS.histogram(
+    "omni_request_duration_seconds", "End-to-end latency of non-streaming chat completions", ("model",))
+ROUTER_OVERHEAD = METRICS.histogram(
+    "omni_router_overhead_seconds", "Request latency not spent in the upstream call that served it", ("model",),
+    buckets=OVERHEAD_BUCKETS)
+UPSTREAM_CALLS = METRICS.counter(
+    "omni_upstream_requests_total", "Upstream provider calls by outcome (ok, error, cancelled)", ("model", "provider", "status"))
+UPSTREAM_IN_FLIGHT = METRICS.gauge(
+    "omni_upstream_in_flight", "Upstream provider calls in progress", ("model", "provider"))
+UPSTREAM_LATENCY = METRICS.histogram(
+    "omni_upstream_duration_seconds", "Latency of successful upstream calls, excluding queueing", ("model", "provider"))
+TIME_TO_FIRST_TOKEN = METRICS.histogram(
+    "omni_time_to_first_token_seconds", "Time from upstream stream start to its first chunk", ("model", "provider"))
+TOKENS = METRICS.counter(
+    "omni_tokens_total", "Tokens processed, normalized across provider usage schemes", ("model", "provider", "direction"))
+UPSTREAM_RETRIES = METRICS.counter(
+    "omni_upstream_retries_total", "Upstream calls retried, by the kind of error retried", ("model", "provider", "kind"))
+UPSTREAM_ERRORS = METRICS.counter(
+    "omni_upstream_errors_total", "Failed upstream calls by kind (timeout, throttled, capacity, upstream)", ("model", "provider", "kind"))
+CACHE_LOOKUPS = METRICS.counter(
+    "omni_cache_requests_total", "Chat completions by cache outcome (hit, semantic-hit, miss, bypass)", ("result",))
+POOL_CONNECTIONS = METRICS.gauge(
+    "omni_upstream_pool_connections", "Upstream pool connections by state (active, idle, queued requests)", ("pool", "state"))
+POOL_REQUESTS = METRICS.counter(
+    "omni_upstream_pool_requests_total", "HTTP requests sent through each upstream pool", ("pool",))
+PREFLIGHT_ACTIONS = METRICS.counter(
+    "omni_preflight_total", "Requests whose prompt exceeded the context, by action (rejected, trimmed)", ("model", "action"))
+UPSTREAM_CANCELLED = METRICS.counter(
+    "omni_upstream_cancelled_total", "Upstream calls cancelled because the client left or its deadline passed", ("model", "provider", "reason"))
+TOKENS_SAVED = METRICS.counter(
+    "omni_tokens_saved_total", "Estimated output tokens not generated thanks to cancelled upstream calls", ("model", "provider"))
+COALESCED = METRICS.counter(
+    "omni_coalesced_requests_total", "Upstream calls saved by attaching to an identical in-flight request", ("model", "stream"))
+
+# Identical concurrent requests to models with coalesce=True share one upstream call
+COALESCE_ENABLED = os.getenv("OMNI_COALESCE", "1") == "1"
+COALESCER = SingleFlight()
+
+def _model_label(model: str) -> str:
+    """Requested model as a metric label, without letting arbitrary input add label values"""
+    registry = REGISTRY.current
+    if model in registry.chat or model in registry.aliases or model == "auto":
+        return model
+    if model.startswith("auto:") and model[len("auto:"):] in ROUTING_STRATEGIES:
+        return model
+    return "unknown"
+
+def _error_kind(e: Exception) -> str:
+    if isinstance(e, CapacityExceededError):
+        return "capacity"
+    if getattr(e, "timed_out", False):
+        return "timeout"
+    if getattr(e, "upstream_status", None) == 429:
+        return "throttled"
+    return "upstream"
+
+def _record_failure(model_id: str, model_info: ModelInfo, elapsed: float, e: Exception):
+    """
+    Count a failed call. A call our own admission limiter turned away never
+    reached the model, so it doesn't count against its routing error rate.
+    """
+    UPSTREAM_ERRORS.labels(model_id, model_info.provider.value, _error_kind(e)).inc()
+    if not isinstance(e, CapacityExceededError):
+        ROUTING.record(model_id, elapsed, error=True)
+
+def _record_usage(model_id: str, model_info: ModelInfo, usage: Optional[Dict[str, int]]) -> int:
+    """Count normalized token usage, charge it to the request's API key and return the output tokens"""
+    tokens = normalize_usage(usage)
+    charge_current_key(tokens["input_tokens"] + tokens["output_tokens"], usage_cost(tokens, model_info.pricing))
+    provider = model_info.provider.value
+    TOKENS.labels(model_id, provider, "input").inc(tokens["input_tokens"])
+    TOKENS.labels(model_id, provider, "output").inc(tokens["output_tokens"])
+    if tokens["cached_input_tokens"]:
+        TOKENS.labels(model_id, provider, "cached_input").inc(tokens["cached_input_tokens"])
+    return tokens["output_tokens"]
+
+def _record_cancelled(model_id: str, model_info: ModelInfo, request: ChatCompletionRequest, streamed_chunks: int = 0):
+    """
+    Count an upstream call abandoned by its request and the output tokens
+    it would still have produced: the model's typical completion length
+    (capped by max_tokens), less about a token per chunk already streamed.
+    """
+    scope = current_scope()
+    reason = scope.cause() if scope is not None else None
+    if reason is None:
+        # Lost a hedge race or the last coalesced waiter left; not the client's doing
+        return
+    provider = model_info.provider.value
+    UPSTREAM_CANCELLED.labels(model_id, provider, reason).inc()
+    expected = ROUTING.expected_output_tokens(model_id)
+    if expected is None:
+        expected = request.max_tokens or 0
+    elif request.max_tokens:
+        expected = min(expected, request.max_tokens)
+    TOKENS_SAVED.labels(model_id, provider).inc(max(0, int(expected) - streamed_chunks))
+
+@contextmanager
+def _upstream_call(model_id: str, model_info: ModelInfo) -> Iterator[None]:
+    """Track one upstream call's in-flight gauge, outcome and latency"""
+    labels = (model_id, model_info.provider.value)
+    in_flight = UPSTREAM_IN_FLIGHT.labels(*labels)
+    in_flight.inc()
+    start = time.perf_counter()
+    status = "error"
     try:
-        # Look up the model info
-        model_info = CHAT_MODELS.get(request.model)
-        if not model_info:
+        yield
+        status = "ok"
+    except (asyncio.CancelledError, GeneratorExit):
+        status = "cancelled"
+        raise
+    finally:
+        in_flight.dec()
+        UPSTREAM_CALLS.labels(*labels, status).inc()
+        if status == "ok":
+            elapsed = time.perf_counter() - start
+            UPSTREAM_LATENCY.labels(*labels).observe(elapsed)
+            add_upstream_time(elapsed)
+
+# What to do with prompts that can't fit the model's context: reject (400),
+# trim (drop the oldest non-system messages) or off
+PREFLIGHT = os.getenv("OMNI_PREFLIGHT", "reject")
+if PREFLIGHT not in ("reject", "trim", "off"):
+    raise ValueError(f"OMNI_PREFLIGHT must be reject, trim or off, not {PREFLIGHT!r}")
+# Slack given to estimated (non-OpenAI) token counts before a prompt counts as too long
+PREFLIGHT_TOLERANCE = float(os.getenv("OMNI_PREFLIGHT_TOLERANCE", "0.1"))
+
+# Provider prompt caching: long stable prefixes get cache breakpoints (where the
+# provider needs them) and stay on the model that last served them
+PROMPT_CACHE = PromptCachePlanner(
+    min_tokens=int(os.getenv("OMNI_PROMPT_CACHE_MIN_TOKENS", "1024")),
+    affinity_ttl=float(os.getenv("OMNI_PROMPT_CACHE_TTL", "300"))
+) if os.getenv("OMNI_PROMPT_CACHE", "1") == "1" else None
+
+ChatCandidate = Tuple[str, ModelInfo, object]
+
+def _charge_coalesced(candidates: List[ChatCandidate], model: str, usage: Optional[Dict[str, int]]):
+    """
+    Charge a request that shared another request's upstream call to its
+    own key, as if it had made the call; the call itself only charged
+    the key of the request that started it.
+    """
+    model_info = next((info for _, info, _ in candidates if info.name == model), candidates[0][1])
+    tokens = normalize_usage(usage)
+    charge_current_key(tokens["input_tokens"] + tokens["output_tokens"], usage_cost(tokens, model_info.pricing))
+
+def _coalesce_key(request: ChatCompletionRequest, candidates: List[ChatCandidate]) -> Optional[str]:
+    """Single-flight key for the request, or None when a candidate hasn't opted in"""
+    if not COALESCE_ENABLED or not all(model_info.coalesce for _, model_info, _ in candidates):
+        return None
+    return request_cache_key(request)
+
+async def _resolve_chat_candidates(request: ChatCompletionRequest, budget: PromptBudget) -> List[ChatCandidate]:
+    """
+    Resolve a requested model ID, alias or "auto[:strategy]" to
+    (model_id, model_info, provider) candidates in order of preference.
+    Models whose provider is not configured are skipped.
+    """
+    model = request.model
+    try:
+        strategy = parse_auto_model(model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    registry = REGISTRY.current
+    alias = registry.aliases.get(model)
+    if strategy:
+        # The indexes narrow the pool before per-model checks
+        configured = {
+            model_id: registry.chat[model_id]
+            for model_id in registry.select("chat", PROVIDERS, ("tools",) if request.tools else ())
+        }
+        model_ids = ROUTING.rank(request, configured, strategy, budget)[:AUTO_FALLBACKS]
+        if not model_ids:
             raise HTTPException(
                 status_code=400,
-                detail=f"Unknown model: {request.model}"
+                detail="No available model satisfies the request's context length and tool requirements"
             )
-        request.model = model_info.name
+    elif alias:
+        model_ids = alias.members
+    else:
+        model_ids = [model]
 
-        # Get the provider for this model
-        provider = PROVIDERS.get(model_info.provider)
-        if not provider:
+    candidates = []
+    for model_id in model_ids:
+        model_info = registry.chat.get(model_id)
+        if not model_info:
             raise HTTPException(
-                status_code=500,
-                detail=f"Provider not configured: {model_info.provider}"
+                status_code=400,
+                detail=f"Unknown model: {model_id}"
             )
+        provider = await PROVIDERS.load(model_info.provider)
+        if provider:
+            candidates.append((model_id, model_info, provider))
+
+    if not candidates:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Provider not configured for model: {model}"
+        )
+    if BREAKERS is not None:
+        # Reroute around open circuits, or fail fast when every candidate is behind one
+        closed = [
+            candidate for candidate in candidates
+            if not BREAKERS.is_open(*_circuit_keys(candidate[0], candidate[1]))
+        ]
+        if not closed:
+            model_id, model_info, _ = candidates[0]
+            key = next(key for key in _circuit_keys(model_id, model_info) if BREAKERS.is_open(key))
+            raise CircuitOpenError(key, BREAKERS.get(key).retry_after())
+        candidates = closed
+    return candidates
+
+def _provider_request(request: ChatCompletionRequest, model_info: ModelInfo) -> Tuple[ChatCompletionRequest, Optional[PrefixPlan]]:
+    """The request as sent to one model, with prompt-cache breakpoints if its provider needs them"""
+    upstream_request = request.model_copy(update={"model": model_info.name})
+    if PROMPT_CACHE is None:
+        return upstream_request, None
+    plan = PROMPT_CACHE.plan(request)
+    if model_info.provider in EXPLICIT_CACHE_PROVIDERS:
+        upstream_request = PROMPT_CACHE.mark(upstream_request, plan)
+    return upstream_request, plan
+
+async def _call_chat(
+    candidate: ChatCandidate,
+    request: ChatCompletionRequest,
+    raw: bool = False
+) -> ChatCompletionResponse | RawChatCompletion:
+    """
+    Make one upstream call with the model's adaptive timeout and record its
+    outcome. With raw the provider's unparsed response body is returned.
+    """
+    model_id, model_info, provider = candidate
+    upstream_request, plan = _provider_request(request, model_info)
+    complete = provider.chat_complete_raw if raw else provider.chat_complete
+    start = time.perf_counter()
+    # A passed deadline raises here, and an open circuit just below, before
+    # the call is counted anywhere
+    timeout = _upstream_timeout(model_id, upstream_request)
+    with _circuit(model_id, model_info):
+        try:
+            async with LIMITS.admit(*_limiter_keys(model_id, model_info)) as admission:
+                with _upstream_call(model_id, model_info):
+                    call_start = time.perf_counter()
+                    completion = await complete(upstream_request, timeout=timeout)
+                # Per output token, so long generations don't look like congestion
+                output = normalize_usage(completion.usage)["output_tokens"]
+                admission.latency = (time.perf_counter() - call_start) / max(1, output)
+        except Exception as e:
+            _record_failure(model_id, model_info, time.perf_counter() - start, e)
+            raise
+        except asyncio.CancelledError:
+            _record_cancelled(model_id, model_info, request)
+            raise
+    output_tokens = _record_usage(model_id, model_info, completion.usage)
+    ROUTING.record(model_id, time.perf_counter() - start, output_tokens)
+    if plan is not None:
+        PROMPT_CACHE.record(plan, model_id)
+    return completion
 
-        # Create the completion
-        response = await provider.chat_complete(request)
+async def _complete_chat(
+    request: ChatCompletionRequest,
+    candidates: List[ChatCandidate],
+    raw: bool = False
+) -> ChatCompletionResponse | RawChatCompletion:
+    """
+    Run a non-streaming completion against the candidates.
+
+    A single candidate is called directly. For an alias the members are
+    hedged: the next member is started once the first has been running for
+    the alias' p95 latency, and errors fall through to the next member.
+    Ranked "auto" candidates are only used as a fallback chain.
+    """
+    alias = REGISTRY.current.aliases.get(request.model)
+    alias_id = request.model if alias else None
+
+    async def attempt(candidate: ChatCandidate) -> ChatCompletionResponse | RawChatCompletion:
+        start = time.perf_counter()
+        model_id, model_info, _ = candidate
+        completion = await RETRY.call(
+            lambda: _call_chat(candidate, request, raw),
+            deadline=current_deadline(),
+            on_retry=_retry_counter(model_id, model_info)
+        )
+        if alias_id:
+            HEDGE_LATENCY.record(alias_id, time.perf_counter() - start)
+        return completion
+
+    if len(candidates) == 1:
+        return await attempt(candidates[0])
+
+    hedge_delay = None
+    if alias_id:
+        hedge_delay = HEDGE_LATENCY.hedge_delay(alias_id, alias.hedge_delay)
+    (model_id, _, _), completion = await hedged_call(
+        candidates, attempt, hedge_delay, max_in_flight=HEDGE_MAX_IN_FLIGHT
+    )
+    logging.info(f"{request.model} served by {model_id}")
+    return completion
+
+async def _tracked_chat_stream(candidate: ChatCandidate, request: ChatCompletionRequest) -> AsyncIterator[ChatCompletionChunk]:
+    """Stream from one candidate, recording latency and output tokens once it ends"""
+    model_id, model_info, provider = candidate
+    upstream_request, plan = _provider_request(request, model_info)
+    start = time.perf_counter()
+    usage = None
+    streamed = 0
+    timeout = _upstream_timeout(model_id, upstream_request)
+    with _circuit(model_id, model_info):
+        try:
+            # The slot is held until the stream ends
+            async with LIMITS.admit(*_limiter_keys(model_id, model_info)) as admission:
+                with _upstream_call(model_id, model_info):
+                    upstream_start = time.perf_counter()
+                    chunks = provider.chat_stream(upstream_request, timeout=timeout)
+                    try:
+                        async for chunk in chunks:
+                            if not streamed:
+                                # Time to first token is the limiter's signal, not the stream's length
+                                admission.latency = time.perf_counter() - upstream_start
+                                TIME_TO_FIRST_TOKEN.labels(model_id, model_info.provider.value).observe(admission.latency)
+                            streamed += 1
+                            if chunk.usage is not None:
+                                usage = chunk.usage
+                            yield chunk
+                    finally:
+                        await chunks.aclose()
+        except Exception as e:
+            _record_failure(model_id, model_info, time.perf_counter() - start, e)
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            _record_cancelled(model_id, model_info, request, streamed)
+            raise
+    output_tokens = _record_usage(model_id, model_info, usage)
+    ROUTING.record(model_id, time.perf_counter() - start, output_tokens)
+    if plan is not None:
+        PROMPT_CACHE.record(plan, model_id)
+
+async def _open_chat_stream(
+    request: ChatCompletionRequest,
+    candidates: List[ChatCandidate]
+) -> Tuple[Optional[ChatCompletionChunk], AsyncIterator[ChatCompletionChunk]]:
+    """
+    Open a provider stream and await its first chunk.
+
+    Streams cannot be hedged or retried once content is flowing, but a
+    member that fails before producing its first chunk is retried and then
+    falls through to the next one.
+    """
+    async def open_stream(candidate: ChatCandidate) -> Tuple[Optional[ChatCompletionChunk], AsyncIterator[ChatCompletionChunk]]:
+        chunks = _tracked_chat_stream(candidate, request)
+        try:
+            return await chunks.__anext__(), chunks
+        except StopAsyncIteration:
+            return None, chunks
+
+    last_error = None
+    for candidate in candidates:
+        model_id, model_info, _ = candidate
+        try:
+            return await RETRY.call(
+                lambda: open_stream(candidate),
+                deadline=current_deadline(),
+                on_retry=_retry_counter(model_id, model_info)
+            )
+        except (DeadlineExceededError, ClientDisconnectedError):
+            raise
+        except Exception as e:
+            logging.warning(f"Stream from {model_id} failed before first chunk: {e}")
+            last_error = e
+    raise last_error
+
+async def _chat_stream_chunks(request: ChatCompletionRequest, candidates: List[ChatCandidate]) -> AsyncIterator[ChatCompletionChunk]:
+    """The selected candidate's stream as a single iterator, first chunk included"""
+    first, chunks = await _open_chat_stream(request, candidates)
+    try:
+        if first is not None:
+            yield first
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        await chunks.aclose()
+
+def _sse_event(data: str) -> str:
+    """Format a single server-sent event"""
+    return f"data: {data}\n\n"
+
+async def _stream_chat_completion(
+    request: ChatCompletionRequest,
+    candidates: List[ChatCandidate],
+    model_label: str,
+    scope: RequestScope
+) -> StreamingResponse:
+    """
+    Start a provider stream and wrap it in a server-sent-events response.
+
+    The first chunk is awaited before the response is returned so that
+    upstream failures still surface as a proper HTTP error status.
+    Identical concurrent streams share one upstream stream; a late joiner
+    replays the chunks sent so far and then follows the live tail. The
+    response takes over the request scope: waits for chunks are cancelled
+    when the client disconnects or the deadline passes, and a deadline is
+    reported in-band.
+    """
+    coalesce_key = _coalesce_key(request, candidates)
+    if coalesce_key is None:
+        chunks, shared = _chat_stream_chunks(request, candidates), False
+    else:
+        chunks, shared = COALESCER.stream(coalesce_key, lambda: _chat_stream_chunks(request, candidates))
+        if shared:
+            COALESCED.labels(candidates[0][0], "true").inc()
+
+    try:
+        with scope.armed():
+            first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = None
+    streams_open = STREAMS_OPEN.labels(model_label)
+    streams_open.inc()
+
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            if first is not None:
+                yield _sse_event(first.model_dump_json(exclude_none=True))
+            last = first
+            while True:
+                try:
+                    with scope.armed():
+                        chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    break
+                last = chunk
+                yield _sse_event(chunk.model_dump_json(exclude_none=True))
+            if shared and last is not None and last.usage:
+                _charge_coalesced(candidates, last.model, last.usage)
+        except ClientDisconnectedError:
+            # Nobody is left to read [DONE]
+            return
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            if not isinstance(e, DeadlineExceededError):
+                logging.exception("Error during chat completion stream:")
+            yield _sse_event(json.dumps({"error": str(e)}))
+        finally:
+            streams_open.dec()
+            scope.close()
+            await chunks.aclose()
+        yield _sse_event("[DONE]")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Clients may ask for OpenAI-compatible upstream bodies to be forwarded unparsed
+PASSTHROUGH_ENABLED = os.getenv("OMNI_PASSTHROUGH", "1") == "1"
+
+def _passthrough(request: ChatCompletionRequest, candidates: List[ChatCandidate], headers: Mapping[str, str]) -> bool:
+    """
+    Whether to forward the upstream response body as-is. Clients opt in
+    with "X-Omni-Passthrough: 1"; it applies to non-streaming requests
+    whose candidates all speak the OpenAI schema (OpenAI, DeepSeek).
+    The response is then the upstream's own chat.completion object.
+    """
+    if not PASSTHROUGH_ENABLED or request.stream:
+        return False
+    if headers.get("x-omni-passthrough", "").lower() not in ("1", "true"):
+        return False
+    return all(isinstance(provider, PassthroughChatProvider) for _, _, provider in candidates)
+
+def _cache_policy(request: ChatCompletionRequest, headers: Mapping[str, str]) -> tuple[bool, bool]:
+    """
+    Decide whether to read from and write to the response cache.
+
+    Only non-streaming requests at or below CACHE_MAX_TEMPERATURE are
+    cached. Clients opt out per request with "Cache-Control: no-cache"
+    (skip lookup, still store), "Cache-Control: no-store" or
+    "X-Omni-Cache: bypass" (skip both).
+
+    Returns:
+        (lookup, store) flags
+    """
+    if RESPONSE_CACHE is None and SEMANTIC_CACHE is None:
+        return False, False
+    if request.stream or request.temperature > CACHE_MAX_TEMPERATURE:
+        return False, False
+    if headers.get("x-omni-cache", "").lower() == "bypass":
+        return False, False
+    cache_control = headers.get("cache-control", "").lower()
+    if "no-store" in cache_control:
+        return False, False
+    return "no-cache" not in cache_control, True
+
+def _preflight(request: ChatCompletionRequest, candidates: List[ChatCandidate], budget: PromptBudget) -> List[ChatCandidate]:
+    """
+    Keep the candidates whose context can hold the prompt plus max_tokens.
+
+    When none can, the request is rejected with a 400 or, with
+    OMNI_PREFLIGHT=trim, its oldest turns are dropped to fit the
+    candidate with the largest context.
+    """
+    if PREFLIGHT == "off":
+        return candidates
+    fitting = [candidate for candidate in candidates if budget.fits(candidate[1])]
+    if fitting:
+        return fitting
+
+    model_id, model_info, _ = max(candidates, key=lambda candidate: candidate[1].max_tokens or 0)
+    if PREFLIGHT == "trim" and budget.trim(model_info) > 0:
+        PREFLIGHT_ACTIONS.labels(model_id, "trimmed").inc()
+        return [candidate for candidate in candidates if budget.fits(candidate[1])]
+
+    PREFLIGHT_ACTIONS.labels(model_id, "rejected").inc()
+    count = budget.prompt_tokens(model_info)
+    raise HTTPException(
+        status_code=400,
+        detail=(
+            f"Prompt is {'' if count.exact else 'about '}{count.tokens} tokens and max_tokens is "
+            f"{budget.reserved}, but {model_id} accepts at most {model_info.max_tokens} tokens"
+        )
+    )
+
+async def _prepare_chat_request(request: ChatCompletionRequest) -> List[ChatCandidate]:
+    """
+    Resolve the model or alias to the providers that can serve it and check
+    the prompt fits. A conversation whose prefix a candidate has cached
+    recently is sent to that candidate first.
+    """
+    budget = PromptBudget(request, tolerance=PREFLIGHT_TOLERANCE)
+    candidates = _preflight(request, await _resolve_chat_candidates(request, budget), budget)
+    if PROMPT_CACHE is not None and len(candidates) > 1:
+        candidates = PROMPT_CACHE.prefer(PROMPT_CACHE.plan(request), candidates, lambda candidate: candidate[0])
+    if request.model in REGISTRY.current.chat:
+        request.model = candidates[0][1].name
+    return candidates
+
+async def run_chat_completion(
+    request: ChatCompletionRequest,
+    lookup: bool = False,
+    store: bool = False,
+    candidates: Optional[List[ChatCandidate]] = None
+) -> Tuple[ChatCompletionResponse, str]:
+    """
+    Serve a non-streaming chat completion from the caches or upstream.
+
+    Shared by the HTTP endpoints and batch runners so every path gets the
+    same caching, routing and resilience behaviour.
+
+    Returns:
+        (completion, cache status) where the status is one of
+        "hit", "semantic-hit", "miss" or "bypass"
+    """
+    if candidates is None:
+        candidates = await _prepare_chat_request(request)
+
+    cache_key = request_cache_key(request) if RESPONSE_CACHE is not None and (lookup or store) else None
+    if lookup and RESPONSE_CACHE is not None:
+        cached = await RESPONSE_CACHE.get(cache_key)
+        if cached is not None:
+            CACHE_LOOKUPS.labels("hit").inc()
+            return cached, "hit"
+    elif RESPONSE_CACHE is not None:
+        RESPONSE_CACHE.stats["bypassed"] += 1
+
+    if lookup and SEMANTIC_CACHE is not None:
+        cached = await SEMANTIC_CACHE.get(request)
+        if cached is not None:
+            CACHE_LOOKUPS.labels("semantic-hit").inc()
+            return cached, "semantic-hit"
+
+    # Create the completion, sharing the upstream call with identical in-flight requests
+    coalesce_key = _coalesce_key(request, candidates)
+    if coalesce_key is None:
+        completion, shared = await _complete_chat(request, candidates), False
+    else:
+        wait_start = time.perf_counter()
+        scope = current_scope()
+        try:
+            # The shared call isn't bound to any one request's deadline; each caller enforces its own
+            completion, shared = await COALESCER.do(
+                coalesce_key, lambda: _complete_chat(request, candidates), timeout=scope.remaining() if scope else None
+            )
+        except WaitTimeout:
+            raise DeadlineExceededError(scope.timeout) from None
+        if shared:
+            # Time spent waiting on the shared call is upstream time for this request too
+            add_upstream_time(time.perf_counter() - wait_start)
+            COALESCED.labels(candidates[0][0], "false").inc()
+            _charge_coalesced(candidates, completion.model, completion.usage)
+
+    if store and not shared:
+        if RESPONSE_CACHE is not None:
+            await RESPONSE_CACHE.set(cache_key, completion)
+        if SEMANTIC_CACHE is not None:
+            await SEMANTIC_CACHE.set(request, completion)
+    cache_status = "miss" if lookup else "bypass"
+    CACHE_LOOKUPS.labels(cache_status).inc()
+    return completion, cache_status
+
+@app.post("/v1/chat/completions", response_model=None)
+async def create_chat_completion(
+    request: ChatCompletionRequest,
+    http_request: Request,
+    api_key: ApiKey = Depends(verify_api_key)
+) -> Response:
+    """
+    Create a chat completion using the specified model.
+
+    When request.stream is true the completion is returned as a
+    text/event-stream of ChatCompletionChunk objects terminated by [DONE].
+    Deterministic requests are served from the response cache when
+    possible; the X-Omni-Cache response header reports hit/miss/bypass.
+    With "X-Omni-Passthrough: 1" OpenAI-compatible upstream bodies are
+    forwarded unparsed and uncached. Non-streaming responses carry a
+    Server-Timing header splitting the time into upstream and router.
+    A deadline (X-Request-Timeout or the timeout field) bounds the whole
+    request with a 504; upstream calls get what is left as their timeout
+    and are cancelled when it passes or the client disconnects.
+    """
+    model_label = _model_label(request.model)
+    stream = "true" if request.stream else "false"
+    in_flight = REQUESTS_IN_FLIGHT.labels("chat")
+    in_flight.inc()
+    start = time.perf_counter()
+    upstream = start_upstream_timer()
+    status = 500
+    scope = None
+    try:
+        scope = _request_scope(http_request, request.timeout)
+        candidates = await _prepare_chat_request(request)
+
+        if request.stream:
+            streaming_response = await _stream_chat_completion(request, candidates, model_label, scope)
+            # The response closes the scope when the stream ends
+            scope = None
+            status = 200
+            return streaming_response
+
+        with scope.armed():
+            if _passthrough(request, candidates, http_request.headers):
+                raw = await _complete_chat(request, candidates, raw=True)
+                CACHE_LOOKUPS.labels("bypass").inc()
+                response = Response(
+                    raw.body,
+                    media_type="application/json",
+                    headers={"X-Omni-Cache": "bypass", "X-Omni-Passthrough": "1"}
+                )
+            else:
+                lookup, store = _cache_policy(request, http_request.headers)
+                completion, cache_status = await run_chat_completion(request, lookup, store, candidates)
+                # Returning the response directly skips FastAPI's jsonable_encoder pass
+                response = FastJSONResponse(completion, headers={"X-Omni-Cache": cache_status})
+
+        status = 200
+        elapsed = time.perf_counter() - start
+        overhead = max(0.0, elapsed - upstream[0])
+        REQUEST_LATENCY.labels(model_label).observe(elapsed)
+        ROUTER_OVERHEAD.labels(model_label).observe(overhead)
+        response.headers["Server-Timing"] = f"upstream;dur={upstream[0] * 1000:.2f}, router;dur={overhead * 1000:.2f}"
         return response
 
+    except HTTPException as e:
+        status = e.status_code
+        raise
     except Exception as e:
         logging.exception("Error during chat completion:")  # Log the full exception
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if scope is not None:
+            scope.close()
+        in_flight.dec()
+        CHAT_REQUESTS.labels(model_label, stream, status).inc()
 
-@app.post("/v1/images/generate")
-async def create_image(
+def _batch_error(e: Exception) -> BatchItemError:
+    if isinstance(e, HTTPException):
+        return BatchItemError(status_code=e.status_code, detail=str(e.detail))
+    logging.exception("Error during batch chat completion item:")
+    return BatchItemError(status_code=500, detail=str(e))
+
+@app.post("/v1/chat/completions/batch", response_model=None)
+async def create_chat_completion_batch(
+    batch: ChatCompletionBatchRequest,
+    http_request: Request,
+    api_key: ApiKey = Depends(verify_api_key)
+) -> Response:
+    """
+    Run many independent chat completions in one HTTP request.
+
+    Items run concurrently with at most BATCH_PROVIDER_PARALLELISM in
+    flight per provider. Results come back in input order, or with
+    batch.stream as NDJSON lines in completion order (each carries its
+    index). Failures are reported per item and never fail the batch.
+    X-Request-Timeout bounds every item (so items still unfinished then
+    report a 504) and an item's timeout field that item; a client
+    disconnect cancels all outstanding items.
+    """
+    semaphores: Dict[ModelProvider, asyncio.Semaphore] = {}
+    batch_timeout = request_timeout(http_request.headers, None, DEFAULT_REQUEST_TIMEOUT, MAX_REQUEST_TIMEOUT)
+
+    async def run_item(index: int, item: ChatCompletionRequest) -> ChatCompletionBatchItem:
+        timeouts = [timeout for timeout in (item.timeout, batch_timeout) if timeout]
+        item_scope = RequestScope(
+            min(timeouts) if timeouts else None,
+            requested=item.timeout is not None or TIMEOUT_HEADER in http_request.headers
+        )
+        try:
+            with item_scope.armed():
+                item.stream = False
+                candidates = await _prepare_chat_request(item)
+                provider_key = candidates[0][1].provider
+                semaphore = semaphores.setdefault(provider_key, asyncio.Semaphore(BATCH_PROVIDER_PARALLELISM))
+                async with semaphore:
+                    lookup, store = _cache_policy(item, http_request.headers)
+                    completion, _ = await run_chat_completion(item, lookup, store, candidates)
+            return ChatCompletionBatchItem(index=index, response=completion)
+        except Exception as e:
+            return ChatCompletionBatchItem(index=index, error=_batch_error(e))
+        finally:
+            item_scope.close()
+
+    # Watches for the client going away; the deadlines are the items'
+    scope = RequestScope(None, http_request.receive if CANCEL_ON_DISCONNECT else None)
+    tasks = [asyncio.ensure_future(run_item(i, item)) for i, item in enumerate(batch.requests)]
+
+    if not batch.stream:
+        try:
+            with scope.armed():
+                results = await asyncio.gather(*tasks)
+            return FastJSONResponse(ChatCompletionBatchResponse(results=results))
+        finally:
+            scope.close()
+            for task in tasks:
+                task.cancel()
+
+    async def ndjson_stream() -> AsyncIterator[str]:
+        try:
+            for finished in asyncio.as_completed(tasks):
+                with scope.armed():
+                    item = await finished
+                yield item.model_dump_json(exclude_none=True) + "\n"
+        except ClientDisconnectedError:
+            return
+        finally:
+            # Stop upstream work if the client goes away mid-batch
+            scope.close()
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+@app.get("/metrics")
+async def metrics(api_key: ApiKey = Depends(verify_api_key)):
+    """Request, latency, token, cache and error metrics in the Prometheus text format"""
+    for pool, stats in UPSTREAM.snapshot().items():
+        POOL_REQUESTS.labels(pool).set(stats["requests"])
+        for state in ("active", "idle"):
+            POOL_CONNECTIONS.labels(pool, state).set(stats.get(f"{state}_connections", 0))
+        POOL_CONNECTIONS.labels(pool, "queued").set(stats.get("queued_requests", 0))
+    return PlainTextResponse(METRICS.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.post("/v1/tokenize")
+async def tokenize(
+    request: TokenizeRequest,
+    api_key: ApiKey = Depends(verify_api_key)
+) -> TokenizeResponse:
+    """
+    Count tokens for a batch of texts and/or a chat prompt with the model's
+    tokenizer, so prompts can be budgeted without calling the model.
+    Counts for non-OpenAI models are estimates (exact is false).
+    """
+    model_info = REGISTRY.current.chat.get(request.model)
+    if not model_info:
+        raise HTTPException(status_code=400, detail=f"Unknown model: {request.model}")
+
+    def count() -> TokenizeResponse:
+        counts = TOKENIZERS.count_texts(request.texts, model_info)
+        prompt = TOKENIZERS.count_prompt(request.messages, model_info) if request.messages else None
+        return TokenizeResponse(
+            model=request.model,
+            encoding=prompt.encoding if prompt else counts.encoding,
+            exact=prompt.exact if prompt else counts.exact,
+            counts=counts.tokens,
+            prompt_tokens=prompt.tokens if prompt else None,
+            context_length=model_info.max_tokens
+        )
+
+    # Large batches take a while to encode; keep them off the event loop
+    return await asyncio.to_thread(count)
+
+@app.get("/v1/stats/cache")
+async def cache_stats(api_key: ApiKey = Depends(verify_api_key)):
+    """Response cache hit/miss counters and prompt-cache affinity"""
+    return {
+        "exact": {"enabled": True, **RESPONSE_CACHE.snapshot()} if RESPONSE_CACHE is not None else {"enabled": False},
+        "semantic": {"enabled": True, **SEMANTIC_CACHE.snapshot()} if SEMANTIC_CACHE is not None else {"enabled": False},
+        "prompt": {"enabled": True, **PROMPT_CACHE.snapshot()} if PROMPT_CACHE is not None else {"enabled": False},
+    }
+
+@app.get("/v1/stats/models")
+async def model_stats(api_key: ApiKey = Depends(verify_api_key)):
+    """Rolling per-model latency, throughput and error statistics"""
+    return {"models": ROUTING.snapshot(REGISTRY.current.chat)}
+
+@app.get("/v1/stats/limits")
+async def limit_stats(api_key: ApiKey = Depends(verify_api_key)):
+    """Current adaptive concurrency limits, in-flight calls and queue depths"""
+    return {"limiters": LIMITS.snapshot()}
+
+@app.get("/v1/stats/circuits")
+async def circuit_stats(api_key: ApiKey = Depends(verify_api_key)):
+    """Circuit breaker state and rolling failure counts per provider and model"""
+    return {"circuits": BREAKERS.snapshot() if BREAKERS is not None else {}}
+
+@app.get("/v1/stats/retries")
+async def retry_stats(api_key: ApiKey = Depends(verify_api_key)):
+    """Retry policy and how much of the shared retry budget is in use"""
+    return {"retries": RETRY.snapshot()}
+
+@app.get("/v1/stats/pools")
+async def pool_stats(api_key: ApiKey = Depends(verify_api_key)):
+    """Upstream connection pool limits, connection counts and request totals"""
+    return {"pools": UPSTREAM.snapshot()}
+
+@app.get("/v1/usage")
+async def key_usage(api_key: ApiKey = Depends(authenticate_api_key)):
+    """The calling key's limits and today's token and spend totals (this worker only); not rate limited"""
+    return api_key.snapshot()
+
+# Multi-image requests fan out into single-image calls, at most this many per
+# model in flight (unless the registry sets max_concurrent_images)
+IMAGE_CONCURRENCY = int(os.getenv("OMNI_IMAGE_CONCURRENCY", "4"))
+IMAGE_TIMEOUT = float(os.getenv("OMNI_IMAGE_TIMEOUT", "120"))
+IMAGE_SLOTS: Dict[str, asyncio.Semaphore] = {}
+# Background image jobs, kept where every worker can read them
+IMAGE_JOBS = ImageJobStore(
+    os.getenv("OMNI_IMAGE_JOB_DIR", ".omni_jobs"),
+    ttl=float(os.getenv("OMNI_IMAGE_JOB_TTL", "3600")),
+    max_running=int(os.getenv("OMNI_IMAGE_MAX_JOBS", "64"))
+)
+IMAGE_JOB_TIMEOUT = float(os.getenv("OMNI_IMAGE_JOB_TIMEOUT", "900"))
+# Local copies of generated images, served from /v1/images/files (off unless a directory is set)
+IMAGE_STORE_DIR = os.getenv("OMNI_IMAGE_STORE_DIR")
+IMAGE_STORE = ImageStore(
+    IMAGE_STORE_DIR,
+    max_bytes=int(float(os.getenv("OMNI_IMAGE_STORE_MAX_MB", "2048")) * 1024 * 1024),
+    max_image_bytes=int(float(os.getenv("OMNI_IMAGE_STORE_MAX_IMAGE_MB", "32")) * 1024 * 1024),
+    thumbnail_sizes=[int(size) for size in os.getenv("OMNI_THUMBNAIL_SIZES", "128,256,512").split(",")],
+    thumbnail_workers=int(os.getenv("OMNI_THUMBNAIL_WORKERS", "2"))
+) if IMAGE_STORE_DIR else None
+# Base of stored image URLs, for routers behind a proxy; the request's base URL when unset
+IMAGE_BASE_URL = os.getenv("OMNI_PUBLIC_BASE_URL")
+
+def _image_slots(model_id: str, model_info: ModelInfo) -> asyncio.Semaphore:
+    slots = IMAGE_SLOTS.get(model_id)
+    if slots is None:
+        slots = IMAGE_SLOTS[model_id] = asyncio.Semaphore(model_info.max_concurrent_images or IMAGE_CONCURRENCY)
+    return slots
+
+def _image_base_url(http_request: Request) -> str:
+    return (IMAGE_BASE_URL or str(http_request.base_url)).rstrip("/") + "/"
+
+async def _store_images(urls: List[str], base_url: str) -> List[str]:
+    """Router URLs for images copied into the store; one that couldn't be copied keeps its provider URL"""
+    stored = await IMAGE_STORE.store_all(UPSTREAM.client("image_store"), urls)
+    return [url if image is None else f"{base_url}v1/images/files/{image.name}" for url, image in zip(urls, stored)]
+
+async def _generate_images(
+    model_id: str,
+    model_info: ModelInfo,
+    provider: ImageProvider,
+    request: ImageGenerationRequest,
+    base_url: str,
+    progress: Optional[Callable[[], None]] = None
+) -> ImageGenerationResponse:
+    """
+    Generate request.n images as concurrent single-image calls, each with
+    its own retries, and merge them in request order. Images that fail
+    are listed in errors; only when every one fails is the first error
+    raised. Each successful image is charged to the key as it arrives,
+    and copied into the image store (if enabled) while the others are
+    still generating.
+    """
+    single = request.model_copy(update={"n": 1})
+    slots = _image_slots(model_id, model_info)
+    on_retry = _retry_counter(model_id, model_info)
+
+    async def generate() -> ImageGenerationResponse:
+        scope = current_scope()
+        timeout = IMAGE_TIMEOUT if scope is None else scope.clamp(IMAGE_TIMEOUT)
+        with _circuit(model_id, model_info):
+            async with LIMITS.admit(*_limiter_keys(model_id, model_info)) as admission:
+                with _upstream_call(model_id, model_info):
+                    start = time.perf_counter()
+                    response = await provider.generate_image(single, timeout=timeout)
+                # Single images take roughly constant time, so the whole call is the signal
+                admission.latency = time.perf_counter() - start
+                return response
+
+    async def one() -> ImageGenerationResponse:
+        try:
+            async with slots:
+                response = await RETRY.call(generate, deadline=current_deadline(), on_retry=on_retry)
+            if model_info.pricing and model_info.pricing.per_image:
+                charge_current_key(0, model_info.pricing.per_image * len(response.urls))
+            if IMAGE_STORE is not None:
+                response.urls = await _store_images(response.urls, base_url)
+            return response
+        finally:
+            if progress is not None:
+                progress()
+
+    results = await asyncio.gather(*(one() for _ in range(request.n)), return_exceptions=True)
+    urls: List[str] = []
+    errors: List[ImageError] = []
+    for index, result in enumerate(results):
+        if not isinstance(result, Exception):
+            if isinstance(result, BaseException):
+                raise result
+            urls.extend(result.urls)
+        elif isinstance(result, HTTPException):
+            errors.append(ImageError(index=index, status_code=result.status_code, detail=str(result.detail)))
+        else:
+            logging.error(f"Image {index} of {request.n} from {model_id} failed: {result!r}")
+            errors.append(ImageError(index=index, status_code=500, detail=str(result)))
+    if not urls:
+        first = next(result for result in results if isinstance(result, Exception))
+        raise first
+    if errors:
+        logging.warning(f"{len(errors)} of {request.n} images from {model_id} failed")
+    return ImageGenerationResponse(urls=urls, model=request.model, provider=model_info.provider.value, errors=errors or None)
+
+async def _image_job(
+    model_id: str,
+    model_info: ModelInfo,
+    provider: ImageProvider,
     request: ImageGenerationRequest,
-    api_key: str = Depends(verify_api_key)
+    base_url: str,
+    progress: Callable[[], None]
 ) -> ImageGenerationResponse:
+    scope = RequestScope(IMAGE_JOB_TIMEOUT or None)
+    try:
+        with scope.armed():
+            return await _generate_images(model_id, model_info, provider, request, base_url, progress)
+    finally:
+        scope.close()
+
+@app.post("/v1/images/generate", response_model=None)
+async def create_image(
+    request: ImageGenerationRequest,
+    http_request: Request,
+    api_key: ApiKey = Depends(verify_api_key)
+) -> Response:
     """
     Generate images using the specified model.
+
+    Several images are generated by concurrent single-image calls; if only
+    some fail, the response lists them in errors. With background the
+    request returns 202 and an ImageJob right away; poll
+    /v1/images/jobs/{id} for its progress and result. When the image
+    store is enabled, urls point at the router's copies.
     """
+    scope = None
     try:
         # Look up the model info
-        model_info = IMAGE_MODELS.get(request.model)
+        model_info = REGISTRY.current.image.get(request.model)
         if not model_info:
             raise HTTPException(
                 status_code=400,
                 detail=f"Unknown model: {request.model}"
             )
-        request.model = model_info.name
+        model_id, request.model = request.model, model_info.name
 
         # Get the provider for this model
-        provider = PROVIDERS.get(model_info.provider)
-        if not provider:
+        provider = await PROVIDERS.load(model_info.provider)
+        if not isinstance(provider, ImageProvider):
             raise HTTPException(
                 status_code=500,
                 detail=f"Provider not configured: {model_info.provider}"
@@ -170,14 +1369,75 @@ async def create_image(
             )
 
         # Log the request and the provider being used
-        logging.info(f"Image generation request received. Model: {request.model}, Provider: {model_info.provider}")
+        logging.info(f"Image generation request received. Model: {request.model}, Provider: {model_info.provider}, n: {request.n}")
+
+        base_url = _image_base_url(http_request)
+        if request.background:
+            job = await IMAGE_JOBS.submit(
+                api_key.name, model_id, request.n,
+                lambda progress: _image_job(model_id, model_info, provider, request, base_url, progress)
+            )
+            return FastJSONResponse(job, status_code=202, headers={"Location": f"/v1/images/jobs/{job.id}"})
 
         # Generate the images
+        scope = _request_scope(http_request)
+        with scope.armed():
+            response = await _generate_images(model_id, model_info, provider, request, base_url)
+        return FastJSONResponse(response)
 
-        response = await provider.generate_image(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.exception("Error during image generation:")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if scope is not None:
+            scope.close()
 
-        return response
+@app.get("/v1/images/jobs/{job_id}")
+async def get_image_job(job_id: str, api_key: ApiKey = Depends(authenticate_api_key)) -> ImageJob:
+    """A background image job's status, progress and, once finished, result or error; not rate limited"""
+    job = await IMAGE_JOBS.get(job_id, api_key.name)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown image job: {job_id}")
+    return job
 
+def _stored_image_response(request: Request, found: Tuple[str, os.stat_result], etag: str, media_type: str) -> Response:
+    """A stored file with range support, or 304 Not Modified; stored files never change, so caches keep them"""
+    path, stat = found
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return MappedFileResponse(path, media_type=media_type, stat_result=stat, headers=headers)
+
+@app.api_route("/v1/images/files/{name}", methods=["GET", "HEAD"], response_model=None)
+async def get_image_file(name: str, request: Request) -> Response:
+    """
+    A stored image, by <sha256>.<ext> as in the urls of image responses.
+    Not authenticated, so the URLs work in <img> tags; they can't be
+    guessed without the image itself.
+    """
+    found = await IMAGE_STORE.open(name) if IMAGE_STORE is not None else None
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Unknown image: {name}")
+    return _stored_image_response(request, found, f'"{name.split(".")[0]}"', IMAGE_TYPES[name.split(".")[1]])
+
+@app.api_route("/v1/images/files/{name}/thumbnail", methods=["GET", "HEAD"], response_model=None)
+async def get_image_thumbnail(name: str, request: Request, size: int = Query(256, ge=1)) -> Response:
+    """A WebP thumbnail of a stored image, at the smallest configured size of at least size pixels"""
+    if IMAGE_STORE is None:
+        raise HTTPException(status_code=404, detail=f"Unknown image: {name}")
+    size = IMAGE_STORE.thumbnail_size(size)
+    try:
+        found = await IMAGE_STORE.thumbnail(name, size)
     except Exception as e:
-        logging.exception("Error during image generation:")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logging.exception(f"Thumbnail of {name} failed:")
+        raise HTTPException(status_code=500, detail=f"Could not render a thumbnail of {name}: {e}")
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Unknown image: {name}")
+    return _stored_image_response(request, found, f'"{name.split(".")[0]}-{size}"', "image/webp")
+
+@app.get("/v1/stats/images")
+async def image_stats(api_key: ApiKey = Depends(verify_api_key)):
+    """Background image jobs run by this worker and its view of the image store"""
+    return {"jobs": IMAGE_JOBS.snapshot(), "store": IMAGE_STORE.snapshot() if IMAGE_STORE is not None else None}
\ No newline at end of file
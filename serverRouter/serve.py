@@ -0,0 +1,74 @@
+"""
+Production entry point for the router.
+
+Runs the app in several uvicorn worker processes (one per core by default)
+on uvloop and httptools when they are installed. On SIGTERM each worker
+stops accepting connections, lets in-flight requests and streams finish
+for up to --drain-timeout seconds, cancels what is left, then closes its
+upstream pools.
+
+    python -m serverRouter.serve [--workers 8] [--port 8000] [--drain-timeout 30]
+
+Every option can also be set through the OMNI_* variable named in its help.
+"""
+import argparse
+import importlib.util
+import logging
+import os
+
+import uvicorn
+
+APP = "serverRouter.router:app"
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--host", default=os.getenv("OMNI_HOST", "0.0.0.0"), help="OMNI_HOST")
+    parser.add_argument("--port", type=int, default=int(os.getenv("OMNI_PORT", "8000")), help="OMNI_PORT")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("OMNI_WORKERS", "0")),
+                        help="Worker processes, 0 for one per core (OMNI_WORKERS)")
+    parser.add_argument("--drain-timeout", type=int, default=int(os.getenv("OMNI_DRAIN_TIMEOUT", "30")),
+                        help="Seconds to let in-flight requests finish on shutdown (OMNI_DRAIN_TIMEOUT)")
+    parser.add_argument("--keep-alive", type=int, default=int(os.getenv("OMNI_KEEP_ALIVE", "75")),
+                        help="Idle keep-alive seconds; keep it above the load balancer's idle timeout (OMNI_KEEP_ALIVE)")
+    parser.add_argument("--limit-concurrency", type=int, default=int(os.getenv("OMNI_LIMIT_CONCURRENCY", "0")),
+                        help="Connections per worker before new ones get a 503, 0 for no limit (OMNI_LIMIT_CONCURRENCY)")
+    parser.add_argument("--max-body-bytes", type=int, default=int(os.getenv("OMNI_MAX_BODY_BYTES", str(16 * 1024 * 1024))),
+                        help="OMNI_MAX_BODY_BYTES")
+    parser.add_argument("--max-header-bytes", type=int, default=int(os.getenv("OMNI_MAX_HEADER_BYTES", str(64 * 1024))),
+                        help="OMNI_MAX_HEADER_BYTES")
+    parser.add_argument("--log-level", default=os.getenv("OMNI_LOG_LEVEL", "info"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format='%(asctime)s - %(levelname)s - %(message)s')
+    # Workers read the size caps from the environment when they import the app
+    os.environ["OMNI_MAX_BODY_BYTES"] = str(args.max_body_bytes)
+    os.environ["OMNI_MAX_HEADER_BYTES"] = str(args.max_header_bytes)
+
+    workers = args.workers or os.cpu_count() or 1
+    loop = "uvloop" if _installed("uvloop") else "asyncio"
+    http = "httptools" if _installed("httptools") else "h11"
+    logging.info(f"Serving {APP} on {args.host}:{args.port} with {workers} workers (loop={loop}, http={http})")
+
+    uvicorn.run(
+        APP,
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        timeout_keep_alive=args.keep_alive,
+        timeout_graceful_shutdown=args.drain_timeout,
+        limit_concurrency=args.limit_concurrency or None,
+        # Only h11 takes a header limit; with httptools the app middleware enforces it
+        h11_max_incomplete_event_size=args.max_header_bytes or None,
+        log_level=args.log_level.lower()
+    )
+
+
+if __name__ == "__main__":
+    main()
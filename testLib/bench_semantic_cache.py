@@ -0,0 +1,36 @@
+"""
+Microbenchmark for the semantic cache.
+
+Fills the cache with synthetic prompts using the offline hashing embedder
+and measures lookup latency, so no provider or API key is needed.
+"""
+import time
+import random
+from serverRouter.core.datamodels import ChatCompletionRequest, ChatCompletionResponse, ChatMessage
+from serverRouter.core.semantic_cache import SemanticCache
+
+WORDS = "capital france germany weather recipe bread python code error fix explain summarize translate spanish poem".split()
+
+def make_request(text: str) -> ChatCompletionRequest:
+    return ChatCompletionRequest(model="gpt-4o", messages=[ChatMessage(role="user", content=text)], temperature=0)
+
+def run(capacity: int = 10_000, lookups: int = 1_000):
+    cache = SemanticCache(capacity=capacity)
+    rng = random.Random(0)
+    prompts = [" ".join(rng.choices(WORDS, k=8)) + f" {i}" for i in range(capacity)]
+
+    start = time.perf_counter()
+    for text in prompts:
+        cache.store(make_request(text), ChatCompletionResponse(model="gpt-4o", content=text, provider="openai"))
+    fill = time.perf_counter() - start
+
+    queries = [make_request(rng.choice(prompts)) for _ in range(lookups)]
+    start = time.perf_counter()
+    hits = sum(cache.lookup(q) is not None for q in queries)
+    elapsed = time.perf_counter() - start
+
+    print(f"Filled {capacity} entries in {fill:.2f}s")
+    print(f"{lookups} lookups: {elapsed / lookups * 1e6:.1f} us/lookup, {hits} hits")
+
+if __name__ == "__main__":
+    run()
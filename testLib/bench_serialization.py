@@ -0,0 +1,114 @@
+"""
+Microbenchmark for the chat response path.
+
+Serves canned OpenAI responses from an in-process httpx transport, so no
+network or API key is needed, and measures the router-side cost per
+request (response encoding is also timed on its own) of:
+
+    stdlib       SDK objects -> ChatCompletionResponse -> jsonable_encoder + json (the old path)
+    fast         SDK objects -> ChatCompletionResponse -> FastJSONResponse
+    passthrough  request posted without create()'s parameter transform, upstream body forwarded
+
+    python -m testLib.bench_serialization [--requests 2000]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+from openai import AsyncOpenAI
+from starlette.responses import JSONResponse
+
+from serverRouter.core.datamodels import ChatCompletionRequest, ChatCompletionResponse, ChatMessage
+from serverRouter.core.serialization import FastJSONResponse
+
+SIZES = {"small": 200, "large": 64_000}
+
+
+def upstream_body(content_chars: int) -> bytes:
+    return json.dumps({
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": 1700000000,
+        "model": "gpt-4o-2024-08-06",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "lorem ipsum " * (content_chars // 12)},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": 1200, "completion_tokens": content_chars // 4, "total_tokens": 1200 + content_chars // 4,
+            "prompt_tokens_details": {"cached_tokens": 1024},
+        },
+    }).encode()
+
+
+def make_provider(body: bytes):
+    from serverRouter.providers.openai.provider import OpenAIProvider
+
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    provider = OpenAIProvider()
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body, headers={"content-type": "application/json"}))
+    provider.client = AsyncOpenAI(api_key="bench", http_client=httpx.AsyncClient(transport=transport), max_retries=0)
+    return provider
+
+
+async def time_path(name: str, provider, request: ChatCompletionRequest, n: int) -> float:
+    async def once():
+        if name == "passthrough":
+            return (await provider.chat_complete_raw(request)).body
+        completion = await provider.chat_complete(request)
+        if name == "stdlib":
+            return JSONResponse(jsonable_encoder(completion)).body
+        return FastJSONResponse(completion).body
+
+    for _ in range(min(n, 100)):
+        await once()
+    start = time.perf_counter()
+    for _ in range(n):
+        await once()
+    return (time.perf_counter() - start) / n
+
+
+def time_encoding(completion: ChatCompletionResponse, n: int):
+    """Response encoding alone: (stdlib, fast) seconds per response"""
+    timings = []
+    for render in (lambda: JSONResponse(jsonable_encoder(completion)).body, lambda: FastJSONResponse(completion).body):
+        start = time.perf_counter()
+        for _ in range(n):
+            render()
+        timings.append((time.perf_counter() - start) / n)
+    return timings
+
+
+async def run(n: int):
+    request = ChatCompletionRequest(
+        model="gpt-4o",
+        messages=[ChatMessage(role="system", content="be brief " * 500), ChatMessage(role="user", content="hello")]
+    )
+    print(f"{'size':<8}{'path':<14}{'us/request':>12}{'vs stdlib':>12}")
+    for size, chars in SIZES.items():
+        provider = make_provider(upstream_body(chars))
+        baseline = None
+        for name in ("stdlib", "fast", "passthrough"):
+            per_request = await time_path(name, provider, request, n)
+            baseline = baseline or per_request
+            print(f"{size:<8}{name:<14}{per_request * 1e6:>12.1f}{baseline / per_request:>11.2f}x")
+
+    print(f"\nResponse encoding only\n{'size':<8}{'stdlib us':>12}{'fast us':>12}{'speedup':>10}")
+    for size, chars in SIZES.items():
+        completion = await make_provider(upstream_body(chars)).chat_complete(request)
+        stdlib, fast = time_encoding(completion, n)
+        print(f"{size:<8}{stdlib * 1e6:>12.1f}{fast * 1e6:>12.1f}{stdlib / fast:>9.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--requests", type=int, default=2000)
+    # httpx logs every request at INFO, which would dominate the timings
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    asyncio.run(run(parser.parse_args().requests))
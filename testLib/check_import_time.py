@@ -0,0 +1,75 @@
+"""
+Import-time budget for the router.
+
+Imports serverRouter.router in fresh interpreters and fails (exit code 1)
+if the fastest run exceeds the budget or if a provider SDK was imported
+eagerly. Run it before merging anything that touches startup:
+
+    python -m testLib.check_import_time [--budget-ms 1000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# SDKs that must only load on the first request for one of their models
+LAZY_MODULES = ("openai", "anthropic", "google.generativeai")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import serverRouter.router
+elapsed = time.perf_counter() - start
+print(json.dumps({"ms": elapsed * 1000, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+def measure(runs: int):
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE], capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        results.append(json.loads(output))
+    return results
+
+def slowest_imports(limit: int = 10):
+    """Largest cumulative times from python -X importtime"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import serverRouter.router"],
+        capture_output=True, text=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("OMNI_IMPORT_BUDGET_MS", "1000")))
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = measure(args.runs)
+    best = min(result["ms"] for result in results)
+    eager = sorted({module for result in results for module in result["loaded"]})
+
+    print(f"import serverRouter.router: best {best:.0f} ms of {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print("Slowest imports (cumulative):")
+    for cumulative, name in slowest_imports():
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if best > args.budget_ms:
+        print(f"FAIL: import took {best:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if eager:
+        print(f"FAIL: provider SDKs imported eagerly: {', '.join(eager)}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
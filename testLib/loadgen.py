@@ -0,0 +1,364 @@
+"""
+Open-loop load test of the router against local mock providers.
+
+Starts testLib.mock_providers and a router (python -m serverRouter.serve)
+pointed at it, sends chat requests at a fixed arrival rate regardless of
+how fast responses come back, and writes a JSON report: client latency,
+router-added latency (client latency minus the upstream time the router
+reports in its Server-Timing header), time to first token for streams,
+throughput, errors and router memory. Compare two reports to spot
+regressions between commits:
+
+    python -m testLib.loadgen run --rps 1000 --duration 30 --out results/head.json
+    python -m testLib.loadgen compare results/base.json results/head.json
+
+Pass --router-url to load an already running router instead; it must
+already point at the mocks.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+import orjson
+
+from testLib.mock_providers import profile_arguments, profile_from, provider_env
+
+DEFAULT_MODELS = "gpt-4o-mini,claude-3-5-sonnet,deepseek-v3,gemini-2.0-flash"
+API_KEY = os.getenv("OMNI_LOADGEN_API_KEY", "test-sk1o83e")
+# Metrics compared between reports, and whether higher is better
+COMPARED = {
+    "throughput_rps": True,
+    "error_rate": False,
+    "latency_ms.p50": False,
+    "latency_ms.p99": False,
+    "router_added_ms.p50": False,
+    "router_added_ms.p99": False,
+    "ttft_ms.p50": False,
+    "ttft_ms.p99": False,
+    "memory_mb.peak": False,
+}
+
+
+def quantiles(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    values = sorted(values)
+
+    def q(p: float) -> float:
+        return round(values[min(len(values) - 1, int(p * len(values)))], 3)
+
+    return {"p50": q(0.50), "p90": q(0.90), "p99": q(0.99), "p999": q(0.999), "max": round(values[-1], 3)}
+
+
+def _rss_bytes(pid: int) -> int:
+    """Resident memory of a process and its descendants (Linux /proc; 0 elsewhere)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            rss = next((int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:")), 0)
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(child) for child in f.read().split()]
+    except (OSError, ValueError):
+        return 0
+    return rss + sum(_rss_bytes(child) for child in children)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _server_timing(header: Optional[str]) -> Dict[str, float]:
+    timings = {}
+    for metric in (header or "").split(","):
+        name, _, duration = metric.strip().partition(";dur=")
+        if duration:
+            timings[name] = float(duration)
+    return timings
+
+
+async def _wait_ready(session: aiohttp.ClientSession, url: str, process: Optional[subprocess.Popen], timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            async with session.get(url, headers={"Authorization": f"Bearer {API_KEY}"}) as response:
+                if response.status < 500:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s")
+
+
+class LoadRun:
+    """
+    One open-loop run: request scheduling, per-request results and memory
+    sampling. The client is aiohttp: httpx's connection pool costs more CPU
+    per request than the router under test at a few hundred RPS.
+    """
+
+    def __init__(self, args: argparse.Namespace, router_url: str, router_pid: Optional[int]):
+        self.args = args
+        self.router_url = router_url
+        self.router_pid = router_pid
+        self.models = args.models.split(",")
+        self.results: List[Dict] = []
+        self.lags: List[float] = []
+        self.memory: List[int] = []
+        self.sequence = itertools.count()
+
+    def _body(self, stream: bool) -> Dict:
+        # Unique prompts, so the response cache and coalescing don't absorb the load
+        prompt = f"request {next(self.sequence)}: " + "lorem ipsum " * (self.args.prompt_tokens // 2)
+        return {
+            "model": random.choice(self.models),
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": self.args.max_tokens,
+            "stream": stream,
+        }
+
+    async def _one(self, session: aiohttp.ClientSession, record: bool):
+        stream = random.random() < self.args.stream_fraction
+        body = self._body(stream)
+        result = {"model": body["model"], "stream": stream}
+        start = time.perf_counter()
+        try:
+            async with session.post("/v1/chat/completions", data=orjson.dumps(body)) as response:
+                result["status"] = response.status
+                if stream:
+                    async for line in response.content:
+                        if line.startswith(b"data:") and "ttft_ms" not in result:
+                            result["ttft_ms"] = (time.perf_counter() - start) * 1000
+                        if b'"error"' in line:
+                            # Failures after the first chunk are reported in-band
+                            result["status"] = 599
+                else:
+                    await response.read()
+                    upstream = _server_timing(response.headers.get("server-timing")).get("upstream")
+                    if upstream is not None:
+                        result["upstream_ms"] = upstream
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            result["status"] = 0
+            result["error"] = type(e).__name__
+        result["end"] = time.perf_counter()
+        result["latency_ms"] = (result["end"] - start) * 1000
+        if record:
+            self.results.append(result)
+
+    async def _sample_memory(self):
+        while self.router_pid is not None:
+            self.memory.append(_rss_bytes(self.router_pid))
+            await asyncio.sleep(0.5)
+
+    async def _phase(self, session: aiohttp.ClientSession, rps: float, duration: float, record: bool):
+        """
+        Send requests at rps for duration seconds without waiting on
+        responses, then wait for stragglers. Returns (start, send seconds).
+        """
+        total = int(rps * duration)
+        tasks = set()
+        start = time.perf_counter()
+        due = 0.0
+        for _ in range(total):
+            due += random.expovariate(rps) if self.args.poisson else 1 / rps
+            delay = start + due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif record:
+                # How far the generator itself is behind schedule
+                self.lags.append(-delay * 1000)
+            task = asyncio.ensure_future(self._one(session, record))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        sending = time.perf_counter() - start
+        if tasks:
+            await asyncio.wait(tasks, timeout=self.args.drain_timeout)
+        return start, sending
+
+    async def execute(self) -> Dict:
+        async with aiohttp.ClientSession(
+            base_url=self.router_url,
+            headers={"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"},
+            connector=aiohttp.TCPConnector(limit=self.args.connections),
+            timeout=aiohttp.ClientTimeout(total=self.args.request_timeout)
+        ) as session:
+            if self.args.warmup:
+                await self._phase(session, min(self.args.rps, 50), self.args.warmup, record=False)
+            sampler = asyncio.ensure_future(self._sample_memory())
+            start, sending = await self._phase(session, self.args.rps, self.args.duration, record=True)
+            sampler.cancel()
+        return self.report(start, sending)
+
+    def report(self, start: float, sending: float) -> Dict:
+        ok = [r for r in self.results if r["status"] == 200]
+        errors: Dict[str, int] = {}
+        for result in self.results:
+            if result["status"] != 200:
+                key = str(result["status"] or result.get("error"))
+                errors[key] = errors.get(key, 0) + 1
+        router_added = [r["latency_ms"] - r["upstream_ms"] for r in ok if "upstream_ms" in r]
+        memory = [m for m in self.memory if m]
+        mb = 1024 * 1024
+        finished = max((r["end"] for r in self.results), default=start) - start
+        return {
+            "sent": len(self.results),
+            "ok": len(ok),
+            "errors": errors,
+            "error_rate": round(1 - len(ok) / len(self.results), 5) if self.results else None,
+            "offered_rps": self.args.rps,
+            "achieved_rps": round(len(self.results) / sending, 1) if sending else None,
+            "throughput_rps": round(len(ok) / finished, 1) if finished else None,
+            "latency_ms": quantiles([r["latency_ms"] for r in ok]),
+            "router_added_ms": quantiles(router_added),
+            "ttft_ms": quantiles([r["ttft_ms"] for r in ok if "ttft_ms" in r]),
+            "generator_lag_ms": quantiles(self.lags),
+            "memory_mb": {
+                "start": round(memory[0] / mb, 1),
+                "peak": round(max(memory) / mb, 1),
+                "end": round(memory[-1] / mb, 1),
+            } if memory else None,
+        }
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    processes: List[subprocess.Popen] = []
+    log_dir = tempfile.mkdtemp(prefix="omni-loadgen-")
+    router_url, router_pid = args.router_url, None
+    try:
+        async with aiohttp.ClientSession() as probe:
+            mock_stats_url = f"http://127.0.0.1:{args.mock_port}/stats"
+            if router_url is None:
+                profile = profile_from(args)
+                mock_cmd = [
+                    sys.executable, "-m", "testLib.mock_providers",
+                    "--port", str(args.mock_port), "--grpc-port", str(args.mock_grpc_port), "--cert-dir", log_dir,
+                    *itertools.chain.from_iterable(
+                        (f"--{field.replace('_', '-')}", str(value)) for field, value in profile._asdict().items()
+                    ),
+                ]
+                processes.append(subprocess.Popen(mock_cmd, stdout=subprocess.DEVNULL, stderr=open(os.path.join(log_dir, "mock.log"), "w")))
+                await _wait_ready(probe, f"http://127.0.0.1:{args.mock_port}/health", processes[-1])
+
+                cert = os.path.join(log_dir, "mock-cert.pem")
+                env = {
+                    **os.environ,
+                    **provider_env("127.0.0.1", args.mock_port, args.mock_grpc_port, cert if os.path.exists(cert) else None),
+                    "OMNI_CACHE_ENABLED": "0",
+                }
+                router_cmd = [
+                    sys.executable, "-m", "serverRouter.serve", "--host", "127.0.0.1",
+                    "--port", str(args.router_port), "--workers", str(args.workers), "--log-level", "warning",
+                ]
+                processes.append(subprocess.Popen(router_cmd, env=env, stdout=subprocess.DEVNULL, stderr=open(os.path.join(log_dir, "router.log"), "w")))
+                router_url, router_pid = f"http://127.0.0.1:{args.router_port}", processes[-1].pid
+                await _wait_ready(probe, f"{router_url}/v1/models", processes[-1])
+
+            results = await LoadRun(args, router_url, router_pid).execute()
+            try:
+                async with probe.get(mock_stats_url) as response:
+                    results["upstream_calls"] = await response.json()
+            except (aiohttp.ClientError, ValueError):
+                pass
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "logs": log_dir,
+        },
+        "config": {key: value for key, value in vars(args).items() if key != "command"},
+        "results": results,
+    }
+
+
+def _lookup(report: Dict, path: str):
+    value = report["results"]
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def compare(base: Dict, head: Dict):
+    print(f"{'metric':<24}{'base':>12}{'head':>12}{'change':>10}")
+    for path, higher_is_better in COMPARED.items():
+        old, new = _lookup(base, path), _lookup(head, path)
+        if old is None or new is None:
+            continue
+        change = f"{(new - old) / old * 100:+.1f}%" if old else ""
+        worse = (new < old) if higher_is_better else (new > old)
+        flag = " !" if worse and old and abs(new - old) / old > 0.1 else ""
+        print(f"{path:<24}{old:>12}{new:>12}{change:>10}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run a load test and write a JSON report")
+    run_parser.add_argument("--rps", type=float, default=200.0, help="Offered load, requests per second")
+    run_parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    run_parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds at up to 50 rps first")
+    run_parser.add_argument("--poisson", action="store_true", help="Exponential inter-arrival times instead of fixed")
+    run_parser.add_argument("--models", default=DEFAULT_MODELS, help="Comma-separated models, picked uniformly")
+    run_parser.add_argument("--stream-fraction", type=float, default=0.2)
+    run_parser.add_argument("--prompt-tokens", type=int, default=200)
+    run_parser.add_argument("--max-tokens", type=int, default=256)
+    run_parser.add_argument("--connections", type=int, default=2000, help="Client connection pool size")
+    run_parser.add_argument("--request-timeout", type=float, default=60.0)
+    run_parser.add_argument("--drain-timeout", type=float, default=60.0, help="Seconds to wait for stragglers")
+    run_parser.add_argument("--workers", type=int, default=1, help="Router worker processes")
+    run_parser.add_argument("--router-port", type=int, default=9000)
+    run_parser.add_argument("--router-url", help="Use a running router instead of starting one")
+    run_parser.add_argument("--mock-port", type=int, default=9100)
+    run_parser.add_argument("--mock-grpc-port", type=int, default=9101)
+    run_parser.add_argument("--out", help="Report path (default: loadtest-<commit>.json)")
+    profile_arguments(run_parser)
+
+    compare_parser = commands.add_parser("compare", help="Compare two reports")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.base) as f_base, open(args.head) as f_head:
+            compare(json.load(f_base), json.load(f_head))
+        return
+
+    report = asyncio.run(run(args))
+    out = args.out or f"loadtest-{report['meta']['commit'] or 'local'}.json"
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["results"], indent=2))
+    print(f"Report written to {out}")
+
+
+if __name__ == "__main__":
+    main()
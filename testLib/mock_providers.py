@@ -0,0 +1,388 @@
+"""
+Local stand-ins for the upstream provider APIs, for load tests.
+
+One HTTP server speaks the OpenAI (/openai/v1), DeepSeek (/deepseek) and
+Anthropic (/anthropic) APIs, and a TLS gRPC server speaks Gemini's
+GenerativeService (the Gemini SDK's async client only supports gRPC).
+Every call waits for a latency drawn from a log-normal distribution
+(time to first token for streams), streams deliver tokens at a fixed
+rate, and a share of calls fail with 500 or 429.
+
+    python -m testLib.mock_providers [--latency-ms 300] [--latency-p99-ms 1200] [--error-rate 0.01]
+
+prints the environment that points the router at it.
+"""
+import argparse
+import asyncio
+import logging
+import math
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, NamedTuple, Optional
+
+import orjson
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+GEMINI_SERVICE = "google.ai.generativelanguage.v1beta.GenerativeService"
+GEMINI_MODEL_SERVICE = "google.ai.generativelanguage.v1beta.ModelService"
+# An empty model list in both the OpenAI and Anthropic page formats
+EMPTY_LIST = b'{"object": "list", "data": [], "has_more": false, "first_id": null, "last_id": null}'
+# z-score of the 99th percentile, to turn a median and p99 into a log-normal sigma
+Z_99 = 2.326
+
+
+class MockProfile(NamedTuple):
+    latency_ms: float = 300.0        # median latency (time to first token for streams)
+    latency_p99_ms: float = 1200.0   # p99 latency; equal to latency_ms for a fixed delay
+    tokens_per_second: float = 80.0  # streaming speed
+    output_tokens: int = 60
+    error_rate: float = 0.0          # share of calls answered with a 500
+    throttle_rate: float = 0.0       # share of calls answered with a 429
+
+    def latency(self) -> float:
+        if self.latency_p99_ms <= self.latency_ms:
+            return self.latency_ms / 1000
+        sigma = math.log(self.latency_p99_ms / self.latency_ms) / Z_99
+        return random.lognormvariate(math.log(self.latency_ms), sigma) / 1000
+
+    def failure(self) -> Optional[int]:
+        """HTTP status of an injected failure, or None to succeed"""
+        draw = random.random()
+        if draw < self.error_rate:
+            return 500
+        if draw < self.error_rate + self.throttle_rate:
+            return 429
+        return None
+
+    def stream_steps(self):
+        """(tokens, delay) per streamed event, at most one event every 20 ms"""
+        interval = max(1 / self.tokens_per_second, 0.02)
+        per_event = max(1, round(self.tokens_per_second * interval))
+        remaining = self.output_tokens
+        while remaining > 0:
+            tokens = min(per_event, remaining)
+            remaining -= tokens
+            yield tokens, interval
+
+
+def _text(tokens: int) -> str:
+    return "lorem " * tokens
+
+
+def _prompt_tokens(body: bytes) -> int:
+    return max(1, len(body) // 4)
+
+
+class MockProviders:
+    """The HTTP app and gRPC handlers, sharing one profile and call counters"""
+
+    def __init__(self, profile: MockProfile):
+        self.profile = profile
+        self.calls: Counter = Counter()
+        self.app = Starlette(routes=[
+            Route("/openai/v1/chat/completions", self.openai_chat, methods=["POST"]),
+            Route("/openai/v1/images/generations", self.openai_images, methods=["POST"]),
+            Route("/deepseek/chat/completions", self.openai_chat, methods=["POST"]),
+            Route("/anthropic/v1/messages", self.anthropic_messages, methods=["POST"]),
+            Route("/stats", self.stats, methods=["GET"]),
+            # Health probes (model lists) and connection warm-ups (HEAD on the base URLs)
+            Route("/{path:path}", self.ok, methods=["GET", "HEAD"]),
+        ])
+
+    async def ok(self, request: Request) -> Response:
+        return Response(EMPTY_LIST, media_type="application/json")
+
+    async def stats(self, request: Request) -> Response:
+        return Response(orjson.dumps(dict(self.calls)), media_type="application/json")
+
+    async def _admit(self, provider: str) -> Optional[Response]:
+        """Count the call and return an injected error response, if any"""
+        self.calls[provider] += 1
+        status = self.profile.failure()
+        if status is None:
+            return None
+        self.calls[f"{provider}_{status}"] += 1
+        await asyncio.sleep(self.profile.latency() / 4)
+        headers = {"retry-after": "1"} if status == 429 else {}
+        error = {"error": {"message": "injected failure", "type": "mock_error"}}
+        return Response(orjson.dumps(error), status_code=status, media_type="application/json", headers=headers)
+
+    async def openai_chat(self, request: Request) -> Response:
+        provider = request.url.path.split("/")[1]
+        error = await self._admit(provider)
+        if error is not None:
+            return error
+        raw = await request.body()
+        body = orjson.loads(raw)
+        prompt_tokens = _prompt_tokens(raw)
+        profile = self.profile
+        base = {"id": "chatcmpl-mock", "created": int(time.time()), "model": body["model"]}
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": profile.output_tokens,
+            "total_tokens": prompt_tokens + profile.output_tokens,
+        }
+
+        if not body.get("stream"):
+            await asyncio.sleep(profile.latency())
+            return Response(orjson.dumps({
+                **base,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": _text(profile.output_tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }), media_type="application/json")
+
+        async def events():
+            await asyncio.sleep(profile.latency())
+            chunk = {**base, "object": "chat.completion.chunk"}
+            for tokens, delay in profile.stream_steps():
+                delta = {"index": 0, "delta": {"content": _text(tokens)}, "finish_reason": None}
+                yield b"data: " + orjson.dumps({**chunk, "choices": [delta]}) + b"\n\n"
+                await asyncio.sleep(delay)
+            done = {"index": 0, "delta": {}, "finish_reason": "stop"}
+            yield b"data: " + orjson.dumps({**chunk, "choices": [done]}) + b"\n\n"
+            yield b"data: " + orjson.dumps({**chunk, "choices": [], "usage": usage}) + b"\n\n"
+            yield b"data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def openai_images(self, request: Request) -> Response:
+        error = await self._admit("openai_images")
+        if error is not None:
+            return error
+        body = orjson.loads(await request.body())
+        await asyncio.sleep(self.profile.latency())
+        data = [{"url": f"{request.base_url}mock/image-{i}.png"} for i in range(body.get("n") or 1)]
+        return Response(orjson.dumps({"created": int(time.time()), "data": data}), media_type="application/json")
+
+    async def anthropic_messages(self, request: Request) -> Response:
+        error = await self._admit("anthropic")
+        if error is not None:
+            return error
+        raw = await request.body()
+        body = orjson.loads(raw)
+        profile = self.profile
+        message = {
+            "id": "msg_mock",
+            "type": "message",
+            "role": "assistant",
+            "model": body["model"],
+            "stop_sequence": None,
+        }
+        input_tokens = _prompt_tokens(raw)
+
+        if not body.get("stream"):
+            await asyncio.sleep(profile.latency())
+            return Response(orjson.dumps({
+                **message,
+                "content": [{"type": "text", "text": _text(profile.output_tokens)}],
+                "stop_reason": "end_turn",
+                "usage": {"input_tokens": input_tokens, "output_tokens": profile.output_tokens},
+            }), media_type="application/json")
+
+        def event(name: str, data: Dict) -> bytes:
+            return b"event: " + name.encode() + b"\ndata: " + orjson.dumps({"type": name, **data}) + b"\n\n"
+
+        async def events():
+            await asyncio.sleep(profile.latency())
+            yield event("message_start", {"message": {
+                **message, "content": [], "stop_reason": None,
+                "usage": {"input_tokens": input_tokens, "output_tokens": 1},
+            }})
+            yield event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+            for tokens, delay in profile.stream_steps():
+                yield event("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": _text(tokens)}})
+                await asyncio.sleep(delay)
+            yield event("content_block_stop", {"index": 0})
+            yield event("message_delta", {
+                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                "usage": {"output_tokens": profile.output_tokens},
+            })
+            yield event("message_stop", {})
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    def gemini_handler(self):
+        """gRPC handler for GenerateContent and StreamGenerateContent"""
+        import grpc
+        from google.ai import generativelanguage_v1beta as glm
+
+        profile = self.profile
+        stop = glm.Candidate.FinishReason.STOP
+
+        def usage(request) -> "glm.GenerateContentResponse.UsageMetadata":
+            prompt_tokens = max(1, sum(len(part.text) for content in request.contents for part in content.parts) // 4)
+            return glm.GenerateContentResponse.UsageMetadata(
+                prompt_token_count=prompt_tokens,
+                candidates_token_count=profile.output_tokens,
+                total_token_count=prompt_tokens + profile.output_tokens,
+            )
+
+        def candidate(text: str, finish_reason=None) -> "glm.Candidate":
+            content = glm.Content(role="model", parts=[glm.Part(text=text)])
+            return glm.Candidate(content=content, finish_reason=finish_reason, index=0)
+
+        async def injected_failure(context) -> bool:
+            self.calls["gemini"] += 1
+            status = profile.failure()
+            if status is None:
+                return False
+            self.calls[f"gemini_{status}"] += 1
+            await asyncio.sleep(profile.latency() / 4)
+            code = grpc.StatusCode.RESOURCE_EXHAUSTED if status == 429 else grpc.StatusCode.INTERNAL
+            await context.abort(code, "injected failure")
+            return True
+
+        async def generate(request, context):
+            if await injected_failure(context):
+                return None
+            await asyncio.sleep(profile.latency())
+            return glm.GenerateContentResponse(
+                candidates=[candidate(_text(profile.output_tokens), stop)], usage_metadata=usage(request)
+            )
+
+        async def stream_generate(request, context):
+            if await injected_failure(context):
+                return
+            await asyncio.sleep(profile.latency())
+            for tokens, delay in profile.stream_steps():
+                yield glm.GenerateContentResponse(candidates=[candidate(_text(tokens))])
+                await asyncio.sleep(delay)
+            yield glm.GenerateContentResponse(candidates=[candidate("", stop)], usage_metadata=usage(request))
+
+        return grpc.method_handlers_generic_handler(GEMINI_SERVICE, {
+            "GenerateContent": grpc.unary_unary_rpc_method_handler(
+                generate,
+                request_deserializer=glm.GenerateContentRequest.deserialize,
+                response_serializer=glm.GenerateContentResponse.serialize,
+            ),
+            "StreamGenerateContent": grpc.unary_stream_rpc_method_handler(
+                stream_generate,
+                request_deserializer=glm.GenerateContentRequest.deserialize,
+                response_serializer=glm.GenerateContentResponse.serialize,
+            ),
+        })
+
+    def gemini_model_handler(self):
+        """gRPC handler for ListModels, which the router uses as a health probe"""
+        import grpc
+        from google.ai import generativelanguage_v1beta as glm
+
+        async def list_models(request, context):
+            return glm.ListModelsResponse(models=[glm.Model(name="models/gemini-2.0-flash")])
+
+        return grpc.method_handlers_generic_handler(GEMINI_MODEL_SERVICE, {
+            "ListModels": grpc.unary_unary_rpc_method_handler(
+                list_models,
+                request_deserializer=glm.ListModelsRequest.deserialize,
+                response_serializer=glm.ListModelsResponse.serialize,
+            ),
+        })
+
+
+def self_signed_cert(directory: str):
+    """(key, cert) paths for 127.0.0.1, generated with the openssl CLI; None if it isn't installed"""
+    openssl = shutil.which("openssl")
+    if openssl is None:
+        return None
+    key, cert = os.path.join(directory, "mock-key.pem"), os.path.join(directory, "mock-cert.pem")
+    if not os.path.exists(cert):
+        subprocess.run([
+            openssl, "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "7",
+            "-keyout", key, "-out", cert, "-subj", "/CN=localhost",
+            "-addext", "subjectAltName=IP:127.0.0.1,DNS:localhost",
+        ], check=True, capture_output=True)
+    return key, cert
+
+
+def provider_env(host: str, port: int, grpc_port: int = 0, cert: Optional[str] = None) -> Dict[str, str]:
+    """Environment that points the router's providers at the stand-ins"""
+    base = f"http://{host}:{port}"
+    env = {
+        "OPENAI_API_KEY": "mock",
+        "OPENAI_BASE_URL": f"{base}/openai/v1",
+        "DEEPSEEK_API_KEY": "mock",
+        "DEEPSEEK_BASE_URL": f"{base}/deepseek",
+        "ANTHROPIC_API_KEY": "mock",
+        "ANTHROPIC_BASE_URL": f"{base}/anthropic",
+    }
+    if grpc_port and cert:
+        env.update({
+            "GEMINI_API_KEY": "mock",
+            "GEMINI_API_ENDPOINT": f"{host}:{grpc_port}",
+            # grpc trusts the stand-in's self-signed certificate through this
+            "GRPC_DEFAULT_SSL_ROOTS_FILE_PATH": cert,
+        })
+    return env
+
+
+async def serve(profile: MockProfile, host: str, port: int, grpc_port: int, cert_dir: str):
+    mocks = MockProviders(profile)
+    server = uvicorn.Server(uvicorn.Config(mocks.app, host=host, port=port, log_level="warning", backlog=4096))
+
+    grpc_server = None
+    pems = self_signed_cert(cert_dir) if grpc_port else None
+    if grpc_port and pems is None:
+        logging.warning("openssl not found; the Gemini stand-in is disabled")
+    if pems:
+        import grpc
+        key, cert = pems
+        with open(key, "rb") as f_key, open(cert, "rb") as f_cert:
+            credentials = grpc.ssl_server_credentials([(f_key.read(), f_cert.read())])
+        grpc_server = grpc.aio.server()
+        grpc_server.add_generic_rpc_handlers((mocks.gemini_handler(), mocks.gemini_model_handler()))
+        grpc_server.add_secure_port(f"{host}:{grpc_port}", credentials)
+        await grpc_server.start()
+
+    for key, value in provider_env(host, port, grpc_port if pems else 0, pems[1] if pems else None).items():
+        print(f"export {key}={value}", flush=True)
+    try:
+        await server.serve()
+    finally:
+        if grpc_server is not None:
+            await grpc_server.stop(grace=1)
+
+
+def profile_arguments(parser: argparse.ArgumentParser):
+    """Options shared with the load generator, which passes them through"""
+    defaults = MockProfile()
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument("--latency-p99-ms", type=float, default=defaults.latency_p99_ms)
+    parser.add_argument("--tokens-per-second", type=float, default=defaults.tokens_per_second)
+    parser.add_argument("--output-tokens", type=int, default=defaults.output_tokens)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--throttle-rate", type=float, default=defaults.throttle_rate)
+
+
+def profile_from(args: argparse.Namespace) -> MockProfile:
+    return MockProfile(*(getattr(args, field) for field in MockProfile._fields))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--grpc-port", type=int, default=9101, help="Gemini gRPC port, 0 to disable")
+    parser.add_argument("--cert-dir", default=tempfile.gettempdir())
+    profile_arguments(parser)
+    args = parser.parse_args()
+
+    # Default event loop: grpc.aio doesn't reliably support uvloop
+    asyncio.run(serve(profile_from(args), args.host, args.port, args.grpc_port, args.cert_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,14 @@
 import uvicorn
 import logging
-from serverRouter.router import app
-import os #added to get env variable
 
-# Configure logging, and the logging file
+# Configure logging before the router does, so it goes to the log file
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', filename="server.log")  # Add filename to log to a file
 
-print("server OMNI_API KEY is:", os.getenv("OMNI_API_KEY"))
+from serverRouter.router import app
 
+# Single-process development server; use `python -m serverRouter.serve` in production
 if __name__ == "__main__":
     try:
         uvicorn.run(app, host="0.0.0.0", port=8000)
     except Exception as e:
         logging.exception("Exception during server startup:")
-
-print("server.py executed") #print to show server has executed
\ No newline at end of file
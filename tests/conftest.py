@@ -0,0 +1,104 @@
+import asyncio
+import os
+import tempfile
+
+import httpx
+import pytest
+
+# The router reads its configuration at import time: no real credentials,
+# no background tasks and nothing written to the working directory
+_STATE_DIR = tempfile.mkdtemp(prefix="omni-tests-")
+for _name in ("OPENAI_API_KEY", "ANTHROPIC_API_KEY", "GEMINI_API_KEY", "DEEPSEEK_API_KEY"):
+    os.environ.setdefault(_name, "test")
+os.environ.update(
+    OMNI_CACHE_ENABLED="0",
+    OMNI_WARMUP="0",
+    OMNI_MODELS_RELOAD_INTERVAL="0",
+    OMNI_CIRCUIT_PROBE_INTERVAL="0",
+    OMNI_IMAGE_JOB_DIR=os.path.join(_STATE_DIR, "jobs"),
+)
+os.environ.pop("OMNI_API_KEYS_FILE", None)
+
+from serverRouter.core.circuit import CircuitBreakerRegistry
+from serverRouter.core.coalescing import SingleFlight
+from serverRouter.core.concurrency import LimiterRegistry
+from serverRouter.core.datamodels import ChatCompletionChunk, ChatCompletionResponse, ModelProvider
+from serverRouter.core.exceptions import ProviderError
+from serverRouter.core.hedging import LatencyTracker
+from serverRouter.core.retry import RetryPolicy
+from serverRouter.core.routing import RoutingEngine
+
+DEV_KEY = "test-sk1o83e"
+
+
+class FakeChatProvider:
+    """
+    Stand-in chat provider. Each call is recorded and takes `delay`
+    seconds, bounded by the timeout the router passes, like a real SDK.
+    Calls raise the next exception in `errors`, if any are left.
+    """
+
+    def __init__(self, delay: float = 0.0, content: str = "ok", usage=None):
+        self.delay = delay
+        self.content = content
+        self.usage = usage or {"prompt_tokens": 10, "completion_tokens": 5}
+        self.errors = []
+        self.calls = []
+
+    async def chat_complete(self, request, timeout=None):
+        self.calls.append({"request": request, "timeout": timeout})
+        try:
+            await asyncio.wait_for(asyncio.sleep(self.delay), timeout)
+        except asyncio.TimeoutError as e:
+            raise ProviderError("fake upstream timed out", cause=e) from e
+        if self.errors:
+            raise self.errors.pop(0)
+        return ChatCompletionResponse(model=request.model, content=self.content, provider="fake", usage=self.usage)
+
+    async def chat_stream(self, request, timeout=None):
+        self.calls.append({"request": request, "timeout": timeout})
+        if self.errors:
+            raise self.errors.pop(0)
+        for piece in self.content:
+            await asyncio.sleep(self.delay / max(1, len(self.content)))
+            yield ChatCompletionChunk(model=request.model, provider="fake", delta=piece)
+        yield ChatCompletionChunk(model=request.model, provider="fake", finish_reason="stop", usage=self.usage)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def router(monkeypatch):
+    """The router module with fresh resilience state and no providers loaded"""
+    from serverRouter import router
+
+    monkeypatch.setattr(router.PROVIDERS, "_instances", {})
+    monkeypatch.setattr(router, "COALESCER", SingleFlight())
+    monkeypatch.setattr(router, "LIMITS", LimiterRegistry())
+    monkeypatch.setattr(router, "BREAKERS", CircuitBreakerRegistry())
+    monkeypatch.setattr(router, "ROUTING", RoutingEngine())
+    monkeypatch.setattr(router, "HEDGE_LATENCY", LatencyTracker())
+    monkeypatch.setattr(router, "RETRY", RetryPolicy(base_delay=0.01, max_delay=0.05))
+    return router
+
+
+@pytest.fixture
+def fake_chat(router):
+    """A FakeChatProvider serving every provider's models"""
+    provider = FakeChatProvider()
+    for name in ModelProvider:
+        router.PROVIDERS[name] = provider
+    return provider
+
+
+@pytest.fixture
+async def client(router):
+    """An HTTP client for the router app, authenticated with the dev key"""
+    transport = httpx.ASGITransport(app=router.app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://omni.test", headers={"Authorization": f"Bearer {DEV_KEY}"}
+    ) as client:
+        yield client
@@ -0,0 +1,90 @@
+import hashlib
+
+import httpx
+import pytest
+
+from serverRouter.core.auth import ApiKey, ApiKeyStore, KeyLimits, TokenBucket
+from serverRouter.core.exceptions import RateLimitExceededError
+
+
+def test_token_bucket_refills_and_goes_into_debt():
+    bucket = TokenBucket(rate=10, capacity=2)
+    bucket.updated = 0.0
+    assert bucket.take(2, now=0.0) == 0
+    assert bucket.take(1, now=0.0) == pytest.approx(0.1)
+    assert bucket.take(1, now=0.1) == 0
+    bucket.charge(5, now=0.1)
+    assert bucket.available(now=0.1) == -5
+    assert bucket.reset_after() == pytest.approx(0.7)
+
+
+def test_request_rate_allows_the_burst_then_refuses():
+    key = ApiKey("k", KeyLimits(requests_per_second=1, burst=2))
+    key.admit()
+    headers = key.admit()
+    assert headers["x-ratelimit-remaining-requests"] == "0"
+    with pytest.raises(RateLimitExceededError) as refused:
+        key.admit()
+    assert refused.value.status_code == 429
+    assert 0 < float(refused.value.headers["Retry-After"]) <= 1
+    assert key.rejected == 1
+
+
+def test_tokens_are_charged_after_the_fact_and_quotas_apply():
+    key = ApiKey("k", KeyLimits(tokens_per_minute=600, daily_spend_usd=1.0))
+    key.admit()
+    key.charge(1000, cost=0.5)
+    with pytest.raises(RateLimitExceededError, match="tokens per minute"):
+        key.admit()
+
+    key = ApiKey("k", KeyLimits(daily_spend_usd=1.0, daily_tokens=10_000))
+    key.charge(10, cost=1.0)
+    with pytest.raises(RateLimitExceededError, match="daily spend"):
+        key.admit()
+    assert key.snapshot()["spend_today_usd"] == 1.0
+
+
+def test_key_file_with_hashed_keys_and_env_defaults(tmp_path, monkeypatch):
+    monkeypatch.setenv("OMNI_RATE_LIMIT_RPS", "5")
+    monkeypatch.setenv("OMNI_QUOTA_DAILY_TOKENS", "0")
+    path = tmp_path / "keys.yaml"
+    digest = hashlib.sha256(b"sk-hashed").hexdigest()
+    path.write_text(
+        "keys:\n"
+        "  plain:\n    key: sk-plain\n    requests_per_second: 50\n"
+        f"  hashed:\n    key_sha256: {digest.upper()}\n"
+    )
+    store = ApiKeyStore.from_file(str(path))
+    assert store.lookup("sk-plain").limits.requests_per_second == 50
+    hashed = store.lookup("sk-hashed")
+    assert hashed.name == "hashed" and hashed.limits.requests_per_second == 5
+    assert hashed.limits.daily_tokens is None
+    assert store.lookup("sk-unknown") is None
+
+    path.write_text("keys:\n  broken:\n    requests_per_second: 1\n")
+    with pytest.raises(ValueError, match="needs key"):
+        ApiKeyStore.from_file(str(path))
+
+
+@pytest.mark.anyio
+async def test_router_enforces_limits_and_reports_usage(router, fake_chat, monkeypatch):
+    monkeypatch.setattr(router, "API_KEYS", ApiKeyStore({"sk-team": ApiKey("team", KeyLimits(requests_per_second=0.01, burst=1))}))
+    body = {"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}]}
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=router.app), base_url="http://omni.test",
+        headers={"Authorization": "Bearer sk-team"},
+    ) as client:
+        response = await client.post("/v1/chat/completions", json=body)
+        assert response.status_code == 200
+        assert response.headers["x-ratelimit-limit-requests"] == "1"
+
+        response = await client.post("/v1/chat/completions", json=body)
+        assert response.status_code == 429
+        assert "Retry-After" in response.headers
+
+        # Usage isn't rate limited
+        usage = (await client.get("/v1/usage")).json()
+        assert usage["tokens_today"] == 15 and usage["rejected"] == 1
+
+        response = await client.get("/v1/usage", headers={"Authorization": "Bearer sk-wrong"})
+        assert response.status_code == 401
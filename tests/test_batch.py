@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+import pytest
+
+from conftest import FakeChatProvider
+from serverRouter import batch
+from serverRouter.core.datamodels import ChatCompletionResponse, ModelProvider
+
+
+class EchoProvider(FakeChatProvider):
+    """Answers with the prompt; later lines finish first"""
+
+    async def chat_complete(self, request, timeout=None):
+        self.calls.append({"request": request, "timeout": timeout})
+        prompt = request.messages[-1].content
+        await asyncio.sleep(0.02 / (1 + int(prompt.split()[-1])))
+        return ChatCompletionResponse(model=request.model, content=prompt, provider="fake", usage=self.usage)
+
+
+@pytest.fixture
+def echo(router):
+    provider = EchoProvider()
+    for name in ModelProvider:
+        router.PROVIDERS[name] = provider
+    return provider
+
+
+def _write_input(path, n):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            body = {"model": "gpt-4o", "messages": [{"role": "user", "content": f"line {i}"}]}
+            f.write(json.dumps({"custom_id": f"req-{i}", "body": body}) + "\n")
+
+
+def _read_output(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.anyio
+async def test_output_follows_input_order(tmp_path, echo):
+    _write_input(tmp_path / "in.jsonl", 10)
+    await batch.run(str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"), concurrency=4)
+    results = _read_output(tmp_path / "out.jsonl")
+    assert [r["index"] for r in results] == list(range(10))
+    assert [r["custom_id"] for r in results] == [f"req-{i}" for i in range(10)]
+    assert [r["response"]["content"] for r in results] == [f"line {i}" for i in range(10)]
+
+
+@pytest.mark.anyio
+async def test_invalid_lines_are_reported_in_place(tmp_path, echo):
+    (tmp_path / "in.jsonl").write_text(
+        '{"model": "gpt-4o", "messages": [{"role": "user", "content": "line 0"}]}\n'
+        "not json\n"
+        "\n"
+        '{"model": "gpt-4o"}\n'
+    )
+    await batch.run(str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"))
+    results = _read_output(tmp_path / "out.jsonl")
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert results[0]["response"]["content"] == "line 0"
+    assert results[1]["error"]["status_code"] == 400
+    assert results[2]["error"]["status_code"] == 400
+
+
+@pytest.mark.anyio
+async def test_resume_drops_torn_tail_and_skips_completed_lines(tmp_path, echo):
+    _write_input(tmp_path / "in.jsonl", 6)
+    await batch.run(str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"))
+    full = (tmp_path / "out.jsonl").read_bytes()
+    lines = full.splitlines(keepends=True)
+
+    # A kill after three lines and half of the fourth, checkpointed after two
+    (tmp_path / "out.jsonl").write_bytes(b"".join(lines[:3]) + lines[3][:10])
+    checkpoint = batch.Checkpoint(str(tmp_path / "out.jsonl.ckpt"))
+    checkpoint.completed, checkpoint.output_bytes = 2, len(b"".join(lines[:2]))
+    checkpoint.save(str(tmp_path / "in.jsonl"))
+    echo.calls.clear()
+
+    await batch.run(str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"))
+    # The line written after the checkpoint is recovered, the torn one redone
+    assert [c["request"].messages[-1].content for c in echo.calls] == ["line 3", "line 4", "line 5"]
+    assert (tmp_path / "out.jsonl").read_bytes() == full
+
+
+@pytest.mark.anyio
+async def test_checkpoint_for_another_input_is_refused(tmp_path, echo):
+    _write_input(tmp_path / "in.jsonl", 2)
+    _write_input(tmp_path / "other.jsonl", 2)
+    await batch.run(str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"))
+    with pytest.raises(SystemExit, match="belongs to"):
+        await batch.run(str(tmp_path / "other.jsonl"), str(tmp_path / "out.jsonl"))
+
+
+@pytest.mark.anyio
+async def test_existing_output_is_not_overwritten_without_flag(tmp_path, echo):
+    _write_input(tmp_path / "in.jsonl", 3)
+    (tmp_path / "out.jsonl").write_text('{"index": 0, "precious": true}\n')
+    with pytest.raises(SystemExit, match="--overwrite"):
+        await batch.run(str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"))
+    assert "precious" in (tmp_path / "out.jsonl").read_text()
+    assert not echo.calls
+
+    (tmp_path / "out.jsonl").unlink()
+    await batch.run(str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"))
+    with pytest.raises(SystemExit, match="--overwrite"):
+        await batch.run(str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"), resume=False)
+
+    await batch.run(str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"), resume=False, overwrite=True)
+    assert [r["index"] for r in _read_output(tmp_path / "out.jsonl")] == [0, 1, 2]
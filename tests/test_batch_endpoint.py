@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+import pytest
+
+from conftest import FakeChatProvider
+from serverRouter.core.datamodels import ChatCompletionResponse, ModelProvider
+
+pytestmark = pytest.mark.anyio
+
+
+def _item(content, model="gpt-4o", **options):
+    return {"model": model, "messages": [{"role": "user", "content": content}], **options}
+
+
+class GaugedProvider(FakeChatProvider):
+    """Tracks the most calls in flight at once; a prompt of "slow" takes 10x longer"""
+
+    def __init__(self, delay):
+        super().__init__(delay=delay)
+        self.in_flight = self.max_in_flight = 0
+
+    async def chat_complete(self, request, timeout=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            prompt = request.messages[-1].content
+            await asyncio.sleep(self.delay * (10 if prompt == "slow" else 1))
+            return ChatCompletionResponse(model=request.model, content=prompt, provider="fake", usage=self.usage)
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture
+def gauged(router):
+    provider = GaugedProvider(delay=0.02)
+    for name in ModelProvider:
+        router.PROVIDERS[name] = provider
+    return provider
+
+
+async def test_results_are_in_order_with_errors_per_item(client, gauged):
+    response = await client.post("/v1/chat/completions/batch", json={"requests": [
+        _item("slow"), _item("x", model="no-such-model"), _item("fast"),
+    ]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert results[0]["response"]["content"] == "slow"
+    assert results[1]["error"]["status_code"] == 400
+    assert results[2]["response"]["content"] == "fast"
+
+
+async def test_fan_out_is_bounded_per_provider(client, router, gauged, monkeypatch):
+    monkeypatch.setattr(router, "BATCH_PROVIDER_PARALLELISM", 2)
+    response = await client.post("/v1/chat/completions/batch", json={"requests": [_item(f"q{i}") for i in range(6)]})
+    assert all("response" in result for result in response.json()["results"])
+    assert gauged.max_in_flight == 2
+
+
+async def test_stream_yields_results_in_completion_order(client, gauged):
+    response = await client.post(
+        "/v1/chat/completions/batch", json={"requests": [_item("slow"), _item("fast")], "stream": True}
+    )
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["index"] for line in lines] == [1, 0]
+
+
+async def test_batch_deadline_fails_only_unfinished_items(client, gauged):
+    response = await client.post(
+        "/v1/chat/completions/batch",
+        json={"requests": [_item("slow"), _item("fast")]},
+        headers={"X-Request-Timeout": "0.1"},
+    )
+    results = response.json()["results"]
+    assert results[0]["error"]["status_code"] == 504
+    assert results[1]["response"]["content"] == "fast"
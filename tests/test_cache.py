@@ -0,0 +1,82 @@
+import multiprocessing
+import os
+
+import pytest
+
+from serverRouter.core.cache import DiskCache, ResponseCache, request_cache_key
+from serverRouter.core.datamodels import ChatCompletionRequest, ChatCompletionResponse
+
+
+def _request(text="hi", **options):
+    return ChatCompletionRequest(model="gpt-4o", messages=[{"role": "user", "content": text}], **options)
+
+
+def _response(content="ok"):
+    return ChatCompletionResponse(model="gpt-4o", content=content, provider="openai")
+
+
+def test_cache_key_ignores_transport_options_only():
+    assert request_cache_key(_request()) == request_cache_key(_request(stream=True))
+    assert request_cache_key(_request()) != request_cache_key(_request(temperature=0.5))
+    assert request_cache_key(_request()) != request_cache_key(_request("hello"))
+
+
+@pytest.mark.anyio
+async def test_disk_tier_survives_restart_and_is_promoted(tmp_path):
+    cache = ResponseCache(maxsize=4, ttl=60, disk_dir=str(tmp_path))
+    await cache.set("k", _response("cached"))
+
+    restarted = ResponseCache(maxsize=4, ttl=60, disk_dir=str(tmp_path))
+    assert (await restarted.get("k")).content == "cached"
+    assert (await restarted.get("k")).content == "cached"
+    assert restarted.snapshot()["disk_hits"] == 1
+    assert restarted.snapshot()["memory_hits"] == 1
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl=-1)
+    cache.set("k", _response())
+    assert cache.get("k") is None
+    assert not os.path.exists(tmp_path / "k.json")
+
+
+def test_eviction_keeps_the_tier_bounded(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl=60, max_entries=10)
+    for i in range(25):
+        cache.set(f"k{i}", _response(str(i)))
+    assert len(cache) <= 10
+    assert cache.get("k24").content == "24"
+
+
+def test_workers_sharing_a_directory_see_each_others_changes(tmp_path):
+    first = DiskCache(str(tmp_path), ttl=60, max_entries=10)
+    second = DiskCache(str(tmp_path), ttl=60, max_entries=10)
+    first.set("a", _response("from first"))
+    assert second.get("a").content == "from first"
+
+    # Evictions compact the index; the peer reloads it instead of trusting its stale copy
+    for i in range(20):
+        second.set(f"k{i}", _response(str(i)))
+    assert first.get("k19").content == "19"
+    assert len(first) == len(second) <= 10
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def _write_entries(directory, worker, count):
+    cache = DiskCache(directory, ttl=60)
+    for i in range(count):
+        cache.set(f"w{worker}-{i}", _response(f"{worker}:{i}"))
+
+
+def test_concurrent_processes_keep_every_entry(tmp_path):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_write_entries, args=(str(tmp_path), worker, 50)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+    cache = DiskCache(str(tmp_path), ttl=60)
+    assert len(cache) == 200
+    assert cache.get("w3-49").content == "3:49"
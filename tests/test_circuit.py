@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from conftest import FakeChatProvider
+from serverRouter.core import circuit
+from serverRouter.core.circuit import CircuitBreaker, CircuitBreakerRegistry, CircuitState, failure_kind
+from serverRouter.core.datamodels import ModelProvider
+from serverRouter.core.exceptions import CapacityExceededError, CircuitOpenError, ProviderError
+
+
+class Upstream(Exception):
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit.time, "monotonic", clock)
+    return clock
+
+
+def test_only_upstream_health_signals_count():
+    assert failure_kind(ProviderError("t", cause=asyncio.TimeoutError())) == "timeout"
+    assert failure_kind(ProviderError("5xx", cause=Upstream(502))) == "failure"
+    assert failure_kind(ProviderError("429", cause=Upstream(429))) == "failure"
+    assert failure_kind(ProviderError("bad request", cause=Upstream(400))) is None
+    assert failure_kind(CapacityExceededError("p", "queue full")) is None
+    assert failure_kind(ValueError("parse error")) is None
+
+
+def test_breaker_opens_half_opens_and_backs_off(clock):
+    breaker = CircuitBreaker("p", min_calls=4, failure_threshold=0.5, open_seconds=10, max_open_seconds=30)
+    for kind in (None, None, "failure"):
+        breaker.record(kind)
+    assert breaker.state == CircuitState.CLOSED
+    breaker.record("failure")
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.allow() and breaker.is_open()
+
+    clock.now += 10
+    assert breaker.allow()          # the one trial call
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record("failure")
+    assert breaker.state == CircuitState.OPEN and breaker.open_seconds == 20
+
+    clock.now += 20
+    assert breaker.allow()
+    breaker.record(None)
+    assert breaker.state == CircuitState.CLOSED and breaker.open_seconds == 10
+
+
+def test_timeouts_open_the_breaker_sooner(clock):
+    breaker = CircuitBreaker("p", min_calls=4, timeout_threshold=0.25)
+    for kind in (None, None, None, "timeout"):
+        breaker.record(kind)
+    assert breaker.state == CircuitState.OPEN
+
+
+def test_old_outcomes_leave_the_window(clock):
+    breaker = CircuitBreaker("p", window=30, min_calls=4)
+    for _ in range(3):
+        breaker.record("failure")
+    clock.now += 31
+    breaker.record("failure")
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.snapshot()["window_calls"] == 1
+
+
+def test_guard_records_in_every_breaker_and_ignores_local_rejections(clock):
+    registry = CircuitBreakerRegistry(min_calls=1, open_seconds=10)
+    with pytest.raises(CapacityExceededError):
+        with registry.guard("model:m", "provider:p"):
+            raise CapacityExceededError("p", "queue full")
+    assert registry.degraded() == {}
+
+    with pytest.raises(ProviderError):
+        with registry.guard("model:m", "provider:p"):
+            raise ProviderError("down", cause=Upstream(503))
+    assert set(registry.degraded()) == {"model:m", "provider:p"}
+    with pytest.raises(CircuitOpenError) as refused:
+        with registry.guard("model:m", "provider:p"):
+            pass
+    assert refused.value.headers["Retry-After"] == "10"
+
+
+@pytest.mark.anyio
+async def test_probes_close_healthy_circuits(clock):
+    registry = CircuitBreakerRegistry(min_calls=1, open_seconds=10)
+    for key in ("provider:up", "provider:down", "model:m"):
+        registry.get(key).record("failure")
+    clock.now += 5
+
+    async def check(key):
+        if key == "model:m":
+            return None
+        if key == "provider:down":
+            raise ConnectionError("still down")
+        return True
+
+    await registry.probe(check)
+    assert registry.get("provider:up").state == CircuitState.CLOSED
+    down = registry.get("provider:down")
+    assert down.state == CircuitState.OPEN and down.retry_after() == 10
+    assert down.stats["probe_failures"] == 1
+    assert registry.get("model:m").stats["probes"] == 0
+
+
+@pytest.mark.anyio
+async def test_router_reroutes_around_and_fails_fast_on_open_circuits(client, router, fake_chat):
+    for _ in range(10):  # OMNI_CIRCUIT_MIN_CALLS
+        router.BREAKERS.get("provider:openai").record("failure")
+    assert router.BREAKERS.is_open("provider:openai")
+
+    gemini = FakeChatProvider(content="gemini")
+    router.PROVIDERS[ModelProvider.GEMINI] = gemini
+    messages = [{"role": "user", "content": "hi"}]
+
+    response = await client.post("/v1/chat/completions", json={"model": "fast-chat", "messages": messages})
+    assert response.json()["content"] == "gemini"
+
+    response = await client.post("/v1/chat/completions", json={"model": "gpt-4o", "messages": messages})
+    assert response.status_code == 503 and "Retry-After" in response.headers
+    assert not fake_chat.calls
+
+    listing = (await client.get("/v1/models/chat", params={"provider": "openai"})).json()["models"]
+    assert {model["circuit"] for model in listing} == {"open"}
@@ -0,0 +1,117 @@
+import io
+import json
+
+import httpx
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from clientLib import APIClient, AsyncAPIClient
+from clientLib._common import ModelListCache, StreamDone, parse_sse_line
+from conftest import DEV_KEY
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def test_sse_lines():
+    assert parse_sse_line("") is None
+    assert parse_sse_line(": keep-alive") is None
+    assert parse_sse_line('data: {"delta": "a"}') == {"delta": "a"}
+    with pytest.raises(StreamDone):
+        parse_sse_line("data: [DONE]")
+    with pytest.raises(RuntimeError, match="boom"):
+        parse_sse_line('data: {"error": "boom"}')
+
+
+def test_model_list_cache_revalidates_after_ttl():
+    cache = ModelListCache(ttl=0)
+    assert cache.conditional_headers("v1/models") == {}
+    cache.store("v1/models", '"abc"', [{"id": "m"}])
+    assert cache.fresh("v1/models") is None
+    assert cache.conditional_headers("v1/models") == {"If-None-Match": '"abc"'}
+    assert cache.not_modified("v1/models") == [{"id": "m"}]
+
+
+class FakeAdapter(BaseAdapter):
+    """Answers requests from a handler instead of the network"""
+
+    def __init__(self, handler):
+        super().__init__()
+        self.handler = handler
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        status, headers, body = self.handler(request)
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.raw = io.BytesIO(body)
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+def test_sync_client_reuses_one_session_and_parses_streams():
+    def handler(request):
+        if request.url.endswith("/v1/models"):
+            if request.headers.get("If-None-Match") == '"v1"':
+                return 304, {}, b""
+            return 200, {"ETag": '"v1"'}, json.dumps({"models": [{"id": "m"}]}).encode()
+        payload = json.loads(request.body)
+        if payload.get("stream"):
+            body = b'data: {"delta": "a"}\n\ndata: {"delta": "b"}\n\ndata: [DONE]\n\n'
+            return 200, {"Content-Type": "text/event-stream; charset=utf-8"}, body
+        return 200, {}, json.dumps({"content": "ok"}).encode()
+
+    adapter = FakeAdapter(handler)
+    with APIClient(api_key="k", base_url="http://omni.test", models_ttl=0) as client:
+        client._session.mount("http://", adapter)
+        assert client.chat(MESSAGES, "gpt-4o") == {"content": "ok"}
+        assert [chunk["delta"] for chunk in client.chat_stream(MESSAGES, "gpt-4o")] == ["a", "b"]
+        assert client.get_available_models() == [{"id": "m"}]
+        assert client.get_available_models() == [{"id": "m"}]
+    assert all(request.headers["Authorization"] == "Bearer k" for request in adapter.requests)
+    assert adapter.requests[-1].headers["If-None-Match"] == '"v1"'
+
+
+@pytest.fixture
+async def async_client(router, fake_chat):
+    statuses = []
+
+    async def record(response):
+        statuses.append(response.status_code)
+
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=router.app), event_hooks={"response": [record]})
+    async with AsyncAPIClient(api_key=DEV_KEY, base_url="http://omni.test", models_ttl=0, http_client=http_client) as client:
+        client.statuses = statuses
+        yield client
+    # A passed-in pool belongs to the caller
+    assert not http_client.is_closed
+    await http_client.aclose()
+
+
+@pytest.mark.anyio
+async def test_async_client_against_the_router(async_client, fake_chat):
+    fake_chat.content = "hi"
+    assert (await async_client.chat(MESSAGES, "gpt-4o"))["content"] == "hi"
+
+    chunks = [chunk async for chunk in async_client.chat_stream(MESSAGES, "gpt-4o")]
+    assert "".join(chunk.get("delta", "") for chunk in chunks) == "hi"
+    assert chunks[-1]["finish_reason"] == "stop"
+
+    results = await async_client.chat_batch([{"model": "gpt-4o", "messages": MESSAGES}] * 2)
+    assert [result["index"] for result in results] == [0, 1]
+
+
+@pytest.mark.anyio
+async def test_async_client_revalidates_model_lists(async_client):
+    first = await async_client.get_available_models("chat")
+    assert any(model["id"] == "gpt-4o" for model in first)
+    assert await async_client.get_available_models("chat") == first
+    assert async_client.statuses == [200, 304]
+
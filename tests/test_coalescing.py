@@ -0,0 +1,159 @@
+import asyncio
+
+import pytest
+
+from serverRouter.core.coalescing import SingleFlight, WaitTimeout
+from serverRouter.core.deadline import RequestScope, current_scope
+from serverRouter.core.exceptions import DeadlineExceededError
+
+pytestmark = pytest.mark.anyio
+
+
+def _counting_call(calls, delay=0.1, result="done"):
+    async def call():
+        calls.append(current_scope())
+        await asyncio.sleep(delay)
+        return result
+    return call
+
+
+async def test_concurrent_callers_share_one_call():
+    flights, calls = SingleFlight(), []
+    call = _counting_call(calls)
+    results = await asyncio.gather(*(flights.do("k", call) for _ in range(5)))
+    assert len(calls) == 1
+    assert [result for result, _ in results] == ["done"] * 5
+    assert [shared for _, shared in results] == [False, True, True, True, True]
+    assert flights.snapshot()["in_flight"] == 0
+
+
+async def test_shared_call_runs_outside_the_starting_request_scope():
+    flights, calls = SingleFlight(), []
+
+    async def leader():
+        RequestScope(timeout=5, requested=True)
+        return await flights.do("k", _counting_call(calls, delay=0))
+
+    assert await asyncio.create_task(leader()) == ("done", False)
+    assert calls == [None]
+
+
+async def test_leader_deadline_does_not_fail_joiners():
+    flights, calls = SingleFlight(), []
+    call = _counting_call(calls, delay=0.2)
+
+    async def leader():
+        scope = RequestScope(timeout=0.05, requested=True)
+        with scope.armed():
+            return await flights.do("k", call, timeout=scope.remaining())
+
+    leading = asyncio.create_task(leader())
+    await asyncio.sleep(0)
+    joined = asyncio.create_task(flights.do("k", call))
+    with pytest.raises(DeadlineExceededError):
+        await leading
+    assert await joined == ("done", True)
+    assert len(calls) == 1
+
+
+async def test_leader_cancellation_keeps_the_call_for_joiners():
+    flights, calls = SingleFlight(), []
+    call = _counting_call(calls, delay=0.1)
+    leading = asyncio.create_task(flights.do("k", call))
+    await asyncio.sleep(0)
+    joined = asyncio.create_task(flights.do("k", call))
+    await asyncio.sleep(0.02)
+    leading.cancel()
+    assert await joined == ("done", True)
+    assert len(calls) == 1
+
+
+async def test_joiner_timeout_is_its_own():
+    flights, calls = SingleFlight(), []
+    call = _counting_call(calls, delay=0.1)
+    leading = asyncio.create_task(flights.do("k", call))
+    await asyncio.sleep(0)
+    with pytest.raises(WaitTimeout):
+        await flights.do("k", call, timeout=0.01)
+    assert await leading == ("done", False)
+
+
+async def test_call_is_cancelled_when_every_caller_leaves():
+    flights, started, cancelled = SingleFlight(), asyncio.Event(), asyncio.Event()
+
+    async def call():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    callers = [asyncio.create_task(flights.do("k", call)) for _ in range(2)]
+    await started.wait()
+    for caller in callers:
+        caller.cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert flights.snapshot()["in_flight"] == 0
+
+
+async def test_call_errors_reach_every_caller():
+    flights = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(*(flights.do("k", call) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+async def _chunks(n, delay=0.01):
+    for i in range(n):
+        await asyncio.sleep(delay)
+        yield i
+
+
+async def test_late_stream_subscriber_replays_from_the_start():
+    flights = SingleFlight()
+    first, shared = flights.stream("k", lambda: _chunks(5))
+    assert not shared
+    received = [await first.__anext__(), await first.__anext__()]
+    late, shared = flights.stream("k", lambda: _chunks(5))
+    assert shared
+    received += [chunk async for chunk in first]
+    assert received == [0, 1, 2, 3, 4]
+    assert [chunk async for chunk in late] == [0, 1, 2, 3, 4]
+
+
+async def test_stream_source_runs_outside_the_starting_request_scope():
+    flights, scopes = SingleFlight(), []
+
+    async def source():
+        scopes.append(current_scope())
+        yield 1
+
+    async def leader():
+        RequestScope(timeout=5)
+        chunks, _ = flights.stream("k", source)
+        return [chunk async for chunk in chunks]
+
+    assert await asyncio.create_task(leader()) == [1]
+    assert scopes == [None]
+
+
+async def test_stream_closes_when_last_subscriber_leaves():
+    flights, closed = SingleFlight(), asyncio.Event()
+
+    async def source():
+        try:
+            while True:
+                await asyncio.sleep(0.01)
+                yield 1
+        finally:
+            closed.set()
+
+    chunks, _ = flights.stream("k", source)
+    await chunks.__anext__()
+    await chunks.aclose()
+    await asyncio.wait_for(closed.wait(), 1)
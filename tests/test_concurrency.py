@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from serverRouter.core.concurrency import AdaptiveLimiter, LimiterRegistry
+from serverRouter.core.exceptions import CapacityExceededError, ProviderError
+
+
+class Throttled(Exception):
+    status_code = 429
+
+
+def test_congestion_halves_the_limit_once_per_cooldown():
+    limiter = AdaptiveLimiter("p", initial_limit=32, cooldown=60)
+    for _ in range(3):
+        limiter.in_flight += 1
+        limiter.release(congested=True)
+    assert limiter.limit == 16
+    assert limiter.stats["throttled"] == 3
+
+
+def test_successes_under_load_grow_the_limit_additively():
+    limiter = AdaptiveLimiter("p", initial_limit=4, max_limit=5)
+    for _ in range(4):
+        limiter.in_flight = 4
+        limiter.release(succeeded=True)
+    assert limiter.limit == pytest.approx(5.0, abs=0.1)
+    # An idle limiter doesn't grow
+    limiter.limit = 4
+    limiter.in_flight = 1
+    limiter.release(succeeded=True)
+    assert limiter.limit == 4
+
+
+def test_sustained_latency_rise_trims_the_limit():
+    limiter = AdaptiveLimiter("p", initial_limit=10, latency_window=5, cooldown=0)
+    for _ in range(25):
+        limiter.in_flight = 1
+        limiter.release(succeeded=True, latency=0.1)
+    limiter.in_flight = 1
+    limiter.release(succeeded=True, latency=5.0)  # one slow call doesn't count
+    assert limiter.stats["latency_decreases"] == 0
+    for _ in range(4):
+        limiter.in_flight = 1
+        limiter.release(succeeded=True, latency=0.5)
+    assert limiter.stats["latency_decreases"] == 1
+    assert limiter.limit == pytest.approx(9.0, abs=0.1)
+
+
+@pytest.mark.anyio
+async def test_waiters_are_admitted_in_order_and_the_queue_is_bounded():
+    limiter = AdaptiveLimiter("p", initial_limit=1, max_queue=2, queue_timeout=1)
+    await limiter.acquire()
+    order = []
+
+    async def wait(name):
+        await limiter.acquire()
+        order.append(name)
+
+    waiters = [asyncio.create_task(wait(name)) for name in ("a", "b")]
+    await asyncio.sleep(0)
+    with pytest.raises(CapacityExceededError, match="queue full"):
+        await limiter.acquire()
+    limiter.release()
+    await asyncio.sleep(0)
+    limiter.release()
+    await asyncio.gather(*waiters)
+    assert order == ["a", "b"]
+    assert limiter.in_flight == 1
+
+
+@pytest.mark.anyio
+async def test_queue_timeout_and_cancelled_waiters_leave_no_slot_behind():
+    limiter = AdaptiveLimiter("p", initial_limit=1, queue_timeout=0.02)
+    await limiter.acquire()
+    with pytest.raises(CapacityExceededError, match="no slot"):
+        await limiter.acquire()
+
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    limiter.release()
+    assert limiter.in_flight == 0 and limiter.queue_depth == 0
+
+
+@pytest.mark.anyio
+async def test_registry_feeds_outcomes_back_to_every_limiter():
+    registry = LimiterRegistry(initial_limit=8, cooldown=60)
+    with pytest.raises(ProviderError):
+        async with registry.admit("provider", "model"):
+            raise ProviderError("throttled", cause=Throttled())
+    assert registry.get("provider").limit == 4 and registry.get("model").limit == 4
+
+    with pytest.raises(ValueError):
+        async with registry.admit("provider", "model"):
+            raise ValueError("not congestion")
+    assert registry.get("provider").limit == 4
+    assert registry.get("provider").in_flight == registry.get("model").in_flight == 0
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from serverRouter.core.deadline import UPSTREAM_GRACE, RequestScope, current_scope, detached_context, request_timeout
+from serverRouter.core.exceptions import ClientDisconnectedError, DeadlineExceededError
+
+
+def test_request_timeout_sources():
+    assert request_timeout({}, None) is None
+    assert request_timeout({"x-request-timeout": "5"}, 10) == 5
+    assert request_timeout({"x-request-timeout": "5"}, 2) == 2
+    assert request_timeout({}, None, default=30) == 30
+    assert request_timeout({}, 900, maximum=600) == 600
+    for bad in ("soon", "0"):
+        with pytest.raises(HTTPException) as invalid:
+            request_timeout({"x-request-timeout": bad})
+        assert invalid.value.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_deadline_cancels_the_armed_block():
+    scope = RequestScope(0.05)
+    cancelled = []
+    with pytest.raises(DeadlineExceededError):
+        with scope.armed():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+    assert cancelled
+    scope.close()
+
+
+@pytest.mark.anyio
+async def test_unarmed_work_is_never_interrupted():
+    scope = RequestScope(0.02)
+    await asyncio.sleep(0.05)  # e.g. writing a chunk to the client
+    with pytest.raises(DeadlineExceededError):
+        with scope.armed():
+            pass
+    scope.close()
+
+
+@pytest.mark.anyio
+async def test_disconnect_cancels_the_armed_block():
+    disconnected = asyncio.Event()
+
+    async def receive():
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    scope = RequestScope(None, receive)
+
+    async def work():
+        with scope.armed():
+            await asyncio.sleep(1)
+
+    task = asyncio.create_task(work())
+    await asyncio.sleep(0.01)
+    disconnected.set()
+    with pytest.raises(ClientDisconnectedError):
+        await task
+    assert scope.cause() == "disconnect"
+    scope.close()
+
+
+@pytest.mark.anyio
+async def test_outside_cancellation_is_not_mistaken_for_the_deadline():
+    scope = RequestScope(10)
+
+    async def work():
+        with scope.armed():
+            await asyncio.sleep(1)
+
+    task = asyncio.create_task(work())
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    scope.close()
+
+
+@pytest.mark.anyio
+async def test_child_scopes_inherit_the_parent_deadline():
+    async def request():
+        parent = RequestScope(0.5, requested=True)
+        child = RequestScope(10)
+        assert child.parent is parent and child.requested
+        assert child.timeout <= 0.5
+        assert child.clamp(60) <= 0.5 + UPSTREAM_GRACE
+        assert detached_context().run(current_scope) is None
+        child.close()
+        parent.close()
+
+    # A fresh context, as for a real request
+    await asyncio.create_task(request())
+
+
+@pytest.mark.anyio
+async def test_router_answers_504_and_cancels_the_upstream_call(client, router, fake_chat):
+    fake_chat.delay = 1.0
+    body = {"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}]}
+    before = router.UPSTREAM_CANCELLED.labels("gpt-4o", "openai", "deadline").value
+
+    response = await client.post("/v1/chat/completions", json=body, headers={"X-Request-Timeout": "0.1"})
+    assert response.status_code == 504
+    # A client-set deadline gives the upstream call all of the time left
+    assert 0 < fake_chat.calls[0]["timeout"] <= 0.1 + UPSTREAM_GRACE
+    assert router.UPSTREAM_CANCELLED.labels("gpt-4o", "openai", "deadline").value == before + 1
+
+    response = await client.post("/v1/chat/completions", json={**body, "timeout": -1})
+    assert response.status_code in (400, 422)
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from conftest import FakeChatProvider
+from serverRouter.core.datamodels import ModelProvider
+from serverRouter.core.exceptions import ProviderError
+from serverRouter.core.hedging import LatencyTracker, hedged_call
+
+pytestmark = pytest.mark.anyio
+
+
+def _recorder(delays, errors=()):
+    """A call that sleeps per candidate, fails for those in errors, and logs starts and cancellations"""
+    log = []
+
+    async def call(candidate):
+        log.append(("start", candidate))
+        try:
+            await asyncio.sleep(delays[candidate])
+        except asyncio.CancelledError:
+            log.append(("cancelled", candidate))
+            raise
+        if candidate in errors:
+            raise ProviderError(f"{candidate} failed")
+        return candidate.upper()
+
+    return call, log
+
+
+async def test_without_hedge_delay_candidates_are_a_fallback_chain():
+    call, log = _recorder({"a": 0.05, "b": 0.0}, errors={"a"})
+    assert await hedged_call(["a", "b"], call, hedge_delay=None) == ("b", "B")
+    assert log == [("start", "a"), ("start", "b")]
+
+
+async def test_slow_attempt_is_hedged_and_the_loser_cancelled():
+    call, log = _recorder({"a": 1.0, "b": 0.01, "c": 0.0})
+    assert await hedged_call(["a", "b", "c"], call, hedge_delay=0.02, max_in_flight=2) == ("b", "B")
+    assert ("start", "c") not in log
+    await asyncio.sleep(0)  # cancellation lands on the loser's next step
+    assert ("cancelled", "a") in log
+
+
+async def test_all_failures_raise_the_last_error():
+    call, _ = _recorder({"a": 0.0, "b": 0.0}, errors={"a", "b"})
+    with pytest.raises(ProviderError, match="b failed"):
+        await hedged_call(["a", "b"], call, hedge_delay=0.01)
+
+
+def test_hedge_delay_is_the_p95_once_warm():
+    tracker = LatencyTracker(window=100, min_samples=20)
+    for i in range(19):
+        tracker.record("alias", i / 100)
+    assert tracker.hedge_delay("alias", default=1.5) == 1.5
+    for i in range(19, 100):
+        tracker.record("alias", i / 100)
+    assert tracker.hedge_delay("alias", default=1.5) == pytest.approx(0.95)
+
+
+async def test_alias_falls_through_to_the_next_member(client, router):
+    broken, working = FakeChatProvider(), FakeChatProvider(content="from gemini")
+    broken.errors = [ValueError("bad request") for _ in range(10)]
+    for name in ModelProvider:
+        router.PROVIDERS[name] = working
+    router.PROVIDERS[ModelProvider.OPENAI] = broken
+
+    response = await client.post(
+        "/v1/chat/completions", json={"model": "fast-chat", "messages": [{"role": "user", "content": "hi"}]}
+    )
+    assert response.status_code == 200
+    assert response.json()["content"] == "from gemini"
+    assert [call["request"].model for call in working.calls] == ["gemini-2.0-flash"]
@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import io
+
+import httpx
+import pytest
+from PIL import Image
+
+from serverRouter.core.image_store import ImageStore, sniff_image_type
+
+pytestmark = pytest.mark.anyio
+
+
+def _png(color=(255, 0, 0), size=(64, 48)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _client(images) -> httpx.AsyncClient:
+    """Serves images[path] at http://upstream.test/<path>"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = images.get(request.url.path.lstrip("/"))
+        return httpx.Response(200, content=body) if body is not None else httpx.Response(404)
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def _store(tmp_path, **options) -> ImageStore:
+    return ImageStore(str(tmp_path), max_bytes=options.pop("max_bytes", 10 * 1024 * 1024), thumbnail_workers=0, **options)
+
+
+def test_image_types_are_sniffed():
+    assert sniff_image_type(_png()) == "png"
+    assert sniff_image_type(b"\xff\xd8\xff\xe0") == "jpg"
+    assert sniff_image_type(b"<html>") is None
+
+
+async def test_images_are_stored_once_by_content(tmp_path):
+    red = _png()
+    store = _store(tmp_path)
+    async with _client({"a.png": red, "b.png": red}) as client:
+        first = await store.store(client, "http://upstream.test/a.png")
+        second = await store.store(client, "http://upstream.test/b.png")
+    assert first.name == f"{hashlib.sha256(red).hexdigest()}.png"
+    assert (first.deduplicated, second.deduplicated) == (False, True)
+    path, stat = await store.open(first.name)
+    assert open(path, "rb").read() == red
+    assert store.snapshot()["files"] == 1
+
+
+async def test_non_images_are_rejected(tmp_path):
+    store = _store(tmp_path)
+    async with _client({"page": b"<html>not an image</html>"}) as client:
+        results = await store.store_all(client, ["http://upstream.test/page", "http://upstream.test/missing"])
+    assert results == [None, None]
+    assert store.snapshot()["download_failures"] == 2
+
+
+async def test_least_recently_used_images_are_evicted(tmp_path):
+    images = {f"{i}.png": _png((i * 40, 0, 0), (256, 256)) for i in range(4)}
+    store = _store(tmp_path, max_bytes=sum(len(body) for body in images.values()) - 1)
+    async with _client(images) as client:
+        stored = [await store.store(client, f"http://upstream.test/{i}.png") for i in range(3)]
+        await store.open(stored[0].name)  # now the most recently used
+        await store.store(client, "http://upstream.test/3.png")
+    assert await store.open(stored[1].name) is None
+    assert await store.open(stored[0].name) is not None
+    assert store.total_bytes <= store.max_bytes
+
+
+async def test_thumbnails_are_rendered_once(tmp_path):
+    store = _store(tmp_path)
+    async with _client({"a.png": _png(size=(800, 600))}) as client:
+        stored = await store.store(client, "http://upstream.test/a.png")
+    results = await asyncio.gather(*(store.thumbnail(stored.name, 128) for _ in range(3)))
+    path, _ = results[0]
+    with Image.open(path) as thumbnail:
+        assert thumbnail.format == "WEBP" and max(thumbnail.size) == 128
+    assert store.snapshot()["thumbnails"] == 1
+    assert store.thumbnail_size(200) == 256 and store.thumbnail_size(4096) == 512
+
+
+async def test_cold_start_survives_a_cancelled_first_caller(tmp_path):
+    store = _store(tmp_path)
+    async with _client({"a.png": _png()}) as client:
+        stored = await store.store(client, "http://upstream.test/a.png")
+
+    restarted = _store(tmp_path)
+    scan = restarted._scan
+
+    def slow_scan():
+        import time
+        time.sleep(0.1)
+        return scan()
+
+    restarted._scan = slow_scan
+    first = asyncio.create_task(restarted.open(stored.name))
+    await asyncio.sleep(0.02)
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert await restarted.open(stored.name) is not None
+    assert restarted.snapshot()["files"] == 1
+
+
+async def test_failed_scan_is_retried(tmp_path):
+    store = _store(tmp_path)
+    scan, attempts = store._scan, []
+
+    def flaky_scan():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("disk not mounted yet")
+        return scan()
+
+    store._scan = flaky_scan
+    with pytest.raises(OSError):
+        await store.open("0" * 64 + ".png")
+    assert await store.open("0" * 64 + ".png") is None
+    assert len(attempts) == 2
+
+
+async def test_stored_images_are_served_with_ranges(tmp_path, monkeypatch, router, client):
+    body = _png(size=(300, 300))
+    store = _store(tmp_path)
+    monkeypatch.setattr(router, "IMAGE_STORE", store)
+    async with _client({"a.png": body}) as upstream:
+        stored = await store.store(upstream, "http://upstream.test/a.png")
+
+    url = f"/v1/images/files/{stored.name}"
+    full = await client.get(url)
+    assert full.status_code == 200 and full.content == body
+    assert full.headers["content-type"] == "image/png"
+    partial = await client.get(url, headers={"Range": "bytes=10-99"})
+    assert partial.status_code == 206
+    assert partial.content == body[10:100]
+    assert partial.headers["content-range"] == f"bytes 10-99/{len(body)}"
+    assert (await client.get(url, headers={"If-None-Match": full.headers["etag"]})).status_code == 304
+    assert (await client.get("/v1/images/files/" + "0" * 64 + ".png")).status_code == 404
@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from serverRouter.core.datamodels import ImageGenerationResponse, ImageJobStatus, ModelProvider
+from serverRouter.core.exceptions import CapacityExceededError
+from serverRouter.core.interfaces import ImageProvider
+from serverRouter.core.jobs import ImageJobStore
+
+
+class FakeImageProvider(ImageProvider):
+    """Returns one URL per call; later calls finish first. Calls listed in fail raise a 400."""
+
+    def __init__(self, delay: float = 0.02, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.requests = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def generate_image(self, request, timeout=None):
+        index = len(self.requests)
+        self.requests.append(request)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay / (index + 1))
+        finally:
+            self.in_flight -= 1
+        if index in self.fail:
+            raise HTTPException(status_code=400, detail=f"image {index} rejected")
+        return ImageGenerationResponse(urls=[f"https://img.test/{index}.png"], model=request.model, provider="openai")
+
+
+@pytest.fixture
+def images(router, monkeypatch, tmp_path):
+    monkeypatch.setattr(router, "IMAGE_SLOTS", {})
+    monkeypatch.setattr(router, "IMAGE_JOBS", ImageJobStore(str(tmp_path)))
+    provider = FakeImageProvider()
+    router.PROVIDERS[ModelProvider.OPENAI] = provider
+    return provider
+
+
+@pytest.mark.anyio
+async def test_requests_fan_out_into_single_images_in_order(client, images):
+    response = await client.post("/v1/images/generate", json={"prompt": "a cat", "model": "dall-e-3", "n": 8})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["urls"] == [f"https://img.test/{i}.png" for i in range(8)]
+    assert body["errors"] is None
+    assert [request.n for request in images.requests] == [1] * 8
+    # dall-e-3 sets max_concurrent_images: 5
+    assert images.peak == 5
+
+
+@pytest.mark.anyio
+async def test_failed_images_are_reported_alongside_the_rest(client, images):
+    images.fail = {1, 3}
+    response = await client.post("/v1/images/generate", json={"prompt": "a cat", "model": "dall-e-2", "n": 4})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["urls"] == ["https://img.test/0.png", "https://img.test/2.png"]
+    assert [(error["index"], error["status_code"]) for error in body["errors"]] == [(1, 400), (3, 400)]
+
+
+@pytest.mark.anyio
+async def test_all_images_failing_raises_the_first_error(client, images):
+    images.fail = {0, 1}
+    response = await client.post("/v1/images/generate", json={"prompt": "a cat", "model": "dall-e-2", "n": 2})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "image 0 rejected"
+
+
+async def _wait_for(client, location):
+    for _ in range(100):
+        job = (await client.get(location)).json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job still {job['status']}")
+
+
+@pytest.mark.anyio
+async def test_background_jobs_return_at_once_and_are_polled(client, images):
+    response = await client.post(
+        "/v1/images/generate", json={"prompt": "a cat", "model": "dall-e-2", "n": 3, "background": True}
+    )
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued" and job["n"] == 3
+    assert response.headers["location"] == f"/v1/images/jobs/{job['id']}"
+
+    job = await _wait_for(client, response.headers["location"])
+    assert job["status"] == "succeeded"
+    assert job["completed"] == 3
+    assert len(job["result"]["urls"]) == 3
+
+    assert (await client.get("/v1/images/jobs/imgjob_missing")).status_code == 404
+    assert (await client.get("/v1/images/jobs/..%2Fsecrets")).status_code == 404
+
+
+@pytest.mark.anyio
+async def test_failed_background_jobs_keep_the_error(client, images):
+    images.fail = {0}
+    response = await client.post(
+        "/v1/images/generate", json={"prompt": "a cat", "model": "dall-e-2", "n": 1, "background": True}
+    )
+    job = await _wait_for(client, response.headers["location"])
+    assert job["status"] == "failed"
+    assert job["error"] == {"status_code": 400, "detail": "image 0 rejected"}
+
+
+@pytest.mark.anyio
+async def test_job_store_owners_capacity_and_shutdown(tmp_path):
+    store = ImageJobStore(str(tmp_path), max_running=1)
+    release = asyncio.Event()
+
+    async def work(progress):
+        progress()
+        await release.wait()
+        return ImageGenerationResponse(urls=["u"], model="m", provider="p")
+
+    job = await store.submit("alice", "m", 2, work)
+    # Jobs are only visible to the key that created them
+    assert await store.get(job.id, "bob") is None
+    with pytest.raises(CapacityExceededError):
+        await store.submit("alice", "m", 1, work)
+
+    await asyncio.sleep(0.05)
+    running = await store.get(job.id, "alice")
+    assert running.status == ImageJobStatus.RUNNING and running.completed == 1
+
+    # A job cut off by shutdown is recorded as failed, not left running
+    await store.aclose()
+    stopped = await store.get(job.id, "alice")
+    assert stopped.status == ImageJobStatus.FAILED and stopped.error.status_code == 503
+    assert store.snapshot()["rejected"] == 1
+
+
+@pytest.mark.anyio
+async def test_job_store_expires_jobs(tmp_path):
+    store = ImageJobStore(str(tmp_path), ttl=0.05)
+
+    async def work(progress):
+        return ImageGenerationResponse(urls=["u"], model="m", provider="p")
+
+    job = await store.submit("alice", "m", 1, work)
+    await asyncio.sleep(0.01)
+    assert (await store.get(job.id, "alice")).status == ImageJobStatus.SUCCEEDED
+    await asyncio.sleep(0.06)
+    assert await store.get(job.id, "alice") is None
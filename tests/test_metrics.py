@@ -0,0 +1,63 @@
+import re
+
+import pytest
+
+from serverRouter.core.metrics import MetricsRegistry
+
+
+def _sample(text, line_prefix):
+    """Value of the sample line starting with line_prefix, 0 if absent"""
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_text_format_rendering():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("model",))
+    requests.labels('we"ird\n').inc(2)
+    registry.gauge("in_flight", "In flight").labels().set(3)
+    latency = registry.histogram("latency_seconds", "Latency", ("model",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        latency.labels("m").observe(value)
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{model="we\\"ird\\n"} 2' in text
+    assert "in_flight 3" in text
+    assert 'latency_seconds_bucket{model="m",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{model="m",le="1"} 2' in text
+    assert 'latency_seconds_bucket{model="m",le="+Inf"} 3' in text
+    assert 'latency_seconds_sum{model="m"} 5.55' in text
+    assert 'latency_seconds_count{model="m"} 3' in text
+    assert text.endswith("\n")
+
+
+def test_label_count_and_duplicate_names_are_checked():
+    registry = MetricsRegistry()
+    counter = registry.counter("c_total", "C", ("a", "b"))
+    with pytest.raises(ValueError):
+        counter.labels("only-one")
+    with pytest.raises(ValueError):
+        registry.gauge("c_total", "again")
+
+
+@pytest.mark.anyio
+async def test_endpoint_counts_requests_and_bounds_label_values(client, fake_chat):
+    before = (await client.get("/metrics")).text
+    body = {"messages": [{"role": "user", "content": "hi"}]}
+    await client.post("/v1/chat/completions", json={**body, "model": "gpt-4o"})
+    await client.post("/v1/chat/completions", json={**body, "model": "made-up-model"})
+
+    response = await client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    after = response.text
+    ok = 'omni_chat_requests_total{model="gpt-4o",stream="false",status="200"}'
+    unknown = 'omni_chat_requests_total{model="unknown",stream="false",status="400"}'
+    assert _sample(after, ok) == _sample(before, ok) + 1
+    assert _sample(after, unknown) == _sample(before, unknown) + 1
+    assert "made-up-model" not in after
+    latency = 'omni_upstream_duration_seconds_count{model="gpt-4o",provider="openai"}'
+    assert _sample(after, latency) == _sample(before, latency) + 1
+    assert re.search(r'omni_tokens_total\{model="gpt-4o",provider="openai",direction="output"\} \d+', after)
@@ -0,0 +1,86 @@
+import httpx
+import openai
+import anthropic
+import pytest
+
+from serverRouter.core.datamodels import ChatCompletionRequest
+from serverRouter.providers.anthropic.provider import AnthropicProvider
+from serverRouter.providers.openai.provider import OpenAIProvider
+from testLib import loadgen
+from testLib.mock_providers import MockProfile, MockProviders, provider_env
+
+INSTANT = MockProfile(latency_ms=0, latency_p99_ms=0, tokens_per_second=1000, output_tokens=5)
+REQUEST = ChatCompletionRequest(model="m", max_tokens=16, messages=[{"role": "user", "content": "hi"}])
+
+
+def test_profile_draws(monkeypatch):
+    assert MockProfile(latency_ms=300, latency_p99_ms=300).latency() == 0.3
+    assert sum(tokens for tokens, _ in MockProfile(tokens_per_second=80, output_tokens=61).stream_steps()) == 61
+    profile = MockProfile(error_rate=0.1, throttle_rate=0.2)
+    for draw, status in ((0.05, 500), (0.15, 429), (0.5, None)):
+        monkeypatch.setattr("random.random", lambda: draw)
+        assert profile.failure() == status
+
+
+def _http_client(mocks):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=mocks.app))
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("stream", [False, True])
+async def test_openai_sdk_speaks_to_the_stand_in(stream):
+    mocks = MockProviders(INSTANT)
+    env = provider_env("mock.test", 80)
+    provider = OpenAIProvider(api_key="mock")
+    provider.client = openai.AsyncOpenAI(
+        api_key="mock", base_url=env["OPENAI_BASE_URL"], http_client=_http_client(mocks), max_retries=0
+    )
+    if stream:
+        chunks = [chunk async for chunk in provider.chat_stream(REQUEST)]
+        assert "".join(chunk.delta or "" for chunk in chunks) == "lorem " * 5
+        usage = chunks[-1].usage
+    else:
+        usage = (await provider.chat_complete(REQUEST)).usage
+    assert usage["completion_tokens"] == 5
+    assert mocks.calls["openai"] == 1
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("stream", [False, True])
+async def test_anthropic_sdk_speaks_to_the_stand_in(stream):
+    mocks = MockProviders(INSTANT)
+    provider = AnthropicProvider()
+    provider.client = anthropic.AsyncAnthropic(
+        api_key="mock", base_url=provider_env("mock.test", 80)["ANTHROPIC_BASE_URL"],
+        http_client=_http_client(mocks), max_retries=0
+    )
+    if stream:
+        chunks = [chunk async for chunk in provider.chat_stream(REQUEST)]
+        usage = chunks[-1].usage
+    else:
+        usage = (await provider.chat_complete(REQUEST)).usage
+    assert usage["output_tokens"] == 5
+    assert mocks.calls["anthropic"] == 1
+
+
+@pytest.mark.anyio
+async def test_injected_throttling_carries_retry_after():
+    mocks = MockProviders(INSTANT._replace(throttle_rate=1.0))
+    async with _http_client(mocks) as client:
+        response = await client.post("http://mock.test/deepseek/chat/completions", json={"model": "m", "messages": []})
+        stats = (await client.get("http://mock.test/stats")).json()
+    assert response.status_code == 429 and response.headers["retry-after"] == "1"
+    assert stats == {"deepseek": 1, "deepseek_429": 1}
+
+
+def test_loadgen_report_helpers(capsys):
+    assert loadgen.quantiles([]) is None
+    assert loadgen.quantiles([float(i) for i in range(1, 101)])["p50"] == 51.0
+    assert loadgen._server_timing("upstream;dur=12.50, router;dur=0.40") == {"upstream": 12.5, "router": 0.4}
+
+    base = {"results": {"throughput_rps": 100.0, "latency_ms": {"p99": 200.0}}}
+    head = {"results": {"throughput_rps": 80.0, "latency_ms": {"p99": 190.0}}}
+    loadgen.compare(base, head)
+    lines = {line.split()[0]: line for line in capsys.readouterr().out.splitlines()[1:]}
+    assert lines["throughput_rps"].endswith("!")
+    assert not lines["latency_ms.p99"].endswith("!")
@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+from serverRouter.core import models
+from serverRouter.core.datamodels import ModelProvider
+from serverRouter.core.models import ModelRegistry, ReloadableRegistry
+
+MODELS_YAML = """
+chat:
+  small:
+    name: small-1
+    provider: openai
+    description: test model
+    max_tokens: 4096
+    capabilities: [chat, streaming]
+  big:
+    name: big-1
+    provider: anthropic
+    description: test model
+    max_tokens: 8192
+    capabilities: [chat, tools]
+image:
+  painter:
+    name: painter-1
+    provider: openai
+    description: test model
+    max_tokens: 0
+    capabilities: [image_generation]
+aliases:
+  default:
+    description: test alias
+    members: [small, big]
+"""
+
+
+@pytest.fixture
+def models_file(tmp_path):
+    path = tmp_path / "models.yaml"
+    path.write_text(MODELS_YAML)
+    return path
+
+
+def test_select_filters_by_provider_and_capability(models_file):
+    registry = ModelRegistry.from_file(str(models_file))
+    assert registry.select() == ["small", "big", "painter"]
+    assert registry.select("chat", providers=(ModelProvider.OPENAI,)) == ["small"]
+    assert registry.select(capabilities=("tools",)) == ["big"]
+    assert registry.select("image", capabilities=("chat",)) == []
+
+
+def test_listing_is_cached_and_tagged(models_file):
+    registry = ModelRegistry.from_file(str(models_file))
+    providers = frozenset({ModelProvider.OPENAI})
+    listing = registry.listing("chat", providers)
+    assert registry.listing("chat", providers) is listing
+    assert b'"small"' in listing.body and b'"big"' not in listing.body
+    assert listing.etag != registry.listing("chat", providers, health={"small": "open"}).etag
+    # Unknown capabilities are answered but never kept
+    registry.listing("chat", providers, capability="no-such-thing")
+    assert len(registry._listings) == 2
+
+
+def test_alias_with_unknown_member_is_rejected(tmp_path):
+    path = tmp_path / "models.yaml"
+    path.write_text(MODELS_YAML.replace("[small, big]", "[small, missing]"))
+    with pytest.raises(ValueError, match="missing"):
+        ModelRegistry.from_file(str(path))
+
+
+@pytest.mark.anyio
+async def test_reload_swaps_snapshot_and_keeps_previous_on_error(models_file):
+    reloadable = ReloadableRegistry(str(models_file))
+    first = reloadable.current
+    assert not await reloadable.reload_if_changed()
+
+    models_file.write_text(MODELS_YAML.replace("max_tokens: 8192", "max_tokens: 16384"))
+    os.utime(models_file, ns=(1, 1))
+    assert await reloadable.reload_if_changed()
+    assert reloadable.current is not first
+    assert reloadable.current.chat["big"].max_tokens == 16384
+
+    second = reloadable.current
+    models_file.write_text("chat: [not, a, mapping]")
+    os.utime(models_file, ns=(2, 2))
+    assert not await reloadable.reload_if_changed()
+    assert reloadable.current is second
+    assert reloadable.reload_failures == 1
+
+
+def test_module_tables_follow_the_live_registry(models_file, monkeypatch):
+    monkeypatch.setattr(models, "REGISTRY", ReloadableRegistry(str(models_file)))
+    assert list(models.CHAT_MODELS) == ["small", "big"]
+    assert list(models.IMAGE_MODELS) == ["painter"]
+    assert models.MODELS["painter"].name == "painter-1"
+    assert models.MODELS_BY_PROVIDER[ModelProvider.OPENAI] == ["small", "painter"]
+    with pytest.raises(TypeError):
+        models.MODELS["new"] = models.MODELS["small"]
+
+    models.REGISTRY.current = ModelRegistry(chat={"big": models.MODELS["big"]}, image={}, aliases={})
+    assert list(models.MODELS) == ["big"]
+    assert ModelProvider.OPENAI not in models.MODELS_BY_PROVIDER
+    assert "small" not in models.CHAT_MODELS
+
+
+@pytest.mark.anyio
+async def test_listing_endpoint_revalidates_with_etags(client, fake_chat):
+    response = await client.get("/v1/models/chat", params={"provider": "openai"})
+    etag = response.headers["ETag"]
+    assert {model["provider"] for model in response.json()["models"]} == {"openai"}
+
+    response = await client.get("/v1/models/chat", params={"provider": "openai"}, headers={"If-None-Match": f"W/{etag}"})
+    assert response.status_code == 304 and response.content == b""
+    response = await client.get("/v1/models/chat", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] != etag
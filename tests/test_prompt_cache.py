@@ -0,0 +1,73 @@
+from serverRouter.core.datamodels import ChatCompletionRequest
+from serverRouter.core.prompt_cache import MAX_BREAKPOINTS, PromptCachePlanner
+
+SYSTEM = "You are a meticulous assistant. " * 200
+CANDIDATES = ["claude-3-5-sonnet", "gpt-4o", "deepseek-chat"]
+
+
+def _request(*turns, system=SYSTEM):
+    messages = [{"role": "system", "content": system}] if system else []
+    for i, content in enumerate(turns):
+        messages.append({"role": "user" if i % 2 == 0 else "assistant", "content": content})
+    return ChatCompletionRequest(model="smart", messages=messages)
+
+
+def _prefer(planner, request):
+    return planner.prefer(planner.plan(request), CANDIDATES, lambda candidate: candidate)
+
+
+def test_short_prompts_get_no_plan():
+    planner = PromptCachePlanner(min_tokens=1024)
+    assert planner.plan(_request("hi", system="be brief")) is None
+    assert planner.plan(_request("hi", system=None)) is None
+
+
+def test_breakpoints_after_system_block_and_prefix_end():
+    planner = PromptCachePlanner(min_tokens=1024)
+    request = _request("q1", "a1", "q2")
+    plan = planner.plan(request)
+    assert plan.breakpoints == [0, 2]
+    marked = planner.mark(request, plan)
+    assert [bool(msg.cache_control) for msg in marked.messages] == [True, False, True, False]
+    assert not any(msg.cache_control for msg in request.messages)
+
+
+def test_client_breakpoints_are_respected():
+    planner = PromptCachePlanner(min_tokens=1024)
+    request = _request("q1", "a1", "q2")
+    request.messages = [msg.model_copy(update={"cache_control": {"type": "ephemeral"}}) for msg in request.messages]
+    assert len(request.messages) == MAX_BREAKPOINTS
+    assert planner.mark(request, planner.plan(request)) is request
+
+
+def test_repeated_prompt_goes_back_to_the_same_model():
+    planner = PromptCachePlanner(min_tokens=1024)
+    request = _request("q1")
+    assert _prefer(planner, request) == CANDIDATES
+    planner.record(planner.plan(request), "gpt-4o")
+    assert _prefer(planner, request)[0] == "gpt-4o"
+
+
+def test_growing_conversation_keeps_its_model():
+    planner = PromptCachePlanner(min_tokens=1024)
+    planner.record(planner.plan(_request("q1", "a1", "q2")), "deepseek-chat")
+    # The next turn's prefix extends the previous one
+    assert _prefer(planner, _request("q1", "a1", "q2", "a2", "q3"))[0] == "deepseek-chat"
+
+
+def test_conversation_without_system_prompt_keeps_its_model():
+    planner = PromptCachePlanner(min_tokens=256)
+    long_question = "Please summarize this document. " * 100
+    planner.record(planner.plan(_request(long_question, "summary", "shorter?", system=None)), "gpt-4o")
+    assert _prefer(planner, _request(long_question, "summary", "shorter?", "ok", "thanks", system=None))[0] == "gpt-4o"
+
+
+def test_longest_matching_prefix_wins():
+    planner = PromptCachePlanner(min_tokens=1024)
+    # Another conversation with the same system prompt went to one model...
+    planner.record(planner.plan(_request("other", "reply", "more")), "claude-3-5-sonnet")
+    # ...while this one is on another
+    planner.record(planner.plan(_request("q1", "a1", "q2")), "deepseek-chat")
+    assert _prefer(planner, _request("q1", "a1", "q2", "a2", "q3"))[0] == "deepseek-chat"
+    # A new conversation only shares the system block
+    assert _prefer(planner, _request("fresh", "start", "go"))[0] == "deepseek-chat"
@@ -0,0 +1,110 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from serverRouter.core.datamodels import ModelProvider
+from serverRouter.providers.registry import ProviderRegistry, ProviderSpec
+
+# Stand-in provider classes, loaded through ProviderSpec targets
+CONSTRUCTED = []
+
+
+class SlowProvider:
+    def __init__(self):
+        time.sleep(0.05)
+        CONSTRUCTED.append(self)
+
+
+class BrokenProvider:
+    def __init__(self):
+        raise RuntimeError("bad credentials")
+
+
+def _registry(monkeypatch, **targets):
+    monkeypatch.setenv("FAKE_KEY", "x")
+    monkeypatch.delenv("MISSING_KEY", raising=False)
+    CONSTRUCTED.clear()
+    return ProviderRegistry({
+        ModelProvider[name]: ProviderSpec(f"{__name__}:{target}", env)
+        for name, (target, env) in targets.items()
+    })
+
+
+def test_provider_without_credentials_is_unavailable(monkeypatch):
+    registry = _registry(monkeypatch, OPENAI=("SlowProvider", ("MISSING_KEY",)))
+    assert ModelProvider.OPENAI not in registry
+    assert registry.get(ModelProvider.OPENAI) is None
+    assert registry.status()["openai"]["reason"] == "missing MISSING_KEY"
+    assert registry.status()["gemini"]["reason"] == "not registered"
+    assert not CONSTRUCTED
+
+
+def test_concurrent_first_uses_construct_once(monkeypatch):
+    registry = _registry(monkeypatch, OPENAI=("SlowProvider", ("FAKE_KEY",)))
+    assert registry.status()["openai"] == {"available": True, "loaded": False, "reason": None}
+    threads = [threading.Thread(target=registry.get, args=(ModelProvider.OPENAI,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(CONSTRUCTED) == 1
+    assert registry.status()["openai"]["loaded"]
+
+
+def test_failed_provider_is_disabled_alone(monkeypatch):
+    registry = _registry(
+        monkeypatch,
+        OPENAI=("SlowProvider", ("FAKE_KEY",)),
+        ANTHROPIC=("BrokenProvider", ("FAKE_KEY",)),
+        DEEPSEEK=("NoSuchClass", ("FAKE_KEY",)),
+    )
+    assert registry.get(ModelProvider.ANTHROPIC) is None
+    assert registry.get(ModelProvider.DEEPSEEK) is None
+    assert "bad credentials" in registry.status()["anthropic"]["reason"]
+    assert list(registry) == [ModelProvider.OPENAI]
+    # A directly assigned instance replaces the failed one
+    registry[ModelProvider.ANTHROPIC] = object()
+    assert ModelProvider.ANTHROPIC in registry
+
+
+@pytest.mark.anyio
+async def test_load_constructs_off_the_event_loop(monkeypatch):
+    registry = _registry(monkeypatch, OPENAI=("SlowProvider", ("FAKE_KEY",)))
+    loop_thread = threading.get_ident()
+    constructed_in = []
+    monkeypatch.setattr(SlowProvider, "__init__", lambda self: constructed_in.append(threading.get_ident()))
+    instance = await registry.load(ModelProvider.OPENAI)
+    assert isinstance(instance, SlowProvider)
+    assert constructed_in and constructed_in[0] != loop_thread
+    assert await registry.load(ModelProvider.OPENAI) is instance
+
+
+def test_router_import_leaves_provider_sdks_unloaded():
+    code = (
+        "import sys, serverRouter.router\n"
+        "print(sorted(m for m in ('openai', 'anthropic', 'google.generativeai') if m in sys.modules))"
+    )
+    env = {**os.environ, "OPENAI_API_KEY": "x", "ANTHROPIC_API_KEY": "x", "GEMINI_API_KEY": "x"}
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+@pytest.mark.anyio
+async def test_empty_gemini_reply_is_a_provider_error():
+    from serverRouter.core.datamodels import ChatCompletionRequest
+    from serverRouter.core.exceptions import ProviderError
+    from serverRouter.providers.gemini.provider import GeminiProvider
+
+    class EmptyModel:
+        async def generate_content_async(self, **kwargs):
+            return type("Response", (), {"text": "", "usage_metadata": None})()
+
+    provider = GeminiProvider(api_key="test")
+    provider._models["gemini-2.0-flash"] = EmptyModel()
+    request = ChatCompletionRequest(model="gemini-2.0-flash", messages=[{"role": "user", "content": "hi"}])
+    with pytest.raises(ProviderError, match="empty response"):
+        await provider.chat_complete(request)
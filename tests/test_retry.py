@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import pytest
+
+from serverRouter.core.exceptions import CapacityExceededError, ProviderError
+from serverRouter.core.retry import RetryBudget, RetryPolicy, is_retryable
+
+pytestmark = pytest.mark.anyio
+
+
+class Upstream(Exception):
+    def __init__(self, status_code, retry_after=None):
+        self.status_code = status_code
+        if retry_after is not None:
+            self.response = type("Response", (), {"headers": {"retry-after": str(retry_after)}})()
+
+
+def _flaky(*errors, result="ok"):
+    """A call that raises each error in turn, then returns result"""
+    remaining = list(errors)
+    calls = []
+
+    async def call():
+        calls.append(time.monotonic())
+        if remaining:
+            raise remaining.pop(0)
+        return result
+
+    return call, calls
+
+
+def test_retryable_errors():
+    assert is_retryable(ProviderError("x", cause=Upstream(529)))
+    assert is_retryable(ProviderError("x", cause=Upstream(429)))
+    assert is_retryable(ProviderError("x", cause=asyncio.TimeoutError()))
+    assert not is_retryable(ProviderError("x", cause=Upstream(400)))
+    assert not is_retryable(CapacityExceededError("p", "queue full"))
+    assert not is_retryable(ValueError("bad response"))
+
+
+async def test_transient_errors_are_retried_until_success():
+    call, calls = _flaky(ProviderError("x", cause=Upstream(503)), ProviderError("x", cause=Upstream(502)))
+    retried = []
+    policy = RetryPolicy(attempts=3, base_delay=0.01)
+    assert await policy.call(call, on_retry=lambda error, wait: retried.append(wait)) == "ok"
+    assert len(calls) == 3 and len(retried) == 2
+
+
+async def test_terminal_errors_and_exhausted_attempts_raise_the_last_error():
+    call, calls = _flaky(ProviderError("bad", cause=Upstream(400)))
+    with pytest.raises(ProviderError, match="bad"):
+        await RetryPolicy(base_delay=0.01).call(call)
+    assert len(calls) == 1
+
+    call, calls = _flaky(*(ProviderError(f"try {i}", cause=Upstream(500)) for i in range(5)))
+    with pytest.raises(ProviderError, match="try 1"):
+        await RetryPolicy(attempts=2, base_delay=0.01).call(call)
+    assert len(calls) == 2
+
+
+async def test_retry_after_is_honoured_and_long_ones_give_up():
+    call, calls = _flaky(ProviderError("slow down", cause=Upstream(429, retry_after=0.1)))
+    await RetryPolicy(base_delay=0.001).call(call)
+    assert calls[1] - calls[0] >= 0.09
+
+    call, calls = _flaky(ProviderError("slow down", cause=Upstream(429, retry_after=60)))
+    with pytest.raises(ProviderError):
+        await RetryPolicy(max_delay=8).call(call)
+    assert len(calls) == 1
+
+
+async def test_no_retry_starts_past_the_deadline():
+    call, calls = _flaky(*(ProviderError("down", cause=Upstream(503)) for _ in range(5)))
+    with pytest.raises(ProviderError):
+        await RetryPolicy(attempts=5, base_delay=10, max_delay=10).call(call, deadline=time.monotonic() + 0.05)
+    assert len(calls) <= 2 and calls[-1] - calls[0] < 0.1
+
+
+async def test_budget_caps_retries_across_calls():
+    budget = RetryBudget(ratio=0.5, min_per_second=0, window=10)
+    policy = RetryPolicy(attempts=3, base_delay=0.001, budget=budget)
+    for _ in range(4):
+        call, _ = _flaky(*(ProviderError("down", cause=Upstream(503)) for _ in range(3)))
+        with pytest.raises(ProviderError):
+            await policy.call(call)
+    # Four first attempts buy two retries
+    assert budget.stats["retries"] == 2
+    assert budget.stats["exhausted"] >= 1
+
+
+async def test_router_retries_transient_failures(client, router, fake_chat):
+    fake_chat.errors = [ProviderError("overloaded", cause=Upstream(529))]
+    response = await client.post("/v1/chat/completions", json={"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}]})
+    assert response.status_code == 200
+    assert len(fake_chat.calls) == 2
+    assert (await client.get("/v1/stats/retries")).json()["retries"]["budget"]["retries"] == 1
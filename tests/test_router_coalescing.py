@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+BODY = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hello"}]}
+
+
+async def test_identical_requests_share_one_upstream_call(client, fake_chat):
+    fake_chat.delay = 0.1
+    responses = await asyncio.gather(*(client.post("/v1/chat/completions", json=BODY) for _ in range(3)))
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert len(fake_chat.calls) == 1
+
+
+async def test_short_leader_deadline_does_not_fail_joiner(client, fake_chat):
+    fake_chat.delay = 0.3
+    leader = asyncio.create_task(
+        client.post("/v1/chat/completions", json=BODY, headers={"X-Request-Timeout": "0.05"})
+    )
+    await asyncio.sleep(0.01)
+    joiner = await client.post("/v1/chat/completions", json=BODY)
+    assert (await leader).status_code == 504
+    assert joiner.status_code == 200
+    assert len(fake_chat.calls) == 1
+    # The shared call got the model's own timeout, not what was left of the leader's deadline
+    assert fake_chat.calls[0]["timeout"] > 1
+
+
+async def test_joiner_deadline_is_enforced_on_its_own(client, fake_chat):
+    fake_chat.delay = 0.3
+    leader = asyncio.create_task(client.post("/v1/chat/completions", json=BODY))
+    await asyncio.sleep(0.01)
+    joiner = await client.post("/v1/chat/completions", json=BODY, headers={"X-Request-Timeout": "0.05"})
+    assert joiner.status_code == 504
+    assert (await leader).status_code == 200
+    assert len(fake_chat.calls) == 1
+
+
+async def test_joined_streams_each_receive_the_whole_stream(client, fake_chat):
+    fake_chat.delay, fake_chat.content = 0.1, "abc"
+    body = {**BODY, "stream": True}
+    responses = await asyncio.gather(*(client.post("/v1/chat/completions", json=body) for _ in range(2)))
+    for response in responses:
+        assert response.status_code == 200
+        events = [line[len("data: "):] for line in response.text.split("\n\n") if line.startswith("data: ")]
+        assert events[-1] == "[DONE]"
+        assert "".join(json.loads(event).get("delta", "") for event in events[:-1]) == "abc"
+    assert len(fake_chat.calls) == 1
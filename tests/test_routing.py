@@ -0,0 +1,93 @@
+import asyncio
+
+import httpx
+import pytest
+
+from serverRouter.core.concurrency import LimiterRegistry
+from serverRouter.core.datamodels import ChatCompletionRequest, ModelInfo, ModelProvider
+from serverRouter.core.exceptions import ProviderError
+from serverRouter.core.routing import RoutingEngine, parse_auto_model
+
+
+def _model(name, cost=None, max_tokens=128_000, tools=False):
+    return ModelInfo(name=name, provider=ModelProvider.OPENAI, description=name,
+                     max_tokens=max_tokens, cost_per_mtok=cost, supports_tools=tools)
+
+
+def _request(**options):
+    return ChatCompletionRequest(model="auto", messages=[{"role": "user", "content": "hi"}], **options)
+
+
+def test_auto_model_names():
+    assert parse_auto_model("auto") == "auto"
+    assert parse_auto_model("auto:cheap") == "cheap"
+    assert parse_auto_model("gpt-4o") is None
+    with pytest.raises(ValueError):
+        parse_auto_model("auto:best")
+
+
+def test_timeout_is_the_default_until_a_model_has_samples():
+    engine = RoutingEngine(default_timeout=60, min_samples=20)
+    for _ in range(19):
+        engine.record("m", 1.0, output_tokens=100)
+    assert engine.timeout_for("m", max_tokens=100) == 60
+
+
+def test_timeout_covers_the_generation_the_request_asks_for():
+    engine = RoutingEngine(default_timeout=60, timeout_multiplier=3, min_timeout=5, max_timeout=120, min_samples=20)
+    for _ in range(30):
+        engine.record("m", 1.2, output_tokens=120)  # 100 tokens/s
+    assert engine.timeout_for("m", max_tokens=100) == pytest.approx(5.0, rel=0.2)
+    assert engine.timeout_for("m", max_tokens=8000) == pytest.approx(240.0, rel=0.05)
+    # Past completions don't bound one without max_tokens
+    assert engine.timeout_for("m") == 60
+
+
+def test_rank_by_strategy():
+    models = {"slow-cheap": _model("slow-cheap", cost=0.5), "fast-pricey": _model("fast-pricey", cost=10.0)}
+    engine = RoutingEngine()
+    for _ in range(5):
+        engine.record("slow-cheap", 2.0)
+        engine.record("fast-pricey", 0.2)
+    assert engine.rank(_request(), models, "fast") == ["fast-pricey", "slow-cheap"]
+    assert engine.rank(_request(), models, "cheap") == ["slow-cheap", "fast-pricey"]
+
+
+def test_errors_make_a_model_look_slower():
+    models = {"flaky": _model("flaky"), "steady": _model("steady")}
+    engine = RoutingEngine()
+    for i in range(20):
+        engine.record("flaky", 0.5, error=i % 2 == 0)
+        engine.record("steady", 0.8)
+    assert engine.rank(_request(), models, "fast") == ["steady", "flaky"]
+
+
+def test_ineligible_models_are_not_ranked():
+    models = {"small": _model("small", max_tokens=10), "plain": _model("plain"), "tools": _model("tools", tools=True)}
+    request = _request(max_tokens=50, tools=[{"type": "function", "function": {"name": "f", "parameters": {"type": "object", "properties": {}}}}])
+    assert RoutingEngine().rank(request, models, "auto") == ["tools"]
+
+
+BODY = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}]}
+
+
+@pytest.mark.anyio
+async def test_admission_rejections_do_not_count_as_model_errors(router, client, fake_chat, monkeypatch):
+    monkeypatch.setattr(router, "LIMITS", LimiterRegistry(initial_limit=1, max_limit=1, max_queue=0))
+    fake_chat.delay = 0.2
+    first = asyncio.create_task(client.post("/v1/chat/completions", json=BODY))
+    await asyncio.sleep(0.05)
+    second = await client.post("/v1/chat/completions", json={**BODY, "messages": [{"role": "user", "content": "other"}]})
+    assert second.status_code == 503
+    assert (await first).status_code == 200
+    stats = router.ROUTING.stats["gpt-4o-mini"]
+    assert (stats.requests, stats.errors) == (1, 0)
+
+
+@pytest.mark.anyio
+async def test_upstream_failures_count_as_model_errors(router, client, fake_chat):
+    request = httpx.Request("POST", "https://upstream.test")
+    fake_chat.errors = [ProviderError("bad request", cause=httpx.HTTPStatusError(
+        "400", request=request, response=httpx.Response(400, request=request)))]
+    assert (await client.post("/v1/chat/completions", json=BODY)).status_code == 500
+    assert router.ROUTING.stats["gpt-4o-mini"].errors == 1
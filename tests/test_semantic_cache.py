@@ -0,0 +1,98 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from serverRouter.core.datamodels import ChatCompletionRequest, ChatCompletionResponse
+from serverRouter.core.semantic_cache import HashingEmbedder, SemanticCache, _namespace
+
+
+def _request(text, **options):
+    return ChatCompletionRequest(model="gpt-4o", messages=[{"role": "user", "content": text}], **options)
+
+
+def _response(content):
+    return ChatCompletionResponse(model="gpt-4o", content=content, provider="openai")
+
+
+def test_embeddings_are_normalized_and_paraphrases_are_close():
+    embed = HashingEmbedder(256)
+    a, b, c = embed("What is the capital of France?"), embed("capital of france"), embed("how do magnets work")
+    assert np.linalg.norm(a) == pytest.approx(1.0)
+    assert a @ b > a @ c
+
+
+def test_paraphrase_hits_and_unrelated_prompt_misses():
+    cache = SemanticCache(capacity=8, dim=256, default_threshold=0.6)
+    cache.store(_request("What is the capital of France?"), _response("Paris"))
+    assert cache.lookup(_request("what's the capital of france")).content == "Paris"
+    assert cache.lookup(_request("how do magnets work")) is None
+    assert cache.snapshot()["hits"] == 1
+
+
+@pytest.mark.parametrize("options", [{"temperature": 0.7}, {"tool_choice": "none"}, {"max_tokens": 5}])
+def test_namespace_separates_request_options(options):
+    assert _namespace(_request("hi")) != _namespace(_request("hi", **options))
+    cache = SemanticCache(capacity=4, dim=64)
+    cache.store(_request("hi"), _response("hello"))
+    assert cache.lookup(_request("hi", **options)) is None
+
+
+def test_least_recently_used_slot_is_overwritten():
+    cache = SemanticCache(capacity=2, dim=256, default_threshold=0.95)
+    cache.store(_request("first question"), _response("1"))
+    cache.store(_request("second question"), _response("2"))
+    cache.lookup(_request("first question"))
+    cache.store(_request("third question"), _response("3"))
+    assert cache.lookup(_request("second question")) is None
+    assert cache.lookup(_request("first question")).content == "1"
+    assert cache.snapshot()["evictions"] == 1
+
+
+def test_persisted_index_is_reopened(tmp_path):
+    path = str(tmp_path / "index")
+    cache = SemanticCache(capacity=4, dim=64, path=path)
+    cache.store(_request("capital of france"), _response("Paris"))
+    cache._lock_file.close()  # as if the process had exited
+
+    reopened = SemanticCache(capacity=4, dim=64, path=path)
+    assert reopened.path == path
+    assert reopened.lookup(_request("capital of france")).content == "Paris"
+
+
+def test_processes_never_share_an_index_file(tmp_path):
+    path = str(tmp_path / "index")
+    first = SemanticCache(capacity=4, dim=64, path=path)
+    first.store(_request("capital of france"), _response("Paris"))
+    # A peer with another shape must not truncate the file in use
+    second = SemanticCache(capacity=8, dim=64, path=path)
+    assert second.path == path + ".1"
+    assert os.path.getsize(path) == 4 * 64 * 4
+    second.store(_request("capital of spain"), _response("Madrid"))
+    assert first.lookup(_request("capital of france")).content == "Paris"
+    assert first.lookup(_request("capital of spain")) is None
+
+
+def test_entries_log_is_compacted(tmp_path):
+    path = str(tmp_path / "index")
+    cache = SemanticCache(capacity=4, dim=64, path=path)
+    for i in range(50):
+        cache.store(_request(f"question number {i}"), _response(str(i)))
+    with open(path + ".entries") as f:
+        assert len(f.readlines()) <= 2 * cache.capacity
+
+
+@pytest.mark.anyio
+async def test_async_access_runs_off_the_event_loop():
+    threads = []
+    embed = HashingEmbedder(64)
+
+    def embed_fn(text):
+        threads.append(threading.current_thread())
+        return embed(text)
+
+    cache = SemanticCache(capacity=4, dim=64, embed_fn=embed_fn)
+    await cache.set(_request("capital of france"), _response("Paris"))
+    assert (await cache.get(_request("capital of france"))).content == "Paris"
+    assert threads and threading.main_thread() not in threads
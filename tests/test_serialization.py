@@ -0,0 +1,71 @@
+import json
+
+import httpx
+import openai
+import pytest
+
+from conftest import FakeChatProvider
+from serverRouter.core.datamodels import ChatCompletionResponse, ModelProvider
+from serverRouter.core.interfaces import PassthroughChatProvider, RawChatCompletion
+from serverRouter.core.serialization import dumps
+from serverRouter.providers.passthrough import post_chat_completion
+
+UPSTREAM_BODY = b'{"id":"chatcmpl-1","object":"chat.completion","choices":[],"usage":{"prompt_tokens":4,"completion_tokens":2}}'
+
+
+def test_dumps_matches_pydantic_and_handles_nested_models():
+    response = ChatCompletionResponse(model="m", content="héllo", provider="p", usage={"prompt_tokens": 1})
+    assert json.loads(dumps(response)) == json.loads(response.model_dump_json())
+    assert json.loads(dumps({"items": [response], 1: "x"})) == {
+        "items": [response.model_dump(mode="json")], "1": "x"
+    }
+    with pytest.raises(TypeError):
+        dumps({"x": object()})
+
+
+@pytest.mark.anyio
+async def test_raw_post_skips_nones_and_returns_the_body_untouched():
+    sent = []
+
+    def handler(request):
+        sent.append((request.url.path, json.loads(request.content)))
+        return httpx.Response(200, content=UPSTREAM_BODY, headers={"content-type": "application/json"})
+
+    client = openai.AsyncOpenAI(
+        api_key="test", base_url="http://upstream.test/v1",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)), max_retries=0
+    )
+    body, usage = await post_chat_completion(client, {
+        "model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}], "max_tokens": None, "timeout": 5,
+    })
+    assert body == UPSTREAM_BODY
+    assert usage == {"prompt_tokens": 4, "completion_tokens": 2}
+    assert sent == [("/v1/chat/completions", {"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}]})]
+
+
+class RawProvider(FakeChatProvider, PassthroughChatProvider):
+    async def chat_complete_raw(self, request, timeout=None):
+        self.calls.append({"request": request, "timeout": timeout, "raw": True})
+        return RawChatCompletion(body=UPSTREAM_BODY, usage={"prompt_tokens": 4, "completion_tokens": 2})
+
+
+@pytest.mark.anyio
+async def test_passthrough_is_opt_in_and_openai_compatible_only(client, router):
+    raw, parsed = RawProvider(), FakeChatProvider()
+    for name in ModelProvider:
+        router.PROVIDERS[name] = parsed
+    router.PROVIDERS[ModelProvider.OPENAI] = raw
+    body = {"model": "gpt-4o", "messages": [{"role": "user", "content": "hi"}]}
+    opt_in = {"X-Omni-Passthrough": "1"}
+
+    response = await client.post("/v1/chat/completions", json=body, headers=opt_in)
+    assert response.content == UPSTREAM_BODY
+    assert response.headers["X-Omni-Passthrough"] == "1"
+
+    response = await client.post("/v1/chat/completions", json=body)
+    assert response.json()["provider"] == "fake"
+    assert "X-Omni-Passthrough" not in response.headers
+
+    response = await client.post("/v1/chat/completions", json={**body, "model": "claude-3-5-sonnet"}, headers=opt_in)
+    assert response.json()["provider"] == "fake"
+    assert [call.get("raw", False) for call in raw.calls] == [True, False]
@@ -0,0 +1,65 @@
+import os
+import sys
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from serverRouter import serve
+from serverRouter.core.middleware import RequestSizeLimitMiddleware, ResponseHeadersMiddleware
+
+
+def _app():
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        request.state.response_headers = {"X-Seen": str(len(await request.body()))}
+        return {"ok": True}
+
+    app.add_middleware(RequestSizeLimitMiddleware, max_body_bytes=100, max_header_bytes=2048)
+    app.add_middleware(ResponseHeadersMiddleware)
+    return app
+
+
+@pytest.fixture
+async def limited():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=_app()), base_url="http://omni.test") as client:
+        yield client
+
+
+@pytest.mark.anyio
+async def test_size_limits(limited):
+    response = await limited.post("/echo", content=b"x" * 100)
+    assert response.status_code == 200
+    assert response.headers["X-Seen"] == "100"
+
+    assert (await limited.post("/echo", content=b"x" * 101)).status_code == 413
+    assert (await limited.post("/echo", headers={"X-Big": "y" * 4096})).status_code == 431
+
+    async def chunked():
+        for _ in range(3):
+            yield b"x" * 60
+
+    # No Content-Length: counted as the body arrives
+    assert (await limited.post("/echo", content=chunked())).status_code == 413
+
+
+def test_serve_passes_tuning_to_uvicorn(monkeypatch):
+    calls = []
+    monkeypatch.setattr(serve.uvicorn, "run", lambda app, **options: calls.append((app, options)))
+    monkeypatch.setattr(sys, "argv", ["serve", "--workers", "3", "--drain-timeout", "7", "--max-body-bytes", "1234"])
+    monkeypatch.setenv("OMNI_PORT", "9001")
+    # Recorded so main()'s writes are undone afterwards
+    monkeypatch.setenv("OMNI_MAX_BODY_BYTES", "0")
+    monkeypatch.setenv("OMNI_MAX_HEADER_BYTES", "0")
+
+    serve.main()
+    app, options = calls[0]
+    assert app == serve.APP
+    assert options["workers"] == 3 and options["port"] == 9001
+    assert options["timeout_graceful_shutdown"] == 7
+    assert options["limit_concurrency"] is None
+    assert options["loop"] == ("uvloop" if serve._installed("uvloop") else "asyncio")
+    # Workers pick the caps up from the environment
+    assert os.environ["OMNI_MAX_BODY_BYTES"] == "1234"
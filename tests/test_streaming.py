@@ -0,0 +1,113 @@
+import json
+
+import httpx
+import openai
+import anthropic
+import pytest
+
+from serverRouter.core.datamodels import ChatCompletionChunk, ChatCompletionRequest
+from serverRouter.core.exceptions import ProviderError
+from serverRouter.providers.anthropic.provider import AnthropicProvider
+from serverRouter.providers.openai.provider import OpenAIProvider
+
+pytestmark = pytest.mark.anyio
+
+BODY = {"model": "gpt-4o", "messages": [{"role": "user", "content": "hello"}], "stream": True}
+
+
+def _events(response):
+    return [block[len("data: "):] for block in response.text.split("\n\n") if block.startswith("data: ")]
+
+
+def _sse(*events):
+    return "".join(f"data: {event}\n\n" for event in events).encode("utf-8")
+
+
+async def test_stream_is_framed_as_server_sent_events(client, fake_chat):
+    fake_chat.content = "hey"
+    response = await client.post("/v1/chat/completions", json=BODY)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _events(response)
+    assert events[-1] == "[DONE]"
+    chunks = [ChatCompletionChunk.model_validate_json(event) for event in events[:-1]]
+    assert "".join(chunk.delta or "" for chunk in chunks) == "hey"
+    assert chunks[-1].finish_reason == "stop"
+    assert chunks[-1].usage["completion_tokens"] == 5
+
+
+async def test_failure_before_first_chunk_is_an_http_error(client, fake_chat):
+    fake_chat.errors = [ProviderError("upstream down") for _ in range(10)]
+    response = await client.post("/v1/chat/completions", json=BODY)
+    assert response.status_code >= 500
+    assert "text/event-stream" not in response.headers.get("content-type", "")
+
+
+async def test_failure_mid_stream_is_reported_in_band(client, router, fake_chat):
+    class Broken(type(fake_chat)):
+        async def chat_stream(self, request, timeout=None):
+            yield ChatCompletionChunk(model=request.model, provider="fake", delta="par")
+            raise ProviderError("connection reset")
+
+    for name in list(router.PROVIDERS._instances):
+        router.PROVIDERS[name] = Broken()
+    response = await client.post("/v1/chat/completions", json=BODY)
+    assert response.status_code == 200
+    events = _events(response)
+    assert json.loads(events[0])["delta"] == "par"
+    assert "connection reset" in json.loads(events[1])["error"]
+    assert events[-1] == "[DONE]"
+
+
+async def test_openai_stream_ends_with_usage_chunk():
+    def handler(request):
+        assert json.loads(request.content)["stream_options"] == {"include_usage": True}
+        chunk = {"id": "c", "object": "chat.completion.chunk", "created": 0, "model": "gpt-4o"}
+        body = _sse(
+            json.dumps({**chunk, "choices": [{"index": 0, "delta": {"content": "He"}, "finish_reason": None}]}),
+            json.dumps({**chunk, "choices": [{"index": 0, "delta": {"content": "llo"}, "finish_reason": "stop"}]}),
+            json.dumps({**chunk, "choices": [], "usage": {"prompt_tokens": 3, "completion_tokens": 2, "total_tokens": 5}}),
+            "[DONE]",
+        )
+        return httpx.Response(200, content=body, headers={"content-type": "text/event-stream"})
+
+    provider = OpenAIProvider(api_key="test")
+    provider.client = openai.AsyncOpenAI(
+        api_key="test", http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)), max_retries=0
+    )
+    request = ChatCompletionRequest(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+    chunks = [chunk async for chunk in provider.chat_stream(request)]
+    assert [chunk.delta for chunk in chunks[:-1]] == ["He", "llo"]
+    assert chunks[-1].finish_reason == "stop"
+    assert chunks[-1].usage["prompt_tokens"] == 3 and chunks[-1].usage["completion_tokens"] == 2
+
+
+async def test_anthropic_stream_ends_with_usage_chunk():
+    def handler(request):
+        events = [
+            {"type": "message_start", "message": {
+                "id": "m", "type": "message", "role": "assistant", "model": "claude-3-5-sonnet-20241022",
+                "content": [], "stop_reason": None, "stop_sequence": None,
+                "usage": {"input_tokens": 7, "output_tokens": 1}}},
+            {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+            {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "Hi"}},
+            {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": " there"}},
+            {"type": "content_block_stop", "index": 0},
+            {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+             "usage": {"output_tokens": 4}},
+            {"type": "message_stop"},
+        ]
+        body = "".join(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n" for event in events)
+        return httpx.Response(200, content=body.encode("utf-8"), headers={"content-type": "text/event-stream"})
+
+    provider = AnthropicProvider()
+    provider.client = anthropic.AsyncAnthropic(
+        api_key="test", http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)), max_retries=0
+    )
+    request = ChatCompletionRequest(
+        model="claude-3-5-sonnet-20241022", max_tokens=64, messages=[{"role": "user", "content": "hi"}]
+    )
+    chunks = [chunk async for chunk in provider.chat_stream(request)]
+    assert [chunk.delta for chunk in chunks[:-1]] == ["Hi", " there"]
+    assert chunks[-1].finish_reason == "end_turn"
+    assert chunks[-1].usage["input_tokens"] == 7 and chunks[-1].usage["output_tokens"] == 4
@@ -0,0 +1,109 @@
+import pytest
+
+from serverRouter.core import tokenizer
+from serverRouter.core.datamodels import ChatCompletionRequest, ModelInfo, ModelProvider
+from serverRouter.core.tokenizer import PromptBudget, TokenizerRegistry, heuristic_tokens
+
+
+class WordEncoder:
+    """One token per whitespace-separated word; records which API was used"""
+
+    def __init__(self):
+        self.batches = 0
+
+    def encode_ordinary(self, text):
+        return text.split()
+
+    def encode_ordinary_batch(self, texts):
+        self.batches += 1
+        return [text.split() for text in texts]
+
+
+def _model(provider=ModelProvider.OPENAI, max_tokens=100):
+    return ModelInfo(name="gpt-4o", provider=provider, description="m", max_tokens=max_tokens)
+
+
+@pytest.fixture
+def registry():
+    registry = TokenizerRegistry()
+    registry._encoders["o200k_base"] = registry._encoders["cl100k_base"] = WordEncoder()
+    registry._model_encodings["gpt-4o"] = "o200k_base"
+    return registry
+
+
+def test_heuristic_counts():
+    assert heuristic_tokens("abcdefgh") == 2
+    assert heuristic_tokens("日本語") == 3
+
+
+def test_openai_counts_are_exact_and_others_estimated(registry):
+    counts = registry.count_texts(["one two", "three"], _model())
+    assert counts == ([2, 1], True, "o200k_base")
+    counts = registry.count_texts(["one two"], _model(ModelProvider.ANTHROPIC))
+    assert counts == ([2], False, "cl100k_base")
+    registry.count_texts(["x"] * tokenizer.BATCH_THRESHOLD, _model())
+    assert registry._encoders["o200k_base"].batches == 1
+
+
+def test_prompt_includes_formatting_overhead(registry):
+    request = ChatCompletionRequest(model="gpt-4o", messages=[{"role": "user", "content": "a b c"}])
+    # "user\na b c" is four words
+    assert registry.count_prompt(request.messages, _model()).tokens == 4 + tokenizer.TOKENS_PER_MESSAGE + tokenizer.TOKENS_PER_REPLY
+
+
+def test_unavailable_encoder_falls_back_and_is_not_retried_at_once(monkeypatch):
+    import tiktoken
+
+    attempts = []
+
+    def offline(name):
+        attempts.append(name)
+        raise OSError("offline")
+
+    monkeypatch.setattr(tiktoken, "get_encoding", offline)
+    registry = TokenizerRegistry()
+    registry.preload(["cl100k_base"])
+    counts = registry.count_texts(["abcdefgh"], _model(ModelProvider.ANTHROPIC))
+    assert counts == ([2], False, "heuristic")
+    assert registry._start_load("cl100k_base") is None
+    assert attempts == ["cl100k_base"]
+
+
+def test_budget_skips_tokenizing_when_bytes_fit(registry):
+    class Refuse(TokenizerRegistry):
+        def count_prompt(self, *args):
+            raise AssertionError("tokenized")
+
+    request = ChatCompletionRequest(model="gpt-4o", max_tokens=10, messages=[{"role": "user", "content": "hi"}])
+    assert PromptBudget(request, tokenizers=Refuse()).fits(_model())
+
+
+def test_budget_trims_oldest_turns_but_keeps_system_and_last(registry):
+    messages = [{"role": "system", "content": "be brief"}] + [
+        {"role": role, "content": "word " * 20} for role in ("user", "assistant", "user")
+    ]
+    request = ChatCompletionRequest(model="gpt-4o", max_tokens=10, messages=messages)
+    budget = PromptBudget(request, tokenizers=registry)
+    assert not budget.fits(_model(max_tokens=50))
+    assert budget.trim(_model(max_tokens=50)) == 2
+    assert [msg.role for msg in request.messages] == ["system", "user"]
+    assert budget.fits(_model(max_tokens=50))
+    assert PromptBudget(request, tokenizers=registry).trim(_model(max_tokens=5)) == -1
+
+
+@pytest.mark.anyio
+async def test_tokenize_endpoint_and_preflight(client, router, fake_chat, monkeypatch):
+    monkeypatch.setitem(router.TOKENIZERS._encoders, "cl100k_base", WordEncoder())
+    response = await client.post("/v1/tokenize", json={
+        "model": "claude-3-5-sonnet", "texts": ["a b", "c"], "messages": [{"role": "user", "content": "x y"}],
+    })
+    body = response.json()
+    assert body["counts"] == [2, 1]
+    assert body["exact"] is False and body["encoding"] == "cl100k_base"
+    assert body["prompt_tokens"] == 3 + tokenizer.TOKENS_PER_MESSAGE + tokenizer.TOKENS_PER_REPLY
+
+    huge = {"model": "claude-3-5-sonnet", "messages": [{"role": "user", "content": "word " * 300_000}]}
+    response = await client.post("/v1/chat/completions", json=huge)
+    assert response.status_code == 400
+    assert "accepts at most" in response.json()["detail"]
+    assert not fake_chat.calls
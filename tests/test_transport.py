@@ -0,0 +1,65 @@
+import httpx
+import pytest
+
+from serverRouter.core.transport import UpstreamTransport
+
+
+def _mock(transport, name, handler):
+    """Swap a pool's network transport for a handler, keeping its hooks"""
+    transport.client(name)._transport = httpx.MockTransport(handler)
+
+
+def test_pools_are_shared_and_tuned_per_name(monkeypatch):
+    monkeypatch.setenv("OMNI_POOL_MAX_CONNECTIONS", "50")
+    monkeypatch.setenv("OMNI_POOL_OPENAI_MAX_CONNECTIONS", "400")
+    monkeypatch.setenv("OMNI_POOL_OPENAI_READ_TIMEOUT", "30")
+    transport = UpstreamTransport()
+    openai = transport.client("openai", "https://api.openai.com/v1")
+    assert transport.client("openai") is openai
+    assert transport.client("anthropic") is not openai
+
+    pools = transport.snapshot()
+    assert pools["openai"]["max_connections"] == 400
+    assert pools["anthropic"]["max_connections"] == 50
+    assert pools["openai"]["base_url"] == "https://api.openai.com/v1"
+    assert transport.timeout("openai").read == 30
+    assert transport.timeout("anthropic").connect == 5
+
+
+@pytest.mark.anyio
+async def test_warm_opens_idle_pools_and_survives_failures():
+    transport = UpstreamTransport()
+    seen = []
+
+    def ok(request):
+        seen.append((request.method, str(request.url)))
+        return httpx.Response(200)
+
+    def down(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    transport.client("openai", "https://api.openai.com/v1")
+    transport.client("anthropic", "https://api.anthropic.com")
+    transport.client("no-base-url")
+    _mock(transport, "openai", ok)
+    _mock(transport, "anthropic", down)
+
+    await transport.warm()
+    assert seen == [("HEAD", "https://api.openai.com/v1")]
+    pools = transport.snapshot()
+    assert pools["openai"]["warmups"] == 1 and pools["openai"]["requests"] == 1
+    assert pools["anthropic"]["warmup_failures"] == 1
+
+    # A pool used just now isn't re-warmed
+    await transport.warm(idle_for=60)
+    assert len(seen) == 1
+    await transport.aclose()
+    assert transport.snapshot() == {}
+
+
+def test_gemini_model_handles_are_reused():
+    from serverRouter.providers.gemini.provider import GeminiProvider
+
+    provider = GeminiProvider(api_key="test")
+    assert provider._model("gemini-2.0-flash") is provider._model("gemini-2.0-flash")
+    assert provider._model("gemini-2.0-flash") is not provider._model("gemini-exp-1206")